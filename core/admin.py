@@ -2,7 +2,18 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group, User
 
-from .models import Category, Dish, DishImage, Order, OrderItem, Restaurant, RestaurantProfile, SupportTicket
+from .models import (
+    Category,
+    DailySales,
+    Dish,
+    DishImage,
+    Order,
+    OrderItem,
+    Restaurant,
+    RestaurantProfile,
+    SupportTicket,
+    Task,
+)
 
 admin.site.site_header = "FoodBooking Admin"
 admin.site.site_title = "FoodBooking Admin Portal"
@@ -123,6 +134,23 @@ class SupportTicketAdmin(admin.ModelAdmin):
     ordering = ("-created_at",)
 
 
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "ref", "status", "attempts", "run_after", "updated_at")
+    list_filter = ("status", "name")
+    search_fields = ("ref",)
+    readonly_fields = ("created_at", "updated_at", "last_error")
+    ordering = ("-id",)
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ("date", "restaurant", "orders", "items", "revenue")
+    list_filter = ("restaurant",)
+    date_hierarchy = "date"
+    ordering = ("-date",)
+
+
 try:
     admin.site.unregister(User)
 except admin.sites.NotRegistered:
@@ -0,0 +1,205 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.text import compress_string
+
+from . import catalog, changes
+
+RESTAURANT_FIELDS = ("id", "name", "address", "image", "latitude", "longitude")
+CATEGORY_FIELDS = ("id", "name")
+DISH_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "price",
+    "rating",
+    "is_veg",
+    "is_available",
+    "category_id",
+    "image",
+    "images",
+)
+
+# Bump when the payload shape changes so clients drop their cached copies.
+SCHEMA_VERSION = "1"
+MIN_GZIP_BYTES = 200
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def _fields(request, allowed):
+    raw = request.GET.get("fields", "")
+    if not raw:
+        return allowed
+    requested = tuple(dict.fromkeys(field.strip() for field in raw.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _restaurant_row(row):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "address": row["address"],
+        "image": row["image_url"] or None,
+        "latitude": float(row["latitude"]) if row["latitude"] is not None else None,
+        "longitude": float(row["longitude"]) if row["longitude"] is not None else None,
+    }
+
+
+def _dish_row(row):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "description": row["description"],
+        "price": str(row["price"]),
+        "rating": str(row["rating"]),
+        "is_veg": row["is_veg"],
+        "is_available": row["is_available"],
+        "category_id": row["category_id"],
+        "image": row["image_url"] or None,
+        "images": row["image_urls"],
+    }
+
+
+def _pick(rows, fields):
+    return [{field: row[field] for field in fields} for row in rows]
+
+
+def _wants_gzip(request):
+    return "gzip" in request.headers.get("Accept-Encoding", "")
+
+
+def _etag(tag, fields, gzipped):
+    digest = hashlib.md5(",".join(fields).encode("ascii")).hexdigest()[:8]
+    return f'"{SCHEMA_VERSION}.{tag}.{digest}{".gz" if gzipped else ""}"'
+
+
+def _not_modified(request, tag, fields):
+    # ``tag`` is derived from catalog versions only, so a matching
+    # If-None-Match is answered without a database query.
+    client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+    if not client_etags:
+        return None
+    gzipped = _wants_gzip(request)
+    if _etag(tag, fields, gzipped) in client_etags or _etag(tag, fields, not gzipped) in client_etags:
+        return _finish(HttpResponseNotModified(), _etag(tag, fields, gzipped))
+    return None
+
+
+def _finish(response, etag):
+    response["ETag"] = etag
+    response["Cache-Control"] = "public, no-cache"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def versioned_json(request, tag, fields, build):
+    response = _not_modified(request, tag, fields)
+    if response:
+        return response
+    gzipped = _wants_gzip(request)
+    etag = _etag(tag, fields, gzipped)
+
+    def render():
+        body = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+        if gzipped and len(body) >= MIN_GZIP_BYTES:
+            return compress_string(body), "gzip"
+        return body, None
+
+    body, encoding = catalog.cached("api:" + etag.strip('"'), render)
+    response = HttpResponse(body, content_type="application/json")
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return _finish(response, etag)
+
+
+def _method_not_allowed():
+    return JsonResponse({"error": "Invalid method"}, status=405)
+
+
+def restaurants(request):
+    if request.method != "GET":
+        return _method_not_allowed()
+    try:
+        fields = _fields(request, RESTAURANT_FIELDS)
+    except InvalidFields as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return versioned_json(
+        request,
+        f"r{catalog.restaurants_version()}",
+        fields,
+        lambda: {
+            "restaurants": _pick(
+                [_restaurant_row(row) for row in catalog.get_restaurants()], fields
+            )
+        },
+    )
+
+
+def categories(request):
+    if request.method != "GET":
+        return _method_not_allowed()
+    try:
+        fields = _fields(request, CATEGORY_FIELDS)
+    except InvalidFields as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return versioned_json(
+        request,
+        f"c{catalog.categories_version()}",
+        fields,
+        lambda: {"categories": _pick(catalog.get_categories(), fields)},
+    )
+
+
+def restaurant_menu(request, restaurant_id):
+    if request.method != "GET":
+        return _method_not_allowed()
+    try:
+        fields = _fields(request, DISH_FIELDS)
+    except InvalidFields as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    tag = f"m{restaurant_id}.{catalog.categories_version()}.{catalog.menu_version(restaurant_id)}"
+    response = _not_modified(request, tag, fields)
+    if response:
+        return response
+    menu = catalog.get_menu(restaurant_id)
+    if not menu or not menu["restaurant"]["is_active"]:
+        return JsonResponse({"error": "Restaurant not found"}, status=404)
+    return versioned_json(
+        request,
+        tag,
+        fields,
+        lambda: {
+            "restaurant": {"id": menu["restaurant"]["id"], "name": menu["restaurant"]["name"]},
+            "categories": menu["categories"],
+            "dishes": _pick([_dish_row(row) for row in menu["dishes"]], fields),
+        },
+    )
+
+
+def menu_changes(request):
+    if request.method != "GET":
+        return _method_not_allowed()
+    page_size = getattr(settings, "MENU_CHANGES_PAGE_SIZE", 500)
+    try:
+        since = int(request.GET.get("since", 0))
+        limit = int(request.GET.get("limit", page_size))
+    except ValueError:
+        return JsonResponse({"error": "since and limit must be integers"}, status=400)
+    if since < 0 or limit < 1:
+        return JsonResponse({"error": "since and limit must be positive"}, status=400)
+    response = JsonResponse(
+        changes.since(since, min(limit, page_size), getattr(settings, "MENU_CHANGES_COMMIT_LAG", 0)),
+        json_dumps_params={"separators": (",", ":")}
+    )
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,117 @@
+import math
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http.request import validate_host
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Dish, RestaurantProfile
+
+# Steady-state query counts: cache warm, session and cart already in place.
+# QueryBudgetTests asserts these exactly; `benchmark_views --enforce` treats
+# them as ceilings on a seeded database.
+SCENARIOS = {
+    "app_home": {"user": None, "url": lambda ctx: reverse("app_home"), "budget": 2},
+    "app_home_restaurant": {
+        "user": None,
+        "url": lambda ctx: f"{reverse('app_home')}?restaurant={ctx['restaurant_id']}",
+        "budget": 0,
+    },
+    "app_home_search": {"user": None, "url": lambda ctx: f"{reverse('app_home')}?q=biryani", "budget": 2},
+    "cart_view": {"user": "customer", "cart": True, "url": lambda ctx: reverse("cart"), "budget": 2},
+    "checkout": {"user": "customer", "cart": True, "url": lambda ctx: reverse("checkout"), "budget": 2},
+    "order_history": {"user": "customer", "url": lambda ctx: reverse("order_history"), "budget": 3},
+    "restaurant_dashboard": {"user": "owner", "url": lambda ctx: reverse("restaurant_dashboard"), "budget": 6},
+    "api_restaurant_menu": {
+        "user": None,
+        "url": lambda ctx: reverse("api_restaurant_menu", args=[ctx["restaurant_id"]]),
+        "budget": 0,
+    },
+}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def context():
+    # The busiest seeded owner and customer, so pages have data to render.
+    profile = RestaurantProfile.objects.select_related("user").order_by("id").first()
+    customer = User.objects.filter(orders__isnull=False).order_by("id").first()
+    if profile is None or customer is None:
+        raise BenchmarkError("No restaurant owner or customer with orders; run seed_load first.")
+    dish_id = (
+        Dish.objects.filter(restaurant_id=profile.restaurant_id, is_available=True)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return {
+        "owner": profile.user,
+        "customer": customer,
+        "restaurant_id": profile.restaurant_id,
+        "dish_id": dish_id,
+    }
+
+
+def _host():
+    if validate_host("testserver", settings.ALLOWED_HOSTS):
+        return "testserver"
+    return settings.ALLOWED_HOSTS[0].lstrip(".")
+
+
+def client_for(scenario, ctx):
+    client = Client(HTTP_HOST=_host())
+    if scenario["user"]:
+        client.force_login(ctx[scenario["user"]])
+    if scenario.get("cart") and ctx["dish_id"]:
+        client.post(reverse("add_to_cart_json", args=[ctx["dish_id"]]))
+    return client
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def measure(name, ctx, iterations=20, warmup=2):
+    scenario = SCENARIOS[name]
+    client = client_for(scenario, ctx)
+    url = scenario["url"](ctx)
+    for _ in range(warmup):
+        client.get(url)
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+        queries.append(len(captured))
+    # Measured separately: tracing allocations slows every request down.
+    tracemalloc.start()
+    try:
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "name": name,
+        "url": url,
+        "status": response.status_code,
+        "p50_ms": round(percentile(timings, 50) * 1000, 2),
+        "p95_ms": round(percentile(timings, 95) * 1000, 2),
+        "queries": max(queries),
+        "budget": scenario["budget"],
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run(names=None, iterations=20, warmup=2):
+    ctx = context()
+    return [measure(name, ctx, iterations, warmup) for name in names or SCENARIOS]
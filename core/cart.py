@@ -0,0 +1,152 @@
+from decimal import Decimal
+
+from . import catalog
+
+SESSION_KEY = "cart"
+
+
+class CartError(Exception):
+    pass
+
+
+class DishUnavailable(CartError):
+    pass
+
+
+class Cart:
+    # Session layout: {"r": restaurant id, "v": menu version the prices were
+    # read at, "l": {dish id: [quantity, unit price]}}.
+    def __init__(self, session):
+        self.session = session
+        self.modified = False
+        # Names of dishes revalidate() has removed since the cart was loaded.
+        self.dropped = []
+        data = session.get(SESSION_KEY) or {}
+        if "l" not in data:
+            # Carts saved before the snapshot format were {dish id: quantity}.
+            self.restaurant_id = None
+            self.version = None
+            self._lines = {}
+            for dish_id, quantity in data.items():
+                try:
+                    self._insert(int(dish_id), int(quantity))
+                except (CartError, ValueError):
+                    pass
+            self.modified = bool(data)
+            return
+        self.restaurant_id = data["r"]
+        self.version = data["v"]
+        self._lines = {
+            int(dish_id): [quantity, Decimal(price)] for dish_id, (quantity, price) in data["l"].items()
+        }
+
+    def __len__(self):
+        return len(self._lines)
+
+    @staticmethod
+    def _key(dish_id):
+        try:
+            return int(dish_id)
+        except (TypeError, ValueError):
+            return None
+
+    @property
+    def count(self):
+        return sum(quantity for quantity, _ in self._lines.values())
+
+    @property
+    def total(self):
+        return sum((line["line_total"] for line in self.lines()), Decimal("0.00"))
+
+    def quantity(self, dish_id):
+        line = self._lines.get(self._key(dish_id))
+        return line[0] if line else 0
+
+    def quantities(self):
+        return {dish_id: quantity for dish_id, (quantity, _) in self._lines.items()}
+
+    def revalidate(self):
+        if not self._lines:
+            return []
+        version = catalog.menu_version(self.restaurant_id)
+        if version == self.version:
+            return []
+        menu = catalog.get_menu(self.restaurant_id)
+        rows = {row["id"]: row for row in menu["dishes"]} if menu else {}
+        dropped = []
+        for dish_id, line in list(self._lines.items()):
+            row = rows.get(dish_id)
+            if row is None or not row["is_available"]:
+                dropped.append(row["name"] if row else "A dish")
+                del self._lines[dish_id]
+            else:
+                line[1] = row["price"]
+        self.version = version
+        if not self._lines:
+            self.restaurant_id = None
+        self.modified = True
+        self.dropped.extend(dropped)
+        return dropped
+
+    def _insert(self, dish_id, quantity):
+        dish = catalog.get_dishes([dish_id]).get(dish_id)
+        if dish is None or not dish["is_available"]:
+            raise DishUnavailable("This dish is not available right now.")
+        if self._lines and dish["restaurant_id"] != self.restaurant_id:
+            raise CartError("You can only order from one restaurant at a time. Clear the cart to switch.")
+        if not self._lines:
+            self.restaurant_id = dish["restaurant_id"]
+            self.version = catalog.menu_version(self.restaurant_id)
+        self._lines[dish_id] = [quantity, dish["price"]]
+
+    def add(self, dish_id, quantity=1):
+        return self.set(dish_id, self.quantity(dish_id) + quantity)
+
+    def set(self, dish_id, quantity):
+        dish_id = self._key(dish_id)
+        if quantity <= 0:
+            self.remove(dish_id)
+            return 0
+        self.revalidate()
+        if dish_id in self._lines:
+            self._lines[dish_id][0] = quantity
+        else:
+            self._insert(dish_id, quantity)
+        self.modified = True
+        return quantity
+
+    def remove(self, dish_id):
+        if self._lines.pop(self._key(dish_id), None) is not None:
+            if not self._lines:
+                self.restaurant_id = None
+            self.modified = True
+
+    def clear(self):
+        if self._lines:
+            self._lines = {}
+            self.restaurant_id = None
+            self.modified = True
+
+    def lines(self):
+        menu = catalog.get_menu(self.restaurant_id) if self._lines else None
+        rows = {row["id"]: row for row in menu["dishes"]} if menu else {}
+        return [
+            {"dish": rows[dish_id], "qty": quantity, "price": price, "line_total": price * quantity}
+            for dish_id, (quantity, price) in self._lines.items()
+            if dish_id in rows
+        ]
+
+    def as_dict(self):
+        return {
+            "r": self.restaurant_id,
+            "v": self.version,
+            "l": {
+                str(dish_id): [quantity, str(price)] for dish_id, (quantity, price) in self._lines.items()
+            },
+        }
+
+    def save(self):
+        if self.modified:
+            self.session[SESSION_KEY] = self.as_dict()
+            self.session.modified = True
+            self.modified = False
@@ -0,0 +1,276 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import metrics
+from .models import Category, Dish, Restaurant
+
+DEFAULTS = {
+    "ALIAS": "default",
+    "RESTAURANTS_TTL": 300,
+    "MENU_TTL": 3600,
+    "PREFIX": "catalog",
+}
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _config(name):
+    return getattr(settings, "CATALOG_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def _cache():
+    return caches[_config("ALIAS")]
+
+
+def _key(*parts):
+    return ":".join([_config("PREFIX"), *(str(part) for part in parts)])
+
+
+def _record(hit):
+    metrics.CATALOG_CACHE.inc("hit" if hit else "miss")
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+
+
+def stats():
+    with _stats_lock:
+        total = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": round(_stats["hits"] / total, 4) if total else 0.0,
+        }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats["hits"] = _stats["misses"] = 0
+
+
+# Versions start from a millisecond clock instead of 1 so that a counter
+# evicted from the cache can never come back lower than a value that was
+# already used to build a key.
+def _version(name):
+    key = _key("version", name)
+    value = _cache().get(key)
+    if value is None:
+        value = int(time.time() * 1000)
+        if not _cache().add(key, value, timeout=None):
+            value = _cache().get(key, value)
+    return value
+
+
+def _bump_now(name):
+    key = _key("version", name)
+    try:
+        _cache().incr(key)
+    except ValueError:
+        _cache().set(key, int(time.time() * 1000), timeout=None)
+
+
+def _bump(name):
+    # Bump straight away so this process stops serving the old menu, and again
+    # after commit so a reader that rebuilt it mid-transaction is discarded.
+    _bump_now(name)
+    transaction.on_commit(lambda: _bump_now(name))
+
+
+def bump_restaurant(restaurant_id):
+    if restaurant_id:
+        _bump(f"restaurant:{restaurant_id}")
+
+
+def bump_restaurant_list():
+    _bump("restaurants")
+
+
+def bump_categories():
+    _bump("categories")
+
+
+def forget_dish(dish_id):
+    _cache().delete(_key("dish", dish_id))
+
+
+def _read_through(key, ttl, build):
+    value = _cache().get(key)
+    if value is not None:
+        _record(True)
+        return value
+    _record(False)
+    value = build()
+    _cache().set(key, value, timeout=ttl)
+    return value
+
+
+def cached(name, build):
+    # Read-through cache for values derived from versioned catalog data;
+    # ``name`` must embed the versions it was built from.
+    return _read_through(_key(name), _config("MENU_TTL"), build)
+
+
+def _restaurant_row(restaurant):
+    return {
+        "id": restaurant.id,
+        "name": restaurant.name,
+        "address": restaurant.address,
+        "is_active": restaurant.is_active,
+        "image_url": restaurant.image_url,
+        "latitude": restaurant.latitude,
+        "longitude": restaurant.longitude,
+    }
+
+
+def _dish_row(dish, restaurant_row):
+    return {
+        "id": dish.id,
+        "restaurant_id": dish.restaurant_id,
+        "restaurant": restaurant_row,
+        "category_id": dish.category_id,
+        "name": dish.name,
+        "description": dish.description,
+        "price": dish.price,
+        "rating": dish.rating,
+        "is_veg": dish.is_veg,
+        "is_available": dish.is_available,
+        "image_url": dish.image_url,
+        "image_urls": dish.image_urls,
+    }
+
+
+def restaurants_version():
+    return _version("restaurants")
+
+
+def menu_version(restaurant_id):
+    return _version(f"restaurant:{restaurant_id}")
+
+
+def categories_version():
+    return _version("categories")
+
+
+def get_categories():
+    key = _key("categories", categories_version())
+
+    def build():
+        return list(Category.objects.order_by("name").values("id", "name"))
+
+    return _read_through(key, _config("MENU_TTL"), build)
+
+
+def get_restaurants():
+    key = _key("restaurants", restaurants_version())
+
+    def build():
+        restaurants = Restaurant.objects.filter(is_active=True).order_by("name")
+        return [_restaurant_row(restaurant) for restaurant in restaurants]
+
+    return _read_through(key, _config("RESTAURANTS_TTL"), build)
+
+
+def _build_menu(restaurant_id):
+    restaurant = Restaurant.objects.filter(id=restaurant_id).first()
+    if restaurant is None:
+        return {"restaurant": None, "categories": [], "dishes": []}
+    restaurant_row = _restaurant_row(restaurant)
+    dishes = (
+        Dish.objects.filter(restaurant_id=restaurant_id)
+        .select_related("category")
+        .prefetch_related("images")
+        .order_by("name", "id")
+    )
+    rows = []
+    categories = {}
+    for dish in dishes:
+        rows.append(_dish_row(dish, restaurant_row))
+        if dish.category_id:
+            categories[dish.category_id] = {"id": dish.category_id, "name": dish.category.name}
+    return {
+        "restaurant": restaurant_row,
+        "categories": sorted(categories.values(), key=lambda c: c["name"]),
+        "dishes": rows,
+    }
+
+
+def get_menu(restaurant_id):
+    try:
+        restaurant_id = int(restaurant_id)
+    except (TypeError, ValueError):
+        return None
+    key = _key(
+        "menu",
+        restaurant_id,
+        categories_version(),
+        menu_version(restaurant_id),
+    )
+    menu = _read_through(key, _config("MENU_TTL"), lambda: _build_menu(restaurant_id))
+    return menu if menu["restaurant"] else None
+
+
+def get_dishes(dish_ids):
+    dish_ids = {int(dish_id) for dish_id in dish_ids}
+    if not dish_ids:
+        return {}
+    owner_keys = {_key("dish", dish_id): dish_id for dish_id in dish_ids}
+    owners = {owner_keys[key]: value for key, value in _cache().get_many(owner_keys).items()}
+    missing = dish_ids - owners.keys()
+    if missing:
+        found = dict(Dish.objects.filter(id__in=missing).values_list("id", "restaurant_id"))
+        _cache().set_many(
+            {_key("dish", dish_id): owner for dish_id, owner in found.items()},
+            timeout=_config("MENU_TTL"),
+        )
+        owners.update(found)
+    rows = {}
+    for restaurant_id in set(owners.values()):
+        menu = get_menu(restaurant_id)
+        for row in menu["dishes"] if menu else []:
+            if row["id"] in dish_ids:
+                rows[row["id"]] = row
+    return rows
+
+
+def filter_dishes(rows, veg=None, min_rating="", price="", sort=""):
+    rows = [row for row in rows if row["is_available"]]
+    if veg in {"veg", "nonveg"}:
+        rows = [row for row in rows if row["is_veg"] == (veg == "veg")]
+    if min_rating:
+        try:
+            threshold = float(min_rating)
+        except ValueError:
+            threshold = None
+        if threshold is not None:
+            rows = [row for row in rows if float(row["rating"]) >= threshold]
+    if price == "low":
+        rows = [row for row in rows if row["price"] <= 200]
+    elif price == "mid":
+        rows = [row for row in rows if 200 < row["price"] <= 400]
+    elif price == "high":
+        rows = [row for row in rows if row["price"] > 400]
+    if sort == "price_asc":
+        rows.sort(key=lambda row: (row["price"], row["id"]))
+    elif sort == "price_desc":
+        rows.sort(key=lambda row: (row["price"], row["id"]), reverse=True)
+    elif sort == "rating":
+        rows.sort(key=lambda row: (row["rating"], row["id"]), reverse=True)
+    return rows
+
+
+def build_menu_sections(menu, rows=None):
+    rows = menu["dishes"] if rows is None else rows
+    buckets = {}
+    for row in rows:
+        buckets.setdefault(row["category_id"], []).append(row)
+    sections = [
+        {"category": category, "dishes": buckets[category["id"]]}
+        for category in menu["categories"]
+        if category["id"] in buckets
+    ]
+    if None in buckets:
+        sections.append({"category": None, "dishes": buckets[None]})
+    return sections
@@ -0,0 +1,121 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Category, Dish, DishImage, MenuChange, Restaurant
+
+KINDS = {
+    "restaurant": (Restaurant, "restaurants"),
+    "category": (Category, "categories"),
+    "dish": (Dish, "dishes"),
+    "dish_image": (DishImage, "dish_images"),
+}
+
+
+MODEL_KINDS = {model: kind for kind, (model, _) in KINDS.items()}
+
+
+def record(kind, object_ids, deleted=False):
+    # Delete-then-insert moves each object to the head of the sequence.
+    object_ids = [object_id for object_id in object_ids if object_id]
+    if not object_ids:
+        return
+    # A concurrent save of the same object can still insert between the two
+    # statements on Postgres; its row is just as new, so a conflict is skipped.
+    with transaction.atomic():
+        MenuChange.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        MenuChange.objects.bulk_create(
+            [MenuChange(kind=kind, object_id=object_id, deleted=deleted) for object_id in object_ids],
+            ignore_conflicts=True,
+        )
+
+
+def _url(name):
+    return default_storage.url(name) if name else None
+
+
+def _restaurant_rows(ids):
+    rows = Restaurant.objects.filter(id__in=ids).values(
+        "id", "name", "address", "is_active", "image", "latitude", "longitude"
+    )
+    return [
+        {
+            **row,
+            "image": _url(row["image"]),
+            "latitude": float(row["latitude"]) if row["latitude"] is not None else None,
+            "longitude": float(row["longitude"]) if row["longitude"] is not None else None,
+        }
+        for row in rows
+    ]
+
+
+def _category_rows(ids):
+    return list(Category.objects.filter(id__in=ids).values("id", "name"))
+
+
+def _dish_rows(ids):
+    rows = Dish.objects.filter(id__in=ids).values(
+        "id",
+        "restaurant_id",
+        "category_id",
+        "name",
+        "description",
+        "price",
+        "rating",
+        "is_veg",
+        "is_available",
+        "image",
+    )
+    return [
+        {**row, "price": str(row["price"]), "rating": str(row["rating"]), "image": _url(row["image"])}
+        for row in rows
+    ]
+
+
+def _dish_image_rows(ids):
+    rows = DishImage.objects.filter(id__in=ids).values("id", "dish_id", "image")
+    return [{**row, "image": _url(row["image"])} for row in rows]
+
+
+ROWS = {
+    "restaurant": _restaurant_rows,
+    "category": _category_rows,
+    "dish": _dish_rows,
+    "dish_image": _dish_image_rows,
+}
+
+
+def since(seq, limit, lag=0):
+    # {"seq", "more", "<plural>": [rows], "deleted": {"<plural>": [ids]}}
+    # for changes after ``seq``; clients pass the returned seq back next time.
+    pending = MenuChange.objects.filter(id__gt=seq)
+    if lag:
+        # Ids are handed out at insert but only become visible at commit, so
+        # on Postgres a lower id can appear after a client has passed it.
+        # Stopping before the first change younger than ``lag`` seconds gives
+        # such transactions that long to commit. SQLite serialises writers
+        # and needs no lag.
+        cutoff = timezone.now() - timedelta(seconds=lag)
+        recent = pending.filter(changed_at__gt=cutoff).order_by("id").values_list("id", flat=True).first()
+        if recent is not None:
+            pending = pending.filter(id__lt=recent)
+    changes = list(
+        pending.order_by("id").values_list("id", "kind", "object_id", "deleted")[: limit + 1]
+    )
+    more = len(changes) > limit
+    changes = changes[:limit]
+    changed = {kind: [] for kind in KINDS}
+    deleted = {kind: [] for kind in KINDS}
+    for _, kind, object_id, is_deleted in changes:
+        (deleted if is_deleted else changed)[kind].append(object_id)
+    payload = {"seq": changes[-1][0] if changes else seq, "more": more, "deleted": {}}
+    for kind, (_, plural) in KINDS.items():
+        rows = ROWS[kind](changed[kind]) if changed[kind] else []
+        found = {row["id"] for row in rows}
+        # A row deleted after its change was read is reported as a tombstone.
+        gone = [object_id for object_id in changed[kind] if object_id not in found]
+        payload[plural] = sorted(rows, key=lambda row: row["id"])
+        payload["deleted"][plural] = sorted(deleted[kind] + gone)
+    return payload
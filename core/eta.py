@@ -0,0 +1,298 @@
+import http.client
+import json
+import queue
+import threading
+import time
+import urllib.parse
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from . import metrics, timing
+from .geo import geohash, haversine_m
+
+DEFAULTS = {
+    "PROVIDER": "auto",
+    "CACHE_ALIAS": "default",
+    "CACHE_TTL": 600,
+    "FALLBACK_CACHE_TTL": 60,
+    "GEOHASH_PRECISION": 6,
+    "TIMEOUT": 2.0,
+    "COOLDOWN": 30,
+    "AVERAGE_SPEED_KMH": 20.0,
+    "ROAD_FACTOR": 1.3,
+    "POOL_SIZE": 4,
+}
+
+
+class ProviderError(Exception):
+    pass
+
+
+def _config(name):
+    return getattr(settings, "ETA", {}).get(name, DEFAULTS[name])
+
+
+def format_duration(seconds):
+    minutes = max(1, round(seconds / 60))
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours > 1 else ''}")
+    if minutes:
+        parts.append(f"{minutes} min{'s' if minutes > 1 else ''}")
+    return " ".join(parts)
+
+
+class HaversineProvider:
+    name = "haversine"
+
+    def __init__(self, speed_kmh=None, road_factor=None):
+        self.speed_mps = (speed_kmh or _config("AVERAGE_SPEED_KMH")) * 1000 / 3600
+        self.road_factor = road_factor or _config("ROAD_FACTOR")
+
+    def estimate_many(self, origin, destinations):
+        results = []
+        for lat, lng in destinations:
+            distance = haversine_m(origin[0], origin[1], lat, lng) * self.road_factor
+            seconds = int(distance / self.speed_mps)
+            results.append(
+                {
+                    "duration_seconds": seconds,
+                    "duration_text": format_duration(seconds),
+                    "distance_meters": int(distance),
+                }
+            )
+        return results
+
+
+class GoogleDistanceMatrixProvider:
+    name = "google"
+    host = "maps.googleapis.com"
+    path = "/maps/api/distancematrix/json"
+    max_destinations = 25
+
+    def __init__(self, api_key=None, timeout=None, pool_size=None):
+        self.api_key = api_key or settings.GOOGLE_MAPS_API_KEY
+        self.timeout = timeout or _config("TIMEOUT")
+        self._pool = queue.LifoQueue(maxsize=pool_size or _config("POOL_SIZE"))
+
+    def _connection(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _get(self, params):
+        conn = self._connection()
+        try:
+            conn.request("GET", f"{self.path}?{urllib.parse.urlencode(params)}")
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            conn.close()
+            raise ProviderError(str(exc)) from exc
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        if response.status != 200:
+            raise ProviderError(f"HTTP {response.status}")
+        return json.loads(body.decode("utf-8"))
+
+    def estimate_many(self, origin, destinations):
+        if not self.api_key:
+            raise ProviderError("API key not configured")
+        results = []
+        for start in range(0, len(destinations), self.max_destinations):
+            results.extend(
+                self._estimate_chunk(origin, destinations[start:start + self.max_destinations])
+            )
+        return results
+
+    def _estimate_chunk(self, origin, destinations):
+        data = self._get(
+            {
+                "origins": f"{origin[0]},{origin[1]}",
+                "destinations": "|".join(f"{lat},{lng}" for lat, lng in destinations),
+                "key": self.api_key,
+            }
+        )
+        if not isinstance(data, dict):
+            raise ProviderError("Unexpected response")
+        if data.get("status") != "OK":
+            raise ProviderError(str(data.get("status", "API error")))
+        # One origin, so exactly one row with an element per destination;
+        # anything else would misalign results with their restaurants.
+        rows = data.get("rows")
+        if not isinstance(rows, list) or len(rows) != 1 or not isinstance(rows[0], dict):
+            raise ProviderError("Unexpected rows in response")
+        elements = rows[0].get("elements")
+        if not isinstance(elements, list) or len(elements) != len(destinations):
+            raise ProviderError("Response does not match the destinations")
+        results = []
+        for element in elements:
+            if not isinstance(element, dict):
+                raise ProviderError("Unexpected element in response")
+            if element.get("status") != "OK":
+                results.append(None)
+                continue
+            duration = element.get("duration")
+            distance = element.get("distance") or {}
+            if (
+                not isinstance(duration, dict)
+                or not isinstance(duration.get("value"), (int, float))
+                or not isinstance(distance, dict)
+            ):
+                raise ProviderError("Unexpected element in response")
+            results.append(
+                {
+                    "duration_seconds": duration["value"],
+                    "duration_text": str(duration.get("text") or format_duration(duration["value"])),
+                    "distance_meters": distance.get("value"),
+                }
+            )
+        return results
+
+
+class FakeProvider:
+    name = "fake"
+
+    def __init__(self, seconds=600, error=None, delay=0):
+        self.seconds = seconds
+        self.error = error
+        self.delay = delay
+        self.calls = []
+
+    def estimate_many(self, origin, destinations):
+        self.calls.append((origin, list(destinations)))
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return [
+            {
+                "duration_seconds": self.seconds,
+                "duration_text": format_duration(self.seconds),
+                "distance_meters": None,
+            }
+            for _ in destinations
+        ]
+
+
+PROVIDERS = {
+    "haversine": HaversineProvider,
+    "google": GoogleDistanceMatrixProvider,
+    "fake": FakeProvider,
+}
+
+
+class EtaService:
+    def __init__(self, provider, fallback=None, cache_alias=None):
+        self.provider = provider
+        self.fallback = fallback or HaversineProvider()
+        self.cache = caches[cache_alias or _config("CACHE_ALIAS")]
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+
+    def cell(self, lat, lng):
+        return geohash(lat, lng, _config("GEOHASH_PRECISION"))
+
+    def _key(self, restaurant_id, cell):
+        return f"eta:{restaurant_id}:{cell}"
+
+    def _provider_available(self):
+        return self.provider is not self.fallback and time.monotonic() >= self._down_until
+
+    def _mark_down(self):
+        with self._lock:
+            self._down_until = time.monotonic() + _config("COOLDOWN")
+
+    def _compute(self, origin, destinations):
+        if destinations and self._provider_available():
+            began = time.perf_counter()
+            try:
+                with timing.span("eta"):
+                    results = self.provider.estimate_many(origin, destinations)
+            except (ProviderError, OSError, ValueError, KeyError):
+                metrics.ETA_PROVIDER_LATENCY.observe(time.perf_counter() - began, self.provider.name, "error")
+                self._mark_down()
+            else:
+                metrics.ETA_PROVIDER_LATENCY.observe(time.perf_counter() - began, self.provider.name, "ok")
+                missing = [i for i, result in enumerate(results) if result is None]
+                local = self.fallback.estimate_many(origin, [destinations[i] for i in missing])
+                for index, result in zip(missing, local):
+                    results[index] = {**result, "source": self.fallback.name}
+                return [
+                    result if "source" in result else {**result, "source": self.provider.name}
+                    for result in results
+                ]
+        return [
+            {**result, "source": self.fallback.name}
+            for result in self.fallback.estimate_many(origin, destinations)
+        ]
+
+    def estimate_many(self, lat, lng, restaurants):
+        # ``restaurants`` is an iterable of (id, latitude, longitude).
+        lat, lng = float(lat), float(lng)
+        cell = self.cell(lat, lng)
+        restaurants = list(restaurants)
+        keys = {self._key(rid, cell): rid for rid, _, _ in restaurants}
+        found = {keys[key]: value for key, value in self.cache.get_many(keys).items()}
+        pending = [r for r in restaurants if r[0] not in found]
+        if pending:
+            computed = self._compute(
+                (lat, lng), [(float(r_lat), float(r_lng)) for _, r_lat, r_lng in pending]
+            )
+            fresh = {}
+            stale = {}
+            for (rid, _, _), result in zip(pending, computed):
+                found[rid] = result
+                target = fresh if result["source"] == self.provider.name else stale
+                target[self._key(rid, cell)] = result
+            if fresh:
+                self.cache.set_many(fresh, timeout=_config("CACHE_TTL"))
+            if stale:
+                # Local estimates are cached briefly so the remote provider is
+                # retried soon after it recovers.
+                self.cache.set_many(stale, timeout=_config("FALLBACK_CACHE_TTL"))
+        return found
+
+    def estimate(self, lat, lng, restaurant):
+        return self.estimate_many(
+            lat, lng, [(restaurant.id, restaurant.latitude, restaurant.longitude)]
+        )[restaurant.id]
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def _build_provider():
+    name = _config("PROVIDER")
+    if name == "auto":
+        name = "google" if settings.GOOGLE_MAPS_API_KEY else "haversine"
+    if name in PROVIDERS:
+        return PROVIDERS[name]()
+    return import_string(name)()
+
+
+def get_service():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EtaService(_build_provider())
+    return _service
+
+
+def set_service(service):
+    global _service
+    _service = service
@@ -0,0 +1,184 @@
+import heapq
+import math
+import threading
+
+from django.conf import settings
+from django.db.models import ExpressionWrapper, FloatField, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+from . import catalog
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def geohash(lat, lng, precision=6):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        target, value = (lng_range, lng) if even else (lat_range, lat)
+        middle = (target[0] + target[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            target[0] = middle
+        else:
+            bits <<= 1
+            target[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def bounding_box(lat, lng, radius_m):
+    # Smallest lat/lng box holding every point within radius_m by haversine_m,
+    # so a box prefilter never drops a point the exact check would keep.
+    angle = radius_m / EARTH_RADIUS_M
+    d_lat = math.degrees(angle)
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat <= math.sin(angle):
+        d_lng = 180.0
+    else:
+        d_lng = math.degrees(math.asin(math.sin(angle) / cos_lat))
+    return lat - d_lat, lat + d_lat, lng - d_lng, lng + d_lng
+
+
+class GridIndex:
+    # Buckets points into fixed-size lat/lng cells so radius and k-nearest
+    # queries only look at the cells around the origin.
+
+    def __init__(self, points=(), cell_deg=0.05):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.size = 0
+        for key, lat, lng in points:
+            self.add(key, lat, lng)
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def add(self, key, lat, lng):
+        lat, lng = float(lat), float(lng)
+        self.cells.setdefault(self._cell(lat, lng), []).append((key, lat, lng))
+        self.size += 1
+
+    def _ring(self, center, radius):
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for d in range(-radius, radius + 1):
+            yield (row - radius, col + d)
+            yield (row + radius, col + d)
+        for d in range(-radius + 1, radius):
+            yield (row + d, col - radius)
+            yield (row + d, col + radius)
+
+    def within(self, lat, lng, radius_m):
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_m)
+        low = self._cell(min_lat, min_lng)
+        high = self._cell(max_lat, max_lng)
+        found = []
+        for row in range(low[0], high[0] + 1):
+            for col in range(low[1], high[1] + 1):
+                for key, p_lat, p_lng in self.cells.get((row, col), ()):
+                    distance = haversine_m(lat, lng, p_lat, p_lng)
+                    if distance <= radius_m:
+                        found.append((distance, key))
+        found.sort()
+        return found
+
+    def nearest(self, lat, lng, k, max_radius_m=None):
+        if not self.size or k <= 0:
+            return []
+        center = self._cell(lat, lng)
+        # Smallest distance covered by a full ring of cells, so once the k-th
+        # best candidate is closer than that no further ring can beat it.
+        cell_m = self.cell_deg * METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6)
+        best = []
+        seen = 0
+        radius = 0
+        while seen < self.size:
+            for cell in self._ring(center, radius):
+                for key, p_lat, p_lng in self.cells.get(cell, ()):
+                    seen += 1
+                    distance = haversine_m(lat, lng, p_lat, p_lng)
+                    if max_radius_m is not None and distance > max_radius_m:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, key))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, key))
+            covered = radius * cell_m
+            if len(best) == k and -best[0][0] <= covered:
+                break
+            if max_radius_m is not None and covered > max_radius_m:
+                break
+            radius += 1
+        return sorted((-distance, key) for distance, key in best)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def restaurant_index():
+    global _index
+    version = catalog.restaurants_version()
+    if _index is None or _index[0] != version:
+        with _index_lock:
+            if _index is None or _index[0] != version:
+                rows = [
+                    (row["id"], row["latitude"], row["longitude"])
+                    for row in catalog.get_restaurants()
+                    if row["latitude"] is not None and row["longitude"] is not None
+                ]
+                _index = (version, GridIndex(rows))
+    return _index[1]
+
+
+def annotate_distance(queryset, lat, lng, name, radius_m=None, prefix="restaurant__"):
+    # Keeps rows whose (active) restaurant lies within radius_m and annotates
+    # ``name`` with its haversine distance in metres, computed in SQL with the
+    # same formula as haversine_m() so the cut-off agrees with GridIndex and
+    # /restaurants/nearby/. The bounding box is served by
+    # restaurant_active_latlng_idx, and the parameter count does not grow
+    # with the number of nearby restaurants.
+    radius_m = radius_m or settings.NEARBY_RADIUS_KM * 1000
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_m)
+    phi1 = math.radians(lat)
+    phi2 = Radians(Cast(f"{prefix}latitude", FloatField()))
+    d_phi = phi2 - Value(phi1)
+    d_lambda = Radians(Cast(f"{prefix}longitude", FloatField()) - Value(lng))
+    a = Power(Sin(d_phi / Value(2.0)), 2) + Value(math.cos(phi1)) * Cos(phi2) * Power(
+        Sin(d_lambda / Value(2.0)), 2
+    )
+    distance = Value(2 * EARTH_RADIUS_M) * ASin(Sqrt(a))
+    return (
+        queryset.filter(
+            **{
+                f"{prefix}is_active": True,
+                f"{prefix}latitude__range": (min_lat, max_lat),
+                f"{prefix}longitude__range": (min_lng, max_lng),
+            }
+        )
+        .annotate(**{name: ExpressionWrapper(distance, output_field=FloatField())})
+        .filter(**{f"{name}__lte": radius_m})
+    )
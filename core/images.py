@@ -0,0 +1,273 @@
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+from urllib.parse import unquote
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils._os import safe_join
+from PIL import Image, ImageOps
+
+DEFAULTS = {
+    "WIDTHS": (160, 320, 640),
+    "FORMATS": ("webp", "jpeg"),
+    "QUALITY": 80,
+    "PREFIX": "variants",
+    "CACHE_ALIAS": "default",
+}
+
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+RESIZE_DEFAULTS = {
+    "SIZES": ("80x80", "160x160", "320x0", "320x200", "480x0", "640x0", "640x400", "960x0"),
+    "CACHE_ROOT": None,
+    "MAX_CACHE_BYTES": 256 * 1024 * 1024,
+    "MAX_AGE": 30 * 24 * 3600,
+}
+
+# Striped locks bound memory while still serialising work per cache key
+# inside a process; flock() extends that across worker processes.
+_stripes = [threading.Lock() for _ in range(64)]
+_evict_lock = threading.Lock()
+_cache_bytes = None
+
+
+def _config(name):
+    return getattr(settings, "IMAGE_VARIANTS", {}).get(name, DEFAULTS[name])
+
+
+def _cache():
+    return caches[_config("CACHE_ALIAS")]
+
+
+def _marker_key(name):
+    return "images:variants:" + hashlib.md5(name.encode("utf-8")).hexdigest()
+
+
+def name_from_url(url):
+    if url and url.startswith(settings.MEDIA_URL):
+        return unquote(url[len(settings.MEDIA_URL):])
+    return None
+
+
+def variant_name(name, width, fmt):
+    base, _ = os.path.splitext(name)
+    return f"{_config('PREFIX')}/{base}.{width}w.{EXTENSIONS[fmt]}"
+
+
+def open_image(fp, target=None):
+    image = Image.open(fp)
+    if target and image.format == "JPEG":
+        # Let libjpeg decode at a reduced scale when the output is small.
+        image.draft("RGB", target)
+    return ImageOps.exif_transpose(image)
+
+
+def scale_to_width(image, width):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def encode(image, fmt, quality=None):
+    quality = quality or _config("QUALITY")
+    if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+    elif fmt == "webp" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    buffer = BytesIO()
+    options = {"quality": quality}
+    if fmt == "jpeg":
+        options.update(optimize=True, progressive=True)
+    else:
+        options["method"] = 4
+    image.save(buffer, PIL_FORMATS[fmt], **options)
+    return buffer.getvalue()
+
+
+def generate_variants(name, storage=None):
+    storage = storage or default_storage
+    widths = sorted(_config("WIDTHS"), reverse=True)
+    with storage.open(name, "rb") as source:
+        image = open_image(source, (widths[0], widths[0]))
+        image.load()
+    written = []
+    # Largest first, each step scaled from the previous one.
+    for width in widths:
+        image = scale_to_width(image, width)
+        for fmt in _config("FORMATS"):
+            target = variant_name(name, width, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            written.append(storage.save(target, ContentFile(encode(image, fmt))))
+    _cache().set(_marker_key(name), True, timeout=None)
+    return written
+
+
+def has_variants(name):
+    if not name:
+        return False
+    key = _marker_key(name)
+    found = _cache().get(key)
+    if found is None:
+        fmt = _config("FORMATS")[-1]
+        found = default_storage.exists(variant_name(name, min(_config("WIDTHS")), fmt))
+        _cache().set(key, found, timeout=None if found else 60)
+    return found
+
+
+def srcsets(url):
+    # {"webp": "... 160w, ...", "jpeg": ...} for a media URL, or None when the
+    # variants have not been generated yet.
+    name = name_from_url(url)
+    if not name or not has_variants(name):
+        return None
+    return {
+        fmt: ", ".join(
+            f"{default_storage.url(variant_name(name, width, fmt))} {width}w"
+            for width in sorted(_config("WIDTHS"))
+        )
+        for fmt in _config("FORMATS")
+    }
+
+
+def _resize_config(name):
+    return getattr(settings, "IMAGE_RESIZE", {}).get(name, RESIZE_DEFAULTS[name])
+
+
+def cache_max_age():
+    return _resize_config("MAX_AGE")
+
+
+def allowed_size(width, height):
+    return f"{width}x{height}" in _resize_config("SIZES")
+
+
+def fit(image, width, height):
+    # height 0 keeps the aspect ratio; otherwise crop to fill the box.
+    if not height:
+        return scale_to_width(image, width)
+    return ImageOps.fit(image, (width, height), Image.LANCZOS)
+
+
+def _cache_root():
+    return os.path.abspath(_resize_config("CACHE_ROOT") or os.path.join(settings.BASE_DIR, "var", "img-cache"))
+
+
+@contextmanager
+def _key_lock(key):
+    with _stripes[int(key[:8], 16) % len(_stripes)]:
+        if fcntl is None:
+            yield
+            return
+        lock_dir = os.path.join(_cache_root(), "locks")
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, f"{key[:2]}.lock"), "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _cached_files(root):
+    for directory, _, files in os.walk(root):
+        if os.path.basename(directory) == "locks":
+            continue
+        for filename in files:
+            if filename.startswith("."):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def evict(root=None, limit=None):
+    # Least recently used first: hits refresh a file's mtime.
+    global _cache_bytes
+    root = root or _cache_root()
+    limit = _resize_config("MAX_CACHE_BYTES") if limit is None else limit
+    if not _evict_lock.acquire(blocking=False):
+        return 0
+    try:
+        entries = sorted(_cached_files(root))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        target = limit * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        _cache_bytes = total
+        return removed
+    finally:
+        _evict_lock.release()
+
+
+def _account(size):
+    global _cache_bytes
+    if _cache_bytes is None:
+        _cache_bytes = sum(size for _, size, _ in _cached_files(_cache_root()))
+    else:
+        _cache_bytes += size
+    if _cache_bytes > _resize_config("MAX_CACHE_BYTES"):
+        evict()
+
+
+def resized(path, width, height, fmt):
+    # Returns {"path", "etag", "last_modified", "content_type"} for a cached
+    # rendition of MEDIA_ROOT/path, building it on first use.
+    source = safe_join(settings.MEDIA_ROOT, path)
+    stat = os.stat(source)
+    signature = f"{path}:{stat.st_mtime_ns}:{stat.st_size}:{width}x{height}:{fmt}:{_config('QUALITY')}"
+    key = hashlib.sha256(signature.encode("utf-8")).hexdigest()
+    target = os.path.join(_cache_root(), key[:2], f"{key[2:]}.{EXTENSIONS[fmt]}")
+    artifact = {
+        "path": target,
+        "etag": key[:32],
+        # Whole seconds, as HTTP dates are; see get_conditional_response.
+        "last_modified": int(stat.st_mtime),
+        "content_type": CONTENT_TYPES[fmt],
+    }
+    try:
+        os.utime(target)
+        return artifact
+    except FileNotFoundError:
+        pass
+    with _key_lock(key):
+        if os.path.exists(target):
+            return artifact
+        with open(source, "rb") as handle:
+            image = open_image(handle, (width, height or width))
+            data = encode(fit(image, width, height), fmt)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp, target)
+    _account(len(data))
+    return artifact
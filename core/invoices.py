@@ -0,0 +1,175 @@
+import hashlib
+import json
+import time
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+from . import metrics
+
+# Bump when the PDF layout changes so previously cached artifacts are ignored.
+LAYOUT_VERSION = "v1"
+
+
+def build_invoice_pdf(order, items=None):
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import cm
+        from reportlab.pdfgen import canvas
+    except ImportError:
+        return None
+
+    if items is None:
+        items = order.items.select_related("dish", "dish__restaurant")
+    items_list = list(items)
+    restaurant = items_list[0].dish.restaurant if items_list else None
+    subtotal = sum(item.price * item.quantity for item in items_list)
+    cgst_rate = Decimal("0.025")
+    sgst_rate = Decimal("0.025")
+    cgst = subtotal * cgst_rate
+    sgst = subtotal * sgst_rate
+    grand_total = subtotal + cgst + sgst
+
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    width, height = A4
+
+    pdf.setTitle(f"Invoice-{order.id}")
+    pdf.setFillColorRGB(0.97, 0.45, 0.09)
+    pdf.rect(0, height - 3 * cm, width, 3 * cm, stroke=0, fill=1)
+    pdf.setFillColorRGB(1, 1, 1)
+    pdf.setFont("Helvetica-Bold", 18)
+    pdf.drawString(2 * cm, height - 2.0 * cm, "FoodBooking Invoice")
+
+    pdf.setFillColorRGB(0, 0, 0)
+    pdf.setFont("Helvetica", 11)
+    pdf.drawString(2 * cm, height - 3.6 * cm, f"Order ID: {order.id}")
+    pdf.drawString(2 * cm, height - 4.3 * cm, f"Date: {order.created_at:%b %d, %Y %H:%M}")
+    pdf.drawString(2 * cm, height - 5.0 * cm, f"Customer: {order.customer_name}")
+    pdf.drawString(2 * cm, height - 5.7 * cm, f"Phone: {order.customer_phone}")
+    pdf.drawString(2 * cm, height - 6.4 * cm, f"Delivery Address: {order.address}")
+    pdf.drawString(2 * cm, height - 7.1 * cm, f"Payment: {order.payment_method}")
+
+    if restaurant:
+        pdf.setFont("Helvetica-Bold", 11)
+        pdf.drawString(12 * cm, height - 3.6 * cm, "Restaurant")
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(12 * cm, height - 4.2 * cm, restaurant.name)
+        pdf.drawString(12 * cm, height - 4.8 * cm, (restaurant.address or "-")[:38])
+
+    y = height - 8.5 * cm
+    pdf.setStrokeColor(colors.lightgrey)
+    pdf.line(2 * cm, y, width - 2 * cm, y)
+    y -= 0.6 * cm
+
+    pdf.setFont("Helvetica-Bold", 11)
+    pdf.drawString(2 * cm, y, "Item")
+    pdf.drawString(10 * cm, y, "Qty")
+    pdf.drawString(12 * cm, y, "Price")
+    pdf.drawString(15 * cm, y, "Total")
+    y -= 0.4 * cm
+    pdf.line(2 * cm, y, width - 2 * cm, y)
+    y -= 0.6 * cm
+
+    pdf.setFont("Helvetica", 10)
+    for item in items_list:
+        if y < 3 * cm:
+            pdf.showPage()
+            y = height - 2 * cm
+        line_total = item.price * item.quantity
+        pdf.drawString(2 * cm, y, item.dish.name)
+        pdf.drawRightString(11 * cm, y, str(item.quantity))
+        pdf.drawRightString(14 * cm, y, f"{item.price}")
+        pdf.drawRightString(18 * cm, y, f"{line_total}")
+        y -= 0.6 * cm
+
+    y -= 0.4 * cm
+    pdf.setFont("Helvetica", 10)
+    pdf.drawRightString(18 * cm, y, f"Subtotal: {subtotal:.2f}")
+    y -= 0.5 * cm
+    pdf.drawRightString(18 * cm, y, f"CGST (2.5%): {cgst:.2f}")
+    y -= 0.5 * cm
+    pdf.drawRightString(18 * cm, y, f"SGST (2.5%): {sgst:.2f}")
+    y -= 0.6 * cm
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawRightString(18 * cm, y, f"Grand Total: {grand_total:.2f}")
+
+    y -= 1.2 * cm
+    pdf.setFont("Helvetica-Oblique", 10)
+    pdf.drawString(2 * cm, y, "“Good food is the foundation of genuine happiness.”")
+    y -= 0.5 * cm
+    pdf.drawString(2 * cm, y, "Thank you for ordering with FoodBooking!")
+
+    pdf.showPage()
+    pdf.save()
+    buffer.seek(0)
+    return buffer.read()
+
+
+def storage():
+    return FileSystemStorage(location=settings.INVOICE_CACHE_ROOT)
+
+
+def input_digest(order, items):
+    restaurant = items[0].dish.restaurant if items else None
+    inputs = {
+        "layout": LAYOUT_VERSION,
+        "order": [
+            order.id,
+            order.created_at.isoformat(),
+            order.customer_name,
+            order.customer_phone,
+            order.address,
+            order.payment_method,
+        ],
+        "restaurant": [restaurant.name, restaurant.address] if restaurant else None,
+        "items": [[item.dish.name, item.quantity, str(item.price)] for item in items],
+    }
+    encoded = json.dumps(inputs, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def _artifact(store, name):
+    return {
+        "name": name,
+        "etag": name.rsplit("/", 1)[-1][: -len(".pdf")],
+        "last_modified": store.get_modified_time(name),
+        "size": store.size(name),
+    }
+
+
+def cached_invoice(order):
+    # Artifacts live at <layout>/<order id>/<input digest>.pdf, so renaming a
+    # dish or restaurant on the invoice yields a new file (and ETag) while an
+    # unchanged invoice is served without re-rendering.
+    store = storage()
+    folder = f"{LAYOUT_VERSION}/{order.id}"
+    items = list(order.items.select_related("dish", "dish__restaurant"))
+    name = f"{folder}/{input_digest(order, items)}.pdf"
+    if store.exists(name):
+        return _artifact(store, name)
+    began = time.perf_counter()
+    pdf_bytes = build_invoice_pdf(order, items)
+    if pdf_bytes is None:
+        return None
+    metrics.INVOICE_PDF_BUILD.observe(time.perf_counter() - began)
+    saved = store.save(name, ContentFile(pdf_bytes))
+    if saved != name:
+        # A concurrent request stored the same artifact first; keep that one.
+        store.delete(saved)
+    for filename in store.listdir(folder)[1]:
+        if filename.endswith(".pdf") and f"{folder}/{filename}" != name:
+            store.delete(f"{folder}/{filename}")
+    return _artifact(store, name)
+
+
+def cached_invoice_bytes(order):
+    artifact = cached_invoice(order)
+    if artifact is None:
+        return None
+    with storage().open(artifact["name"], "rb") as handle:
+        return handle.read()
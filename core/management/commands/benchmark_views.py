@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Drive the main views through the test client and report latency, query counts and peak memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=sorted(benchmarks.SCENARIOS),
+            help="Only run this scenario; repeatable.",
+        )
+        parser.add_argument(
+            "--enforce", action="store_true", help="Fail if a view exceeds its query budget or errors."
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be positive.")
+        try:
+            results = benchmarks.run(options["scenario"], options["iterations"], options["warmup"])
+        except benchmarks.BenchmarkError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f"{'scenario':<24}{'status':>7}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'budget':>8}{'peak KiB':>10}"
+        )
+        failures = []
+        for row in results:
+            self.stdout.write(
+                f"{row['name']:<24}{row['status']:>7}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+                f"{row['queries']:>9}{row['budget']:>8}{row['peak_kib']:>10}"
+            )
+            if row["status"] >= 400 or row["queries"] > row["budget"]:
+                failures.append(row["name"])
+        if failures and options["enforce"]:
+            raise CommandError(f"Over budget or failing: {', '.join(failures)}")
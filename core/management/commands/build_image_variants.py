@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.models import Dish, DishImage, Restaurant
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants for every uploaded restaurant and dish image."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate existing variants too.")
+
+    def handle(self, *args, **options):
+        names = set()
+        for model in (Restaurant, Dish, DishImage):
+            names.update(model.objects.exclude(image="").exclude(image=None).values_list("image", flat=True))
+        built = skipped = failed = 0
+        for name in sorted(names):
+            if not options["force"] and images.has_variants(name):
+                skipped += 1
+                continue
+            try:
+                images.generate_variants(name)
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f"{name}: {exc}")
+                continue
+            built += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Built variants for {built} images ({skipped} up to date, {failed} failed).")
+        )
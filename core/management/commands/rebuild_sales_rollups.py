@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sales
+
+
+class Command(BaseCommand):
+    help = "Regenerate the daily sales rollup tables from raw orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--restaurant", type=int, help="Only rebuild this restaurant id.")
+        parser.add_argument("--since", help="Only rebuild days on or after this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError("--since must be a YYYY-MM-DD date.")
+        count = sales.rebuild(restaurant_id=options["restaurant"], since=since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} restaurant-day rollups."))
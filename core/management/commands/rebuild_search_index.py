@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dish full-text search index from the Dish and Restaurant tables."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {backend.name} search index ({count} dishes)."))
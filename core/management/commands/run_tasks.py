@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (invoice emails etc.)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain due tasks once and exit.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when idle.")
+        parser.add_argument("--batch", type=int, default=20, help="Tasks claimed per poll.")
+        parser.add_argument("--threads", type=int, default=1, help="Run claimed tasks concurrently.")
+
+    def handle(self, *args, **options):
+        pool = ThreadPoolExecutor(max_workers=options["threads"]) if options["threads"] > 1 else None
+        try:
+            while True:
+                close_old_connections()
+                if pool:
+                    ids = tasks.due_task_ids(options["batch"])
+                    done = [job for job in pool.map(self._run_one, ids) if job]
+                else:
+                    done = tasks.run_pending(options["batch"])
+                for job in done:
+                    self.stdout.write(f"{job.name} #{job.id}: {job.status}")
+                if options["once"]:
+                    return
+                if not done:
+                    time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
+
+    def _run_one(self, task_id):
+        close_old_connections()
+        try:
+            return tasks.run_task_id(task_id)
+        finally:
+            close_old_connections()
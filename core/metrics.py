@@ -0,0 +1,235 @@
+import atexit
+import glob
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULTS = {
+    "DIR": None,
+    "FLUSH_INTERVAL": 1.0,
+    "TOKEN": "",
+}
+
+PREFIX = "foodbooking_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_values = {}
+_metrics = {}
+# Written once per process; the pid alone could be reused by a later worker
+# and would then overwrite counters it never produced.
+_file_name = f"{os.getpid()}-{time.time_ns()}.json"
+_flusher = None
+_dirty = False
+
+
+def _config(name):
+    return getattr(settings, "METRICS", {}).get(name, DEFAULTS[name])
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _metrics[self.name] = self
+
+    def _key(self, label_values):
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+        return (self.name, tuple(str(value) for value in label_values))
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        key = self._key(label_values)
+        with _lock:
+            _values[key] = _values.get(key, 0) + amount
+        _changed()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        # Stored as [per-bucket counts..., +Inf count, sum]; exposition makes
+        # the buckets cumulative.
+        key = self._key(label_values)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with _lock:
+            state = _values.get(key)
+            if state is None:
+                state = _values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+        _changed()
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by URL name.", ("view", "method", "status")
+)
+CART_OPERATIONS = Counter("cart_operations_total", "Cart changes by operation and outcome.", ("op", "result"))
+CHECKOUTS = Counter("checkouts_total", "Checkout attempts by outcome.", ("result",))
+ORDER_VALUE = Histogram(
+    "order_value_rupees", "Total of placed orders.", buckets=(100, 200, 300, 500, 750, 1000, 1500, 2500, 5000)
+)
+ETA_PROVIDER_LATENCY = Histogram(
+    "eta_provider_duration_seconds", "Remote ETA provider call time.", ("provider", "result")
+)
+CATALOG_CACHE = Counter("catalog_cache_requests_total", "Catalog cache lookups by result.", ("result",))
+INVOICE_PDF_BUILD = Histogram("invoice_pdf_build_seconds", "Time to render an invoice PDF.")
+
+
+def token():
+    return _config("TOKEN")
+
+
+def _directory():
+    return _config("DIR") or os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def _changed():
+    global _dirty, _flusher
+    _dirty = True
+    if _flusher is None and _directory():
+        with _lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+                _flusher.start()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(_config("FLUSH_INTERVAL"))
+        if _dirty:
+            flush()
+
+
+def _snapshot():
+    with _lock:
+        return [[name, list(labels), value] for (name, labels), value in _values.items()]
+
+
+def flush():
+    # Publishes this process's totals for other workers' /metrics scrapes.
+    global _dirty
+    directory = _directory()
+    if not directory:
+        return
+    _dirty = False
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    with os.fdopen(fd, "w") as handle:
+        json.dump(_snapshot(), handle)
+    os.replace(tmp, os.path.join(directory, _file_name))
+
+
+def _after_fork():
+    # Forked workers start from zero under their own file; anything the
+    # parent recorded stays in the parent's file.
+    global _file_name, _flusher, _dirty, _lock
+    _lock = threading.Lock()
+    _file_name = f"{os.getpid()}-{time.time_ns()}.json"
+    _flusher = None
+    _dirty = False
+    _values.clear()
+
+
+def _flush_at_exit():
+    # Importing this module does not mean settings were ever configured
+    # (scripts, tooling), and reading them at exit would then raise.
+    if settings.configured:
+        flush()
+
+
+atexit.register(_flush_at_exit)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _merge(totals, name, labels, value):
+    key = (name, tuple(labels))
+    if isinstance(value, list):
+        current = totals.get(key)
+        totals[key] = value[:] if current is None else [a + b for a, b in zip(current, value)]
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+def collect():
+    # {(name, labels): value} summed over every worker that has flushed,
+    # with this process's live values in place of its own file.
+    totals = {}
+    directory = _directory()
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            if os.path.basename(path) == _file_name:
+                continue
+            try:
+                with open(path) as handle:
+                    rows = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in rows:
+                if name in _metrics:
+                    _merge(totals, name, labels, value)
+    for name, labels, value in _snapshot():
+        _merge(totals, name, labels, value)
+    return totals
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    totals = collect()
+    lines = []
+    for name, metric in sorted(_metrics.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for (key_name, labels), value in sorted(totals.items()):
+            if key_name != name:
+                continue
+            if metric.kind == "counter":
+                lines.append(f"{name}{_labels(metric.labels, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                le = ("le", _number(float(bound)))
+                lines.append(f"{name}_bucket{_labels(metric.labels, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labels, labels)} {_number(float(value[-1]))}")
+            lines.append(f"{name}_count{_labels(metric.labels, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _values.clear()
@@ -0,0 +1,100 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, nplusone, profiling, timing
+
+logger = logging.getLogger("core.timing")
+
+
+class ServerTimingMiddleware:
+    # Adds a Server-Timing header (SQL, template, ETA provider time) and logs
+    # requests slower than REQUEST_TIMING["SLOW_REQUEST_MS"]. Removed from the
+    # stack entirely unless REQUEST_TIMING["ENABLED"] is set.
+    def __init__(self, get_response):
+        if not timing.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_seconds = timing.slow_request_seconds()
+
+    def __call__(self, request):
+        record = timing.RequestTiming()
+        token = timing.start(record)
+        began = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        total = time.perf_counter() - began
+        response["Server-Timing"] = record.header(total)
+        if total >= self.slow_seconds:
+            self._log_slow(request, response, record, total)
+        return response
+
+    def _log_slow(self, request, response, record, total):
+        match = request.resolver_match
+        payload = {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            "db_ms": round(record.db * 1000, 2),
+            "queries": record.queries,
+            **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in record.spans.items()},
+            "top_sql": record.slowest(),
+        }
+        logger.warning("slow request %s", json.dumps(payload), extra={"request_timing": payload})
+
+
+class NPlusOneMiddleware:
+    # Development aid: warns about (or raises on) repeated identical queries
+    # from one call site; see core.nplusone. Inactive unless NPLUSONE["ENABLED"].
+    def __init__(self, get_response):
+        if not nplusone.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with nplusone.detect():
+            return self.get_response(request)
+
+
+class MetricsMiddleware:
+    METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        began = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - began,
+            match.url_name or match.view_name if match else "unmatched",
+            request.method if request.method in self.METHODS else "other",
+            f"{response.status_code // 100}xx",
+        )
+        return response
+
+
+class ProfilingMiddleware:
+    # Superusers can profile a single request with ?_profile=1 or an X-Profile
+    # header; see core.profiling. Must come after AuthenticationMiddleware.
+    def __init__(self, get_response):
+        if not profiling.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if profiling.requested(request):
+            return profiling.profile(request, self.get_response)
+        return self.get_response(request)
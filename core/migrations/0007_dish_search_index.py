@@ -0,0 +1,50 @@
+from django.db import DatabaseError, migrations
+
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_dish_fts USING fts5("
+    "name, description, restaurant_name, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO core_dish_fts (rowid, name, description, restaurant_name) "
+    "SELECT d.id, d.name, d.description, r.name FROM core_dish d "
+    "JOIN core_restaurant r ON r.id = d.restaurant_id",
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS core_dish_fts"]
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS core_dish_search_gin ON core_dish USING GIN ("
+    "to_tsvector('english'::regconfig, COALESCE(name, '') || ' ' || COALESCE(description, '')))",
+    "CREATE INDEX IF NOT EXISTS core_restaurant_search_gin ON core_restaurant USING GIN ("
+    "to_tsvector('english'::regconfig, COALESCE(name, '')))",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS core_dish_search_gin",
+    "DROP INDEX IF EXISTS core_restaurant_search_gin",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        statements = statements_by_vendor.get(schema_editor.connection.vendor, [])
+        try:
+            for statement in statements:
+                schema_editor.execute(statement)
+        except DatabaseError:
+            # SQLite built without FTS5: core.search falls back to icontains.
+            if schema_editor.connection.vendor != "sqlite":
+                raise
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_order_delivery_latitude_order_delivery_longitude_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_BACKWARD, "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1 on 2026-10-18 03:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_dish_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['restaurant', 'is_available', 'category'], name='dish_rest_avail_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(fields=['restaurant', 'name'], name='dish_restaurant_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['id'], name='dish_avail_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['price', 'id'], name='dish_avail_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dish',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['rating', 'id'], name='dish_avail_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['dish', 'order'], name='orderitem_dish_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='restaurant_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['user', 'created_at'], name='ticket_user_created_idx'),
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX IF NOT EXISTS auth_user_email_lower_idx ON auth_user (LOWER(email))",
+            "DROP INDEX IF EXISTS auth_user_email_lower_idx",
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['latitude', 'longitude'], name='restaurant_active_latlng_idx'),
+        ),
+    ]
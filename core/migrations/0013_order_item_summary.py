@@ -0,0 +1,47 @@
+# Generated by Django 5.1 on 2026-10-18 04:04
+
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    Order = apps.get_model("core", "Order")
+    batch = []
+    orders = Order.objects.filter(item_count=0).prefetch_related("items__dish").order_by("id")
+    for order in orders.iterator(chunk_size=500):
+        lines = [(item.dish.name, item.quantity) for item in order.items.all()]
+        if not lines:
+            continue
+        parts = [f"{name} × {quantity}" for name, quantity in lines]
+        summary = ", ".join(parts)
+        while len(summary) > 255 and len(parts) > 1:
+            parts.pop()
+            summary = f"{', '.join(parts)} +{len(lines) - len(parts)} more"
+        order.item_count = sum(quantity for _, quantity in lines)
+        order.item_summary = summary[:255]
+        batch.append(order)
+        if len(batch) >= 500:
+            Order.objects.bulk_update(batch, ["item_count", "item_summary"])
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, ["item_count", "item_summary"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_daily_sales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_summary',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
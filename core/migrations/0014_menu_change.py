@@ -0,0 +1,44 @@
+# Generated by Django 5.1 on 2026-10-18 04:11
+
+from django.db import migrations, models
+
+
+def seed_changes(apps, schema_editor):
+    # Give every existing catalogue row a sequence number so a client that
+    # syncs from zero receives the full catalogue.
+    MenuChange = apps.get_model("core", "MenuChange")
+    for kind, model_name in (
+        ("restaurant", "Restaurant"),
+        ("category", "Category"),
+        ("dish", "Dish"),
+        ("dish_image", "DishImage"),
+    ):
+        ids = apps.get_model("core", model_name).objects.order_by("id").values_list("id", flat=True)
+        MenuChange.objects.bulk_create(
+            (MenuChange(kind=kind, object_id=object_id) for object_id in ids.iterator(chunk_size=1000)),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_order_item_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('restaurant', 'Restaurant'), ('category', 'Category'), ('dish', 'Dish'), ('dish_image', 'Dish image')], max_length=16)),
+                ('object_id', models.PositiveIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='menuchange_kind_object_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -16,9 +17,27 @@ class Restaurant(models.Model):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["name"],
+                condition=models.Q(is_active=True),
+                name="restaurant_active_name_idx",
+            ),
+            models.Index(
+                fields=["latitude", "longitude"],
+                condition=models.Q(is_active=True),
+                name="restaurant_active_latlng_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
+    @property
+    def image_url(self) -> str:
+        return self.image.url if self.image else ""
+
 
 class RestaurantProfile(models.Model):
     ROLE_CHOICES = [
@@ -45,9 +64,32 @@ class Dish(models.Model):
     image = models.ImageField(upload_to="dishes/", blank=True, null=True)
     rating = models.DecimalField(max_digits=2, decimal_places=1, default=4.0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["restaurant", "is_available", "category"], name="dish_rest_avail_cat_idx"),
+            models.Index(fields=["restaurant", "name"], name="dish_restaurant_name_idx"),
+            # Partial indexes: Django compiles is_available=True to a bare
+            # column test on SQLite, which only a matching partial index serves.
+            models.Index(fields=["id"], condition=models.Q(is_available=True), name="dish_avail_id_idx"),
+            models.Index(
+                fields=["price", "id"], condition=models.Q(is_available=True), name="dish_avail_price_idx"
+            ),
+            models.Index(
+                fields=["rating", "id"], condition=models.Q(is_available=True), name="dish_avail_rating_idx"
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.name} ({self.restaurant.name})"
 
+    @property
+    def image_url(self) -> str:
+        return self.image.url if self.image else ""
+
+    @property
+    def image_urls(self) -> list:
+        return [img.image.url for img in self.images.all()]
+
 
 class DishImage(models.Model):
     dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name="images")
@@ -74,6 +116,22 @@ class Order(models.Model):
     payment_method = models.CharField(max_length=50, default="COD")
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_paid = models.BooleanField(default=False)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    item_count = models.PositiveIntegerField(default=0)
+    item_summary = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="order_user_created_idx"),
+            models.Index(fields=["created_at"], name="order_created_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "idempotency_key"],
+                condition=models.Q(idempotency_key__isnull=False),
+                name="order_user_idempotency_key_uniq",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"Order #{self.id}"
@@ -85,6 +143,11 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     price = models.DecimalField(max_digits=8, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["dish", "order"], name="orderitem_dish_order_idx"),
+        ]
+
     def line_total(self) -> float:
         return float(self.price) * self.quantity
 
@@ -101,5 +164,105 @@ class SupportTicket(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="open")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="ticket_user_created_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"#{self.id} {self.subject}"
+
+
+class Task(models.Model):
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    ref = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["run_after", "id"],
+                condition=models.Q(status="pending"),
+                name="task_pending_idx",
+            ),
+            models.Index(
+                fields=["locked_until"],
+                condition=models.Q(status="running"),
+                name="task_running_idx",
+            ),
+            models.Index(fields=["ref"], name="task_ref_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+class DailySales(models.Model):
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name="daily_sales")
+    date = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["restaurant", "date"], name="dailysales_restaurant_date_uniq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.restaurant} {self.date}"
+
+
+class DailyDishSales(models.Model):
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name="daily_dish_sales")
+    date = models.DateField()
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name="daily_sales")
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["restaurant", "date", "dish"], name="dailydishsales_restaurant_date_dish_uniq"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.dish} {self.date}"
+
+
+class MenuChange(models.Model):
+    # One row per catalogue object; re-recording a change deletes the old row
+    # so the autoincrement id doubles as a monotonically increasing sequence.
+    KIND_CHOICES = [
+        ("restaurant", "Restaurant"),
+        ("category", "Category"),
+        ("dish", "Dish"),
+        ("dish_image", "Dish image"),
+    ]
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="menuchange_kind_object_uniq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.object_id} @{self.id}"
@@ -0,0 +1,138 @@
+import os
+import re
+import sys
+import warnings
+from contextlib import ExitStack, contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+from . import timing
+
+DEFAULTS = {
+    "ENABLED": False,
+    "THRESHOLD": 3,
+    "ACTION": "warn",
+}
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_LITERAL = re.compile(r"\b\d+\b|'(?:[^']|'')*'")
+_PK_LOOKUP = re.compile(r'FROM "(\w+)" WHERE "\1"\."id" = %s')
+_FK_LOOKUP = re.compile(r'FROM "(\w+)" WHERE "\1"\."(\w+)_id" = %s')
+# Query wrappers whose frames sit between the caller and the database.
+_SKIP = {__file__, timing.__file__}
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def _config(name):
+    return getattr(settings, "NPLUSONE", {}).get(name, DEFAULTS[name])
+
+
+def enabled():
+    return _config("ENABLED")
+
+
+def fingerprint(sql):
+    return _LITERAL.sub("?", _IN_LIST.sub("IN (...)", sql))
+
+
+def _model_for_table(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+def suggestion(sql):
+    # Best-effort hint derived from the repeated statement's shape.
+    match = _PK_LOOKUP.search(sql)
+    if match:
+        target = _model_for_table(match.group(1))
+        if target:
+            fields = [
+                f"{field.model.__name__}.{field.name}"
+                for model in apps.get_models()
+                for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model is target
+            ]
+            if fields:
+                return f"use select_related() for one of: {', '.join(sorted(fields))}"
+    match = _FK_LOOKUP.search(sql)
+    if match:
+        source = _model_for_table(match.group(1))
+        if source:
+            field = source._meta.get_field(match.group(2))
+            accessor = field.remote_field.get_accessor_name()
+            return f"use prefetch_related('{accessor}') on the {field.related_model.__name__} queryset"
+    return "fetch the related rows in bulk with select_related() or prefetch_related()"
+
+
+def _project_frame(frame):
+    base = str(settings.BASE_DIR)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(base) and "site-packages" not in filename and filename not in _SKIP:
+            return f"{os.path.relpath(filename, base)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _template_frame(frame):
+    while frame is not None:
+        if frame.f_code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                return f"{origin.template_name or origin.name}:{token.lineno}"
+        frame = frame.f_back
+    return None
+
+
+def call_site(frame):
+    # The innermost template node being rendered, else the nearest project frame.
+    return _template_frame(frame) or _project_frame(frame) or "<unknown>"
+
+
+class Detector:
+    def __init__(self, threshold=None, action=None):
+        self.threshold = threshold or _config("THRESHOLD")
+        self.action = action or _config("ACTION")
+        self.counts = {}
+        self.reported = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.check(sql, sys._getframe(1))
+        return execute(sql, params, many, context)
+
+    def check(self, sql, frame):
+        key = (fingerprint(sql), call_site(frame))
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        if count != self.threshold:
+            return
+        message = (
+            f"Possible N+1: {count} identical queries from {key[1]}; {suggestion(sql)}.\n    {key[0]}"
+        )
+        self.reported.append(message)
+        if self.action == "raise":
+            raise NPlusOneError(message)
+        warnings.warn(message, NPlusOneWarning, stacklevel=2)
+
+
+@contextmanager
+def detect(threshold=None, action=None):
+    detector = Detector(threshold, action)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(detector))
+        yield detector
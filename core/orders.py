@@ -0,0 +1,92 @@
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+
+from . import sales
+from .models import Dish, Order, OrderItem
+
+
+SUMMARY_LENGTH = 255
+
+
+class CheckoutError(Exception):
+    pass
+
+
+def summarize(lines):
+    # ``lines`` is (dish name, quantity) pairs; the result is stored on the
+    # order so history pages never need to read its items.
+    parts = [f"{name} × {quantity}" for name, quantity in lines]
+    summary = ", ".join(parts)
+    while len(summary) > SUMMARY_LENGTH and len(parts) > 1:
+        parts.pop()
+        hidden = len(lines) - len(parts)
+        summary = f"{', '.join(parts)} +{hidden} more"
+    return summary[:SUMMARY_LENGTH]
+
+
+def existing_order(user, idempotency_key):
+    if not idempotency_key:
+        return None
+    return Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+
+
+def place_order(user, cart, details, idempotency_key=None):
+    # Returns (order, created); created is False when a concurrent request
+    # with the same idempotency key placed the order first.
+    quantities = {int(dish_id): qty for dish_id, qty in cart.items() if qty > 0}
+    if not quantities:
+        raise CheckoutError("Your cart is empty.")
+    try:
+        with transaction.atomic():
+            # Lock the dish rows so price/availability can't change between
+            # validation and the item insert (a no-op on SQLite, which holds
+            # the database write lock for the whole transaction instead).
+            dishes = list(
+                Dish.objects.select_for_update()
+                .filter(id__in=quantities, is_available=True)
+                .only("id", "name", "price", "restaurant_id")
+                .order_by("id")
+            )
+            if len(dishes) != len(quantities):
+                raise CheckoutError(
+                    "Some dishes in your cart are no longer available. Please review your cart."
+                )
+            order = Order.objects.create(
+                user=user,
+                idempotency_key=idempotency_key or None,
+                item_count=sum(quantities[dish.id] for dish in dishes),
+                item_summary=summarize([(dish.name, quantities[dish.id]) for dish in dishes]),
+                **details,
+            )
+            OrderItem.objects.bulk_create(
+                [
+                    OrderItem(order=order, dish_id=dish.id, quantity=quantities[dish.id], price=dish.price)
+                    for dish in dishes
+                ]
+            )
+            sales.record_order(
+                order,
+                [(dish.restaurant_id, dish.id, quantities[dish.id], dish.price) for dish in dishes],
+            )
+            line_totals = (
+                OrderItem.objects.filter(order=OuterRef("pk"))
+                .values("order")
+                .annotate(
+                    total=Sum(
+                        ExpressionWrapper(
+                            F("price") * F("quantity"),
+                            output_field=DecimalField(max_digits=10, decimal_places=2),
+                        )
+                    )
+                )
+                .values("total")
+            )
+            Order.objects.filter(pk=order.pk).update(total_amount=Subquery(line_totals))
+            order.refresh_from_db(fields=["total_amount"])
+    except IntegrityError:
+        # A concurrent retry with the same key won the race.
+        order = existing_order(user, idempotency_key)
+        if order is None:
+            raise
+        return order, False
+    return order, True
@@ -0,0 +1,103 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+SORT_ORDERINGS = {
+    "price_asc": ("price", "id"),
+    "price_desc": ("-price", "-id"),
+    "rating": ("-rating", "-id"),
+    "distance": ("distance_rank", "id"),
+    "relevance": ("search_rank", "id"),
+    "": ("id",),
+}
+
+ORDER_HISTORY_ORDERING = ("-id",)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def ordering_for(sort, searching=False):
+    if sort in SORT_ORDERINGS and sort not in {"", "relevance"}:
+        return SORT_ORDERINGS[sort]
+    return SORT_ORDERINGS["relevance" if searching else ""]
+
+
+def encode_cursor(ordering, values):
+    payload = json.dumps(
+        {"o": ",".join(ordering), "v": [str(v) if isinstance(v, Decimal) else v for v in values]},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _ordering_fields(queryset, ordering):
+    annotations = queryset.query.annotations
+    fields = []
+    for field in ordering:
+        name = field.lstrip("-")
+        if name in annotations:
+            fields.append(annotations[name].output_field)
+        else:
+            fields.append(queryset.model._meta.get_field(name))
+    return fields
+
+
+def decode_cursor(cursor, ordering, fields):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = payload["v"]
+        signature = payload["o"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor.")
+    if signature != ",".join(ordering) or len(values) != len(ordering):
+        raise InvalidCursor("Cursor does not match the requested sort.")
+    # The signature only proves the sort matches; the values are client input
+    # and must be valid for their columns before they reach a query.
+    coerced = []
+    for field, value in zip(fields, values):
+        if value is None:
+            raise InvalidCursor("Malformed cursor.")
+        try:
+            value = field.to_python(value)
+            field.run_validators(value)
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor("Malformed cursor.")
+        coerced.append(value)
+    return coerced
+
+
+def _after(ordering, values):
+    # Expands (a, b, c) > (x, y, z) into the OR-of-ANDs form every backend can
+    # use with a composite index, honouring per-column direction.
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        step = Q(**{f"{name}__{lookup}": values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip("-"): value})
+        condition |= step
+    return condition
+
+
+def paginate(queryset, ordering, cursor=None, per_page=24):
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, ordering, _ordering_fields(queryset, ordering))
+        queryset = queryset.filter(_after(ordering, values))
+    items = list(queryset[: per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(
+            ordering, [getattr(last, field.lstrip("-")) for field in ordering]
+        )
+    return items, next_cursor
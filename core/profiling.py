@@ -0,0 +1,180 @@
+import cProfile
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "DIR": None,
+    "MAX_PROFILES": 50,
+    "SAMPLE_INTERVAL": 0.005,
+    "PARAM": "_profile",
+    "HEADER": "X-Profile",
+}
+
+EXTENSIONS = ("pstats", "collapsed")
+NAME_RE = re.compile(r"^[\w-]+\.(?:pstats|collapsed)$")
+
+
+def _config(name):
+    return getattr(settings, "PROFILING", {}).get(name, DEFAULTS[name])
+
+
+def enabled():
+    return _config("ENABLED")
+
+
+def param():
+    return _config("PARAM")
+
+
+def directory():
+    return os.path.abspath(_config("DIR") or os.path.join(settings.BASE_DIR, "var", "profiles"))
+
+
+def allowed(user):
+    # Captures hold other users' paths and usernames; restaurant owners are
+    # staff, so staff alone is not enough.
+    return user.is_superuser
+
+
+def requested(request):
+    flag = request.GET.get(_config("PARAM")) or request.headers.get(_config("HEADER"))
+    return bool(flag) and flag != "0" and allowed(request.user)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        filename = os.path.relpath(filename, base)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Sampler(threading.Thread):
+    # Samples one thread's stack every ``interval`` seconds and counts each
+    # distinct stack, root first, in the collapsed format flame graph tools read.
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._done.set()
+        if self.is_alive():
+            self.join()
+
+
+def profile(request, get_response):
+    profiler = cProfile.Profile()
+    try:
+        # Raises on 3.12+ when another profiler already owns the thread.
+        profiler.enable()
+    except ValueError:
+        logger.warning("Could not start the profiler; serving %s unprofiled", request.path, exc_info=True)
+        return get_response(request)
+    sampler = Sampler(threading.get_ident(), _config("SAMPLE_INTERVAL"))
+    began = time.perf_counter()
+    try:
+        sampler.start()
+        response = get_response(request)
+    finally:
+        profiler.disable()
+        sampler.stop()
+    elapsed = time.perf_counter() - began
+    match = request.resolver_match
+    meta = {
+        "created": time.time(),
+        "method": request.method,
+        "path": request.get_full_path(),
+        "view": match.view_name if match else "",
+        "user": request.user.get_username(),
+        "status": response.status_code,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "samples": sum(sampler.stacks.values()),
+    }
+    response["X-Profile-Id"] = save(profiler, sampler.stacks, meta)
+    return response
+
+
+def save(profiler, stacks, meta):
+    root = directory()
+    os.makedirs(root, exist_ok=True)
+    view = re.sub(r"[^\w-]+", "-", meta["view"] or "unmatched")[:40]
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(meta["created"]))
+    millis = int(meta["created"] * 1000) % 1000
+    name = f"{stamp}{millis:03d}-{view}-{secrets.token_hex(3)}"
+    profiler.dump_stats(os.path.join(root, f"{name}.pstats"))
+    with open(os.path.join(root, f"{name}.collapsed"), "w") as handle:
+        for stack, count in stacks.most_common():
+            handle.write(f"{stack} {count}\n")
+    # The metadata file is written last and marks the profile as complete.
+    with open(os.path.join(root, f"{name}.json"), "w") as handle:
+        json.dump(meta, handle)
+    rotate(root)
+    return name
+
+
+def _listing(root):
+    try:
+        names = [name[:-5] for name in os.listdir(root) if name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    # Names start with a UTC timestamp, so they sort oldest first.
+    return sorted(names)
+
+
+def rotate(root=None, keep=None):
+    root = root or directory()
+    keep = _config("MAX_PROFILES") if keep is None else keep
+    names = _listing(root)
+    for name in names[: max(0, len(names) - keep)]:
+        for extension in ("json", *EXTENSIONS):
+            try:
+                os.remove(os.path.join(root, f"{name}.{extension}"))
+            except FileNotFoundError:
+                pass
+
+
+def profiles():
+    root = directory()
+    found = []
+    for name in reversed(_listing(root)):
+        try:
+            with open(os.path.join(root, f"{name}.json")) as handle:
+                meta = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        found.append({"name": name, **meta})
+    return found
+
+
+def file_path(filename):
+    # Absolute path of a captured pstats/collapsed file, or None.
+    if not NAME_RE.match(filename):
+        return None
+    path = os.path.join(directory(), filename)
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,250 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncHour, TruncWeek
+from django.utils import timezone
+
+from .models import DailyDishSales, DailySales, OrderItem
+
+BUCKETS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _increment(field, amounts, output_field):
+    # One UPDATE for every row touched: each row adds its own amount.
+    return F(field) + Case(
+        *[When(**{lookup: key}, then=Value(amount)) for (lookup, key), amount in amounts.items()],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def record_order(order, lines):
+    # ``lines`` is an iterable of (restaurant_id, dish_id, quantity, price).
+    # Must run inside the transaction that created the order.
+    day = timezone.localdate(order.created_at)
+    restaurants = {}
+    dishes = {}
+    for restaurant_id, dish_id, quantity, price in lines:
+        totals = restaurants.setdefault(restaurant_id, [0, Decimal("0.00")])
+        totals[0] += quantity
+        totals[1] += price * quantity
+        dish_totals = dishes.setdefault((restaurant_id, dish_id), [0, Decimal("0.00")])
+        dish_totals[0] += quantity
+        dish_totals[1] += price * quantity
+    if not restaurants:
+        return
+    DailySales.objects.bulk_create(
+        [DailySales(restaurant_id=restaurant_id, date=day) for restaurant_id in restaurants],
+        ignore_conflicts=True,
+    )
+    DailyDishSales.objects.bulk_create(
+        [
+            DailyDishSales(restaurant_id=restaurant_id, dish_id=dish_id, date=day)
+            for restaurant_id, dish_id in dishes
+        ],
+        ignore_conflicts=True,
+    )
+    DailySales.objects.filter(restaurant_id__in=restaurants, date=day).update(
+        orders=F("orders") + 1,
+        items=_increment(
+            "items", {("restaurant_id", r): t[0] for r, t in restaurants.items()}, IntegerField()
+        ),
+        revenue=_increment(
+            "revenue", {("restaurant_id", r): t[1] for r, t in restaurants.items()}, MONEY
+        ),
+    )
+    DailyDishSales.objects.filter(
+        restaurant_id__in=restaurants, dish_id__in=[dish_id for _, dish_id in dishes], date=day
+    ).update(
+        quantity=_increment(
+            "quantity", {("dish_id", d): t[0] for (_, d), t in dishes.items()}, IntegerField()
+        ),
+        revenue=_increment(
+            "revenue", {("dish_id", d): t[1] for (_, d), t in dishes.items()}, MONEY
+        ),
+    )
+
+
+def today(restaurant_id):
+    return DailySales.objects.filter(restaurant_id=restaurant_id, date=timezone.localdate()).first()
+
+
+def popular_dishes(restaurant_id, limit=5):
+    return (
+        DailyDishSales.objects.filter(restaurant_id=restaurant_id)
+        .values("dish__name")
+        .annotate(qty=Sum("quantity"))
+        .order_by("-qty")[:limit]
+    )
+
+
+def _line_total():
+    return ExpressionWrapper(F("price") * F("quantity"), output_field=MONEY)
+
+
+@transaction.atomic
+def rebuild(restaurant_id=None, since=None):
+    items = OrderItem.objects.all()
+    daily = DailySales.objects.all()
+    per_dish = DailyDishSales.objects.all()
+    if restaurant_id:
+        items = items.filter(dish__restaurant_id=restaurant_id)
+        daily = daily.filter(restaurant_id=restaurant_id)
+        per_dish = per_dish.filter(restaurant_id=restaurant_id)
+    if since:
+        items = items.filter(
+            order__created_at__gte=timezone.make_aware(datetime.combine(since, time.min))
+        )
+        daily = daily.filter(date__gte=since)
+        per_dish = per_dish.filter(date__gte=since)
+    daily.delete()
+    per_dish.delete()
+
+    grouped = items.values(
+        restaurant=F("dish__restaurant_id"), day=TruncDate("order__created_at")
+    ).order_by()
+    DailySales.objects.bulk_create(
+        (
+            DailySales(
+                restaurant_id=row["restaurant"],
+                date=row["day"],
+                orders=row["orders"],
+                items=row["items"],
+                revenue=row["revenue"],
+            )
+            for row in grouped.annotate(
+                orders=Count("order_id", distinct=True),
+                items=Sum("quantity"),
+                revenue=Sum(_line_total()),
+            ).iterator()
+        ),
+        batch_size=500,
+    )
+    DailyDishSales.objects.bulk_create(
+        (
+            DailyDishSales(
+                restaurant_id=row["restaurant"],
+                date=row["day"],
+                dish_id=row["dish_id"],
+                quantity=row["units"],
+                revenue=row["revenue"],
+            )
+            for row in grouped.values("restaurant", "day", "dish_id")
+            .annotate(units=Sum("quantity"), revenue=Sum(_line_total()))
+            .iterator()
+        ),
+        batch_size=500,
+    )
+    return daily.count()
+
+
+def bucket_starts(start, end, bucket):
+    # Every bucket between two inclusive dates, so empty periods still get a
+    # zero point on the chart.
+    if bucket == "hour":
+        current = timezone.make_aware(datetime.combine(start, time.min))
+        stop = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    else:
+        current = start - timedelta(days=start.weekday()) if bucket == "week" else start
+        stop = end + timedelta(days=1)
+    starts = []
+    while current < stop:
+        starts.append(current)
+        current += BUCKETS[bucket]
+    return starts
+
+
+def _sources(restaurant_id, start, end, bucket):
+    # Day and week series come from the rollups; hours need the raw orders.
+    if bucket == "hour":
+        items = OrderItem.objects.filter(
+            dish__restaurant_id=restaurant_id,
+            order__created_at__gte=timezone.make_aware(datetime.combine(start, time.min)),
+            order__created_at__lt=timezone.make_aware(
+                datetime.combine(end + timedelta(days=1), time.min)
+            ),
+        ).annotate(bucket=TruncHour("order__created_at"))
+        totals = items.values("bucket").annotate(
+            n_orders=Count("order_id", distinct=True),
+            n_items=Sum("quantity"),
+            total=Sum(_line_total()),
+        )
+        return totals, items, Sum("quantity"), Sum(_line_total())
+    trunc = TruncWeek("date") if bucket == "week" else F("date")
+    days = DailySales.objects.filter(restaurant_id=restaurant_id, date__gte=start, date__lte=end)
+    totals = days.annotate(bucket=trunc).values("bucket").annotate(
+        n_orders=Sum("orders"), n_items=Sum("items"), total=Sum("revenue")
+    )
+    dishes = DailyDishSales.objects.filter(
+        restaurant_id=restaurant_id, date__gte=start, date__lte=end
+    ).annotate(bucket=trunc)
+    return totals, dishes, Sum("quantity"), Sum("revenue")
+
+
+def _bucket_key(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    return value.isoformat()
+
+
+def series(restaurant_id, start, end, bucket="day", top=10):
+    labels = [_bucket_key(value) for value in bucket_starts(start, end, bucket)]
+    position = {label: index for index, label in enumerate(labels)}
+    totals, dishes, units, dish_revenue = _sources(restaurant_id, start, end, bucket)
+
+    orders = [0] * len(labels)
+    items = [0] * len(labels)
+    revenue = [Decimal("0.00")] * len(labels)
+    for row in totals.order_by():
+        index = position[_bucket_key(row["bucket"])]
+        orders[index] = row["n_orders"]
+        items[index] = row["n_items"]
+        revenue[index] = row["total"]
+
+    ranked = list(
+        dishes.values("dish_id", "dish__name")
+        .annotate(units=units, amount=dish_revenue)
+        .order_by("-units", "dish_id")[:top]
+    )
+    per_dish = {row["dish_id"]: [0] * len(labels) for row in ranked}
+    for row in (
+        dishes.filter(dish_id__in=per_dish).values("bucket", "dish_id").annotate(units=units).order_by()
+    ):
+        per_dish[row["dish_id"]][position[_bucket_key(row["bucket"])]] = row["units"]
+
+    total_orders = sum(orders)
+    total_revenue = sum(revenue, Decimal("0.00"))
+    return {
+        "bucket": bucket,
+        "labels": labels,
+        "orders": orders,
+        "items": items,
+        "revenue": [float(value) for value in revenue],
+        "avg_basket": [
+            round(float(value) / count, 2) if count else 0 for value, count in zip(revenue, orders)
+        ],
+        "dishes": [
+            {
+                "id": row["dish_id"],
+                "name": row["dish__name"],
+                "quantity": row["units"],
+                "revenue": float(row["amount"]),
+                "series": per_dish[row["dish_id"]],
+            }
+            for row in ranked
+        ],
+        "totals": {
+            "orders": total_orders,
+            "items": sum(items),
+            "revenue": float(total_revenue),
+            "avg_basket": round(float(total_revenue) / total_orders, 2) if total_orders else 0,
+        },
+    }
@@ -0,0 +1,182 @@
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Dish, Restaurant
+
+FTS_TABLE = "core_dish_fts"
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _terms(query):
+    return TOKEN_RE.findall(query.lower())[:8]
+
+
+class IcontainsSearchBackend:
+    name = "icontains"
+
+    def search(self, queryset, query):
+        terms = _terms(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(
+                Q(name__icontains=term)
+                | Q(description__icontains=term)
+                | Q(restaurant__name__icontains=term)
+            )
+        return queryset
+
+    def index_dish(self, dish):
+        pass
+
+    def remove_dish(self, dish_id):
+        pass
+
+    def index_restaurant(self, restaurant):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SqliteFTSSearchBackend(IcontainsSearchBackend):
+    name = "sqlite_fts5"
+
+    def _match_expression(self, terms):
+        # Quote every token so user input can never be parsed as FTS5 syntax,
+        # and add the prefix operator so partial words still match.
+        return " AND ".join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query):
+        terms = _terms(query)
+        if not terms:
+            return queryset.none()
+        expression = self._match_expression(terms)
+        table = Dish._meta.db_table
+        # Joining the index once lets SQLite run MATCH a single time and read
+        # bm25() for each hit, instead of re-running MATCH per result row.
+        return (
+            queryset.extra(
+                tables=[FTS_TABLE],
+                where=[f"{FTS_TABLE}.rowid = {table}.id", f"{FTS_TABLE} MATCH %s"],
+                params=[expression],
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f"bm25({FTS_TABLE}, 10.0, 2.0, 5.0)", [], output_field=FloatField()
+                )
+            )
+            .order_by("search_rank", "id")
+        )
+
+    def index_dish(self, dish):
+        restaurant_name = dish.restaurant.name if dish.restaurant_id else ""
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [dish.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, restaurant_name) "
+                "VALUES (%s, %s, %s, %s)",
+                [dish.pk, dish.name, dish.description or "", restaurant_name],
+            )
+
+    def remove_dish(self, dish_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [dish_id])
+
+    def index_restaurant(self, restaurant):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {FTS_TABLE} SET restaurant_name = %s "
+                f"WHERE rowid IN (SELECT id FROM {Dish._meta.db_table} WHERE restaurant_id = %s)",
+                [restaurant.name, restaurant.pk],
+            )
+
+    def rebuild(self):
+        dish_table = Dish._meta.db_table
+        restaurant_table = Restaurant._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, restaurant_name) "
+                f"SELECT d.id, d.name, d.description, r.name FROM {dish_table} d "
+                f"JOIN {restaurant_table} r ON r.id = d.restaurant_id"
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+            return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend(IcontainsSearchBackend):
+    name = "postgres"
+    config = "english"
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        terms = _terms(query)
+        if not terms:
+            return queryset.none()
+        search_query = SearchQuery(
+            " & ".join(f"{term}:*" for term in terms),
+            search_type="raw",
+            config=self.config,
+        )
+        # Both vectors mirror the GIN expression indexes from migration 0007.
+        dish_vector = SearchVector("name", "description", config=self.config)
+        restaurants = Restaurant.objects.annotate(
+            document=SearchVector("name", config=self.config)
+        ).filter(document=search_query)
+        return (
+            queryset.annotate(document=dish_vector)
+            .filter(Q(document=search_query) | Q(restaurant__in=restaurants.values("id")))
+            .annotate(search_rank=-SearchRank(dish_vector, search_query))
+            .order_by("search_rank", "id")
+        )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX core_dish_search_gin")
+            cursor.execute("REINDEX INDEX core_restaurant_search_gin")
+        return Dish.objects.count()
+
+
+def _fts_table_exists():
+    with connection.cursor() as cursor:
+        return FTS_TABLE in connection.introspection.table_names(cursor)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is not None:
+        return _backend
+    name = getattr(settings, "SEARCH_BACKEND", "auto")
+    if name == "auto":
+        name = {"sqlite": "sqlite_fts5", "postgresql": "postgres"}.get(
+            connection.vendor, "icontains"
+        )
+    if name == "sqlite_fts5":
+        try:
+            backend = SqliteFTSSearchBackend() if _fts_table_exists() else None
+        except DatabaseError:
+            backend = None
+        if backend is None:
+            # FTS5 missing from this SQLite build, or migrations not applied
+            # yet: don't cache, so the index is picked up once it exists.
+            return IcontainsSearchBackend()
+    elif name == "postgres":
+        backend = PostgresSearchBackend()
+    else:
+        backend = IcontainsSearchBackend()
+    _backend = backend
+    return backend
+
+
+def search_dishes(queryset, query):
+    return get_backend().search(queryset, query)
@@ -0,0 +1,236 @@
+import random
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from . import catalog, changes, sales
+from .models import Category, Dish, MenuChange, Order, OrderItem, Restaurant, RestaurantProfile
+from .orders import summarize
+from .search import get_backend
+
+# "dishes" is per restaurant and "items" the average number of lines per order.
+PRESETS = {
+    "tiny": {"restaurants": 4, "dishes": 8, "customers": 10, "orders": 60, "items": 3},
+    "small": {"restaurants": 100, "dishes": 40, "customers": 1_000, "orders": 10_000, "items": 3},
+    "medium": {"restaurants": 1_000, "dishes": 100, "customers": 20_000, "orders": 300_000, "items": 3},
+    "large": {"restaurants": 10_000, "dishes": 100, "customers": 200_000, "orders": 3_400_000, "items": 3},
+}
+
+BATCH_SIZE = 2000
+PASSWORD = "seed-pass-123"
+
+CITIES = (
+    (12.9716, 77.5946),
+    (19.0760, 72.8777),
+    (28.6139, 77.2090),
+    (13.0827, 80.2707),
+    (17.3850, 78.4867),
+)
+RESTAURANT_WORDS = ("Spice", "Tandoor", "Dosa", "Biryani", "Curry", "Masala", "Thali", "Chaat", "Grill", "Bowl")
+RESTAURANT_SUFFIXES = ("House", "Corner", "Kitchen", "Express", "Junction", "Bhavan", "Point", "Cafe")
+ADJECTIVES = ("Classic", "Spicy", "Smoky", "Crispy", "Butter", "Tangy", "Royal", "Homestyle", "Tawa", "Kadai")
+# (name, category, veg)
+BASES = (
+    ("Paneer Tikka", "Starters", True),
+    ("Chicken 65", "Starters", False),
+    ("Veg Biryani", "Biryani", True),
+    ("Chicken Biryani", "Biryani", False),
+    ("Mutton Biryani", "Biryani", False),
+    ("Masala Dosa", "South Indian", True),
+    ("Idli Vada", "South Indian", True),
+    ("Dal Makhani", "Curries", True),
+    ("Butter Chicken", "Curries", False),
+    ("Fish Curry", "Curries", False),
+    ("Garlic Naan", "Breads", True),
+    ("Tandoori Roti", "Breads", True),
+    ("Veg Hakka Noodles", "Chinese", True),
+    ("Chilli Chicken", "Chinese", False),
+    ("Gulab Jamun", "Desserts", True),
+    ("Rasmalai", "Desserts", True),
+    ("Masala Chai", "Beverages", True),
+    ("Sweet Lassi", "Beverages", True),
+)
+
+
+class SeedError(Exception):
+    pass
+
+
+def dish_name(index):
+    adjective = ADJECTIVES[index % len(ADJECTIVES)]
+    return f"{adjective} {BASES[index // len(ADJECTIVES) % len(BASES)][0]}"
+
+
+def _batches(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _bulk(model, objects):
+    ids = array("q")
+    for batch in _batches(objects):
+        with transaction.atomic():
+            ids.extend(obj.pk for obj in model.objects.bulk_create(batch))
+    return ids
+
+
+def _location(rng):
+    latitude, longitude = rng.choice(CITIES)
+    return (
+        Decimal(f"{latitude + rng.uniform(-0.15, 0.15):.6f}"),
+        Decimal(f"{longitude + rng.uniform(-0.15, 0.15):.6f}"),
+    )
+
+
+def load(restaurants, dishes, customers, orders, items, days=90, seed=42, prefix="seed", log=None):
+    log = log or (lambda message: None)
+    if User.objects.filter(username__startswith=f"{prefix}-").exists():
+        raise SeedError(f"Users prefixed {prefix!r} already exist; pick another prefix.")
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    now = timezone.now()
+
+    category_ids = {name: Category.objects.get_or_create(name=name)[0].id for _, name, _ in BASES}
+
+    def build_restaurants():
+        for i in range(restaurants):
+            latitude, longitude = _location(rng)
+            yield Restaurant(
+                name=f"{rng.choice(RESTAURANT_WORDS)} {rng.choice(RESTAURANT_SUFFIXES)} {i + 1}",
+                address=f"{rng.randint(1, 400)} Main Road, Sector {rng.randint(1, 60)}",
+                latitude=latitude,
+                longitude=longitude,
+            )
+
+    restaurant_ids = _bulk(Restaurant, build_restaurants())
+    log(f"Created {len(restaurant_ids)} restaurants.")
+
+    owner_ids = _bulk(
+        User,
+        (User(username=f"{prefix}-owner-{i + 1}", password=password) for i in range(restaurants)),
+    )
+    _bulk(
+        RestaurantProfile,
+        (
+            RestaurantProfile(user_id=user_id, restaurant_id=restaurant_id)
+            for user_id, restaurant_id in zip(owner_ids, restaurant_ids)
+        ),
+    )
+    customer_ids = _bulk(
+        User,
+        (
+            User(
+                username=f"{prefix}-customer-{i + 1}",
+                email=f"{prefix}-customer-{i + 1}@example.com",
+                password=password,
+            )
+            for i in range(customers)
+        ),
+    )
+    log(f"Created {len(owner_ids)} owners and {len(customer_ids)} customers.")
+
+    # Only what order generation needs is kept per dish, in flat arrays, so
+    # a million-dish catalogue stays cheap to hold in memory.
+    names = array("i")
+    prices = array("i")
+
+    def build_dishes():
+        for restaurant_id in restaurant_ids:
+            for _ in range(dishes):
+                name_index = rng.randrange(len(ADJECTIVES) * len(BASES))
+                _, category, veg = BASES[name_index // len(ADJECTIVES) % len(BASES)]
+                price = rng.randrange(40, 600, 5) * 100
+                names.append(name_index)
+                prices.append(price)
+                yield Dish(
+                    restaurant_id=restaurant_id,
+                    category_id=category_ids[category],
+                    name=dish_name(name_index),
+                    description=f"{dish_name(name_index)}, freshly made to order.",
+                    price=Decimal(price).scaleb(-2),
+                    is_veg=veg,
+                    is_available=rng.random() < 0.95,
+                    rating=Decimal(rng.randint(30, 50)).scaleb(-1),
+                )
+
+    dish_ids = _bulk(Dish, build_dishes())
+    log(f"Created {len(dish_ids)} dishes.")
+
+    _bulk(
+        MenuChange,
+        (
+            MenuChange(kind=kind, object_id=object_id)
+            for kind, ids in (("restaurant", restaurant_ids), ("dish", dish_ids))
+            for object_id in ids
+        ),
+    )
+    changes.record("category", list(category_ids.values()))
+
+    line_count = 0
+    for start in range(0, orders, BATCH_SIZE):
+        batch = []
+        for _ in range(min(BATCH_SIZE, orders - start)):
+            customer = rng.randrange(len(customer_ids))
+            # Squaring skews traffic towards a minority of popular restaurants.
+            restaurant = min(int(restaurants * rng.random() ** 2), restaurants - 1)
+            count = min(rng.randint(1, 2 * items - 1), dishes)
+            lines = [
+                (restaurant * dishes + offset, rng.randint(1, 3))
+                for offset in rng.sample(range(dishes), count)
+            ]
+            batch.append((customer, lines, now - timedelta(seconds=rng.randrange(days * 86400))))
+        with transaction.atomic():
+            created = Order.objects.bulk_create(
+                Order(
+                    user_id=customer_ids[customer],
+                    customer_name=f"Customer {customer + 1}",
+                    customer_phone=f"9{customer:09d}",
+                    address=f"{customer % 500 + 1} Park Street",
+                    total_amount=Decimal(sum(prices[dish] * qty for dish, qty in lines)).scaleb(-2),
+                    is_paid=customer % 3 == 0,
+                    item_count=sum(qty for _, qty in lines),
+                    item_summary=summarize([(dish_name(names[dish]), qty) for dish, qty in lines]),
+                )
+                for customer, lines, _ in batch
+            )
+            # auto_now_add stamps every inserted order with "now", which leaves
+            # nothing for the sales history and analytics views to aggregate.
+            for order, (_, _, created_at) in zip(created, batch):
+                order.created_at = created_at
+            Order.objects.bulk_update(created, ["created_at"], batch_size=BATCH_SIZE)
+            order_items = [
+                OrderItem(
+                    order_id=order.pk,
+                    dish_id=dish_ids[dish],
+                    quantity=qty,
+                    price=Decimal(prices[dish]).scaleb(-2),
+                )
+                for order, (_, lines, _) in zip(created, batch)
+                for dish, qty in lines
+            ]
+            OrderItem.objects.bulk_create(order_items, batch_size=BATCH_SIZE)
+        line_count += len(order_items)
+        if (start // BATCH_SIZE) % 50 == 49:
+            log(f"  {start + len(batch)} / {orders} orders")
+    log(f"Created {orders} orders with {line_count} items.")
+
+    # bulk_create sends no signals, so refresh everything they maintain.
+    indexed = get_backend().rebuild()
+    sales.rebuild()
+    catalog.bump_restaurant_list()
+    catalog.bump_categories()
+    log(f"Rebuilt the search index ({indexed} dishes) and sales rollups.")
+    return {
+        "restaurants": len(restaurant_ids),
+        "dishes": len(dish_ids),
+        "customers": len(customer_ids),
+        "orders": orders,
+        "order_items": line_count,
+    }
@@ -1,7 +1,12 @@
 from django.contrib import messages
 from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 
+from . import catalog, changes, images, tasks
+from .models import Category, Dish, DishImage, Restaurant, Task
+from .search import get_backend
+
 
 @receiver(user_logged_in)
 def google_login_success(sender, request, user, **kwargs):
@@ -10,3 +15,96 @@ def google_login_success(sender, request, user, **kwargs):
     path = request.path or ""
     if "accounts/google" in path:
         messages.success(request, "Signed in with Google.")
+
+
+@receiver(post_save, sender=Dish)
+def index_dish(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_backend().index_dish(instance)
+
+
+@receiver(post_delete, sender=Dish)
+def unindex_dish(sender, instance, **kwargs):
+    get_backend().remove_dish(instance.pk)
+
+
+@receiver(post_save, sender=Restaurant)
+def index_restaurant(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    get_backend().index_restaurant(instance)
+
+
+@receiver(pre_save, sender=Dish)
+def remember_dish_restaurant(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    instance._previous_restaurant_id = (
+        Dish.objects.filter(pk=instance.pk).values_list("restaurant_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+def invalidate_dish_menu(sender, instance, **kwargs):
+    catalog.bump_restaurant(instance.restaurant_id)
+    previous = getattr(instance, "_previous_restaurant_id", None)
+    if previous and previous != instance.restaurant_id:
+        catalog.bump_restaurant(previous)
+    catalog.forget_dish(instance.pk)
+
+
+@receiver(post_save, sender=DishImage)
+@receiver(post_delete, sender=DishImage)
+def invalidate_dish_image_menu(sender, instance, **kwargs):
+    restaurant_id = (
+        Dish.objects.filter(pk=instance.dish_id).values_list("restaurant_id", flat=True).first()
+    )
+    catalog.bump_restaurant(restaurant_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_menus(sender, instance, **kwargs):
+    catalog.bump_categories()
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurant(sender, instance, **kwargs):
+    catalog.bump_restaurant(instance.pk)
+    catalog.bump_restaurant_list()
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_save, sender=DishImage)
+@receiver(post_save, sender=Restaurant)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image or images.has_variants(instance.image.name):
+        return
+    ref = f"image:{instance.image.name}"[:100]
+    if not Task.objects.filter(ref=ref, status="pending").exists():
+        tasks.enqueue("generate_image_variants", ref=ref, path=instance.image.name)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Dish)
+@receiver(post_save, sender=DishImage)
+def record_menu_change(sender, instance, **kwargs):
+    changes.record(changes.MODEL_KINDS[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Dish)
+@receiver(post_delete, sender=DishImage)
+def record_menu_deletion(sender, instance, **kwargs):
+    changes.record(changes.MODEL_KINDS[sender], [instance.pk], deleted=True)
+
+
+@receiver(pre_delete, sender=Category)
+def record_uncategorised_dishes(sender, instance, **kwargs):
+    # on_delete=SET_NULL rewrites these rows without sending post_save.
+    changes.record("dish", list(Dish.objects.filter(category=instance).values_list("id", flat=True)))
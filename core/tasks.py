@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import images, invoices
+from .models import Order, Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "MODE": "thread",
+    "THREADS": 2,
+    "MAX_ATTEMPTS": 5,
+    "BACKOFF_SECONDS": 30,
+    "MAX_BACKOFF_SECONDS": 3600,
+    "LEASE_SECONDS": 300,
+    "SWEEP_SECONDS": 60,
+}
+
+SWEEP_LIMIT = 100
+
+registry = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+_last_sweep = None
+_sweep_lock = threading.Lock()
+
+
+def _config(name):
+    return getattr(settings, "TASKS", {}).get(name, DEFAULTS[name])
+
+
+def task(name):
+    def register(func):
+        registry[name] = func
+        return func
+
+    return register
+
+
+def enqueue(name, ref="", max_attempts=None, **payload):
+    if name not in registry:
+        raise KeyError(f"Unknown task: {name}")
+    job = Task.objects.create(
+        name=name,
+        payload=payload,
+        ref=ref,
+        max_attempts=max_attempts or _config("MAX_ATTEMPTS"),
+    )
+    mode = _config("MODE")
+    if mode == "thread":
+        transaction.on_commit(lambda: _submit(job.id))
+        transaction.on_commit(_sweep)
+    elif mode == "immediate":
+        transaction.on_commit(lambda: run_task_id(job.id))
+    return job
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_config("THREADS"), thread_name_prefix="core-tasks"
+                )
+    return _executor
+
+
+def _submit(task_id, delay=0):
+    if delay:
+        timer = threading.Timer(delay, _submit, args=(task_id,))
+        timer.daemon = True
+        timer.start()
+        return
+    _pool().submit(_run_in_thread, task_id)
+
+
+def _sweep():
+    # Thread mode keeps retries in in-process timers and has no worker to
+    # reclaim expired leases, so jobs stranded by a restart or crash are
+    # resubmitted by the first enqueue after it, then at most every
+    # SWEEP_SECONDS. Claiming is atomic, so resubmitting a job this process
+    # already has scheduled is harmless.
+    global _last_sweep
+    with _sweep_lock:
+        now = time.monotonic()
+        if _last_sweep is not None and now - _last_sweep < _config("SWEEP_SECONDS"):
+            return
+        _last_sweep = now
+    for task_id in due_task_ids(SWEEP_LIMIT):
+        _submit(task_id)
+
+
+def _run_in_thread(task_id):
+    close_old_connections()
+    try:
+        job = run_task_id(task_id)
+        if job and job.status == "pending":
+            delay = (job.run_after - timezone.now()).total_seconds()
+            _submit(task_id, delay=max(delay, 0.1))
+    except Exception:
+        logger.exception("Task %s crashed in the thread pool", task_id)
+    finally:
+        close_old_connections()
+
+
+def backoff(attempts):
+    delay = _config("BACKOFF_SECONDS") * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, _config("MAX_BACKOFF_SECONDS")))
+
+
+def _claim(queryset):
+    now = timezone.now()
+    claimed = queryset.update(
+        status="running",
+        attempts=F("attempts") + 1,
+        locked_until=now + timedelta(seconds=_config("LEASE_SECONDS")),
+        updated_at=now,
+    )
+    return claimed == 1
+
+
+def _claimable(now):
+    # Pending work that is due, plus running work whose worker died without
+    # releasing its lease.
+    return Q(status="pending", run_after__lte=now) | Q(status="running", locked_until__lt=now)
+
+
+def run_task_id(task_id):
+    if not _claim(Task.objects.filter(_claimable(timezone.now()), id=task_id)):
+        return None
+    job = Task.objects.get(id=task_id)
+    _execute(job)
+    return job
+
+
+def due_task_ids(limit=10):
+    return list(
+        Task.objects.filter(_claimable(timezone.now()))
+        .order_by("run_after", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+
+
+def run_pending(limit=10):
+    return [job for job in (run_task_id(task_id) for task_id in due_task_ids(limit)) if job]
+
+
+def _execute(job):
+    func = registry.get(job.name)
+    try:
+        if func is None:
+            raise KeyError(f"Unknown task: {job.name}")
+        func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()[-4000:]
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            logger.error("Task %s (%s) failed permanently", job.id, job.name)
+        else:
+            job.status = "pending"
+            job.run_after = timezone.now() + backoff(job.attempts)
+            logger.warning("Task %s (%s) failed, retrying at %s", job.id, job.name, job.run_after)
+    else:
+        job.status = "succeeded"
+        job.last_error = ""
+    job.locked_until = None
+    job.save(update_fields=["status", "run_after", "locked_until", "last_error", "updated_at"])
+
+
+@task("send_invoice_email")
+def send_invoice_email(order_id, email):
+    if not settings.EMAIL_HOST_USER:
+        return
+    order = Order.objects.get(id=order_id)
+    pdf_bytes = invoices.cached_invoice_bytes(order)
+    if not pdf_bytes:
+        return
+    message = EmailMessage(
+        subject=f"Your FoodBooking Invoice #{order.id}",
+        body="Thanks for your order! Your invoice is attached.",
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email],
+    )
+    message.attach(f"invoice-{order.id}.pdf", pdf_bytes, "application/pdf")
+    message.send(fail_silently=False)
+
+
+@task("generate_image_variants")
+def generate_image_variants(path):
+    images.generate_variants(path)
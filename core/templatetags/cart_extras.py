@@ -7,4 +7,4 @@ register = template.Library()
 def get_item(cart, dish_id):
     if not cart:
         return None
-    return cart.get(str(dish_id))
+    return cart.quantity(dish_id)
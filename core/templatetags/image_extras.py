@@ -0,0 +1,28 @@
+from django import template
+from django.utils.html import format_html
+
+from core import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(url, alt="", sizes="100vw", css_class=""):
+    if not url:
+        return ""
+    sets = images.srcsets(url)
+    if not sets:
+        return format_html(
+            '<img class="{}" src="{}" alt="{}" loading="lazy" decoding="async" />', css_class, url, alt
+        )
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}" />'
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" alt="{}" loading="lazy" decoding="async" /></picture>',
+        sets["webp"],
+        sizes,
+        css_class,
+        url,
+        sets["jpeg"],
+        sizes,
+        alt,
+    )
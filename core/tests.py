@@ -1,3 +1,1492 @@
-from django.test import TestCase
+import gzip
+import json
+import math
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import benchmarks, catalog, eta, geo, images, invoices, metrics, nplusone, seed, tasks
+from .cart import Cart
+from .models import (
+    Category,
+    DailyDishSales,
+    DailySales,
+    Dish,
+    DishImage,
+    MenuChange,
+    Order,
+    OrderItem,
+    Restaurant,
+    RestaurantProfile,
+    SupportTicket,
+    Task,
+)
+from .orders import summarize
+from .pagination import encode_cursor
+from .search import search_dishes
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name="Spice Route")
+        cls.category = Category.objects.create(name="Mains")
+        cls.tikka = Dish.objects.create(
+            restaurant=cls.restaurant,
+            category=cls.category,
+            name="Paneer Tikka",
+            description="Smoky cottage cheese",
+            price=Decimal("240.00"),
+        )
+        cls.dal = Dish.objects.create(
+            restaurant=cls.restaurant,
+            name="Dal Makhani",
+            description="Slow cooked lentils with paneer garnish",
+            price=Decimal("180.00"),
+        )
+
+    def test_prefix_match_ranks_name_hits_first(self):
+        results = list(search_dishes(Dish.objects.all(), "pane"))
+        self.assertEqual(results, [self.tikka, self.dal])
+
+    def test_restaurant_rename_is_reindexed(self):
+        self.restaurant.name = "Curry Corner"
+        self.restaurant.save()
+        self.assertEqual(search_dishes(Dish.objects.all(), "curry").count(), 2)
+        self.assertEqual(search_dishes(Dish.objects.all(), "spice").count(), 0)
+
+    def test_deleted_dish_leaves_index(self):
+        self.dal.delete()
+        self.assertEqual(list(search_dishes(Dish.objects.all(), "lentils")), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(search_dishes(Dish.objects.all(), 'tikka"* (smoky').count(), 1)
+
+    def test_index_is_matched_once_and_ranked_results_page(self):
+        sql = str(search_dishes(Dish.objects.all(), "pane").query)
+        self.assertEqual(sql.count("MATCH"), 1)
+        seen = []
+        params = {"q": "paneer"}
+        with self.settings(APP_HOME_PAGE_SIZE=1):
+            while True:
+                data = self.client.get(reverse("app_dishes_json"), params).json()
+                seen.extend(dish["id"] for dish in data["dishes"])
+                if not data["next_cursor"]:
+                    break
+                params["cursor"] = data["next_cursor"]
+        self.assertEqual(seen, [self.tikka.id, self.dal.id])
+
+    def test_app_home_uses_index(self):
+        response = self.client.get(reverse("app_home"), {"q": "makh"})
+        self.assertEqual(list(response.context["dishes"]), [self.dal])
+
+
+@override_settings(APP_HOME_PAGE_SIZE=2)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        restaurant = Restaurant.objects.create(name="Tandoor House")
+        prices = ["120.00", "90.00", "120.00", "300.00", "90.00"]
+        ratings = ["4.5", "3.9", "4.5", "4.1", "4.8"]
+        cls.dishes = [
+            Dish.objects.create(
+                restaurant=restaurant,
+                name=f"Roti {index}",
+                price=Decimal(price),
+                rating=Decimal(rating),
+            )
+            for index, (price, rating) in enumerate(zip(prices, ratings))
+        ]
+
+    def _walk(self, sort):
+        seen = []
+        params = {"sort": sort}
+        while True:
+            data = self.client.get(reverse("app_dishes_json"), params).json()
+            seen.extend(dish["id"] for dish in data["dishes"])
+            if not data["next_cursor"]:
+                return seen
+            params["cursor"] = data["next_cursor"]
+
+    def test_every_sort_mode_visits_each_dish_once(self):
+        for sort, ordering in [
+            ("price_asc", ("price", "id")),
+            ("price_desc", ("-price", "-id")),
+            ("rating", ("-rating", "-id")),
+            ("", ("id",)),
+        ]:
+            with self.subTest(sort=sort):
+                expected = list(Dish.objects.order_by(*ordering).values_list("id", flat=True))
+                self.assertEqual(self._walk(sort), expected)
+
+    def test_cursor_from_another_sort_is_rejected(self):
+        cursor = self.client.get(reverse("app_dishes_json"), {"sort": "rating"}).json()["next_cursor"]
+        response = self.client.get(reverse("app_dishes_json"), {"sort": "price_asc", "cursor": cursor})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_values_of_the_wrong_type_are_rejected(self):
+        for sort, ordering, values in [
+            ("", ("id",), ["x"]),
+            ("", ("id",), [None]),
+            ("", ("id",), [[1]]),
+            ("price_asc", ("price", "id"), ["abc", 1]),
+            ("rating", ("-rating", "-id"), [{"a": 1}, 1]),
+        ]:
+            with self.subTest(sort=sort, values=values):
+                cursor = encode_cursor(ordering, values)
+                response = self.client.get(reverse("app_dishes_json"), {"sort": sort, "cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+                response = self.client.get(reverse("app_home"), {"sort": sort, "cursor": cursor})
+                self.assertEqual(response.status_code, 200)
+
+    def test_app_home_renders_first_page(self):
+        response = self.client.get(reverse("app_home"))
+        self.assertEqual(len(response.context["dishes"]), 2)
+        self.assertTrue(response.context["next_cursor"])
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name="Dosa Point")
+        cls.category = Category.objects.create(name="Breakfast")
+        cls.dosa = Dish.objects.create(
+            restaurant=cls.restaurant,
+            category=cls.category,
+            name="Masala Dosa",
+            price=Decimal("110.00"),
+        )
+
+    def setUp(self):
+        cache.clear()
+        catalog.reset_stats()
+
+    def test_menu_is_served_from_cache(self):
+        catalog.get_menu(self.restaurant.id)
+        with self.assertNumQueries(0):
+            menu = catalog.get_menu(self.restaurant.id)
+        self.assertEqual([d["name"] for d in menu["dishes"]], ["Masala Dosa"])
+        self.assertEqual(catalog.stats()["hits"], 1)
+        self.assertEqual(catalog.stats()["misses"], 1)
+
+    def test_saves_bump_the_menu_version(self):
+        catalog.get_menu(self.restaurant.id)
+        self.dosa.price = Decimal("125.00")
+        self.dosa.save()
+        self.assertEqual(catalog.get_menu(self.restaurant.id)["dishes"][0]["price"], Decimal("125.00"))
+        self.category.name = "Tiffin"
+        self.category.save()
+        self.assertEqual(catalog.get_menu(self.restaurant.id)["categories"][0]["name"], "Tiffin")
+
+    def test_restaurant_list_tracks_activation(self):
+        self.assertEqual(len(catalog.get_restaurants()), 1)
+        self.restaurant.is_active = False
+        self.restaurant.save()
+        self.assertEqual(catalog.get_restaurants(), [])
+
+    def test_cart_rows_come_from_menu(self):
+        rows = catalog.get_dishes([str(self.dosa.id)])
+        self.assertEqual(rows[self.dosa.id]["restaurant"]["name"], "Dosa Point")
+
+
+class MenuSectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name="Udupi Kitchen")
+        starters = Category.objects.create(name="Starters")
+        mains = Category.objects.create(name="Mains")
+        for name, category in [("Vada", starters), ("Thali", mains), ("Idli", starters), ("Payasam", None)]:
+            Dish.objects.create(restaurant=cls.restaurant, category=category, name=name, price=Decimal("80.00"))
+
+    def test_sections_follow_category_order_with_other_last(self):
+        sections = catalog.build_menu_sections(catalog.get_menu(self.restaurant.id))
+        self.assertEqual(
+            [(s["category"] and s["category"]["name"], [d["name"] for d in s["dishes"]]) for s in sections],
+            [("Mains", ["Thali"]), ("Starters", ["Idli", "Vada"]), (None, ["Payasam"])],
+        )
+
+    def test_html_and_json_share_sections(self):
+        html = self.client.get(reverse("app_home"), {"restaurant": self.restaurant.id, "veg": "veg"})
+        data = self.client.get(
+            reverse("restaurant_menu_json", args=[self.restaurant.id]), {"veg": "veg"}
+        ).json()
+        self.assertEqual(
+            [[d["id"] for d in s["dishes"]] for s in html.context["grouped"]],
+            [[d["id"] for d in s["dishes"]] for s in data["sections"]],
+        )
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("asha", email="Asha@Example.com", password="pass12345")
+        cls.restaurant = Restaurant.objects.create(name="Biryani Bay")
+        category = Category.objects.create(name="Rice")
+        cls.dish = Dish.objects.create(
+            restaurant=cls.restaurant, category=category, name="Veg Biryani", price=Decimal("220.00")
+        )
+        Dish.objects.create(restaurant=cls.restaurant, name="Raita", price=Decimal("40.00"))
+        cls.order = Order.objects.create(
+            user=cls.user, customer_name="Asha", customer_phone="1", address="Street", total_amount=220
+        )
+        OrderItem.objects.create(order=cls.order, dish=cls.dish, quantity=1, price=cls.dish.price)
+        SupportTicket.objects.create(user=cls.user, subject="Late", message="Order was late")
+        owner = User.objects.create_user("owner", password="pass12345")
+        RestaurantProfile.objects.create(user=owner, restaurant=cls.restaurant)
+
+    def _full_scans(self, statements):
+        scans = []
+        with connection.cursor() as cursor:
+            for sql, params in statements:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if (
+                        detail.startswith("SCAN ")
+                        and "USING" not in detail
+                        and "VIRTUAL TABLE" not in detail
+                        and "CONSTANT ROW" not in detail
+                        and "SUBQUERY" not in detail.upper()
+                    ):
+                        scans.append(f"{detail}\n    {sql}")
+        return scans
+
+    def _assert_no_full_scan(self, method, url, data=None):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith("SELECT"):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        cache.clear()
+        with connection.execute_wrapper(capture):
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400, url)
+        self.assertTrue(statements, url)
+        scans = self._full_scans(statements)
+        self.assertFalse(scans, f"{url} fell back to a full scan:\n" + "\n".join(scans))
+
+    def test_public_views(self):
+        home = reverse("app_home")
+        for params in [
+            {},
+            {"sort": "price_asc"},
+            {"sort": "price_desc"},
+            {"sort": "rating"},
+            {"sort": "distance", "lat": "12.97", "lng": "77.59"},
+            {"q": "biry"},
+        ]:
+            with self.subTest(params=params):
+                self._assert_no_full_scan("get", home, params)
+        with self.settings(APP_HOME_PAGE_SIZE=1):
+            for sort in ["price_asc", "rating", ""]:
+                params = {"sort": sort}
+                params["cursor"] = self.client.get(reverse("app_dishes_json"), params).json()["next_cursor"]
+                with self.subTest(cursor_sort=sort):
+                    self._assert_no_full_scan("get", reverse("app_dishes_json"), params)
+        self._assert_no_full_scan("get", home, {"restaurant": self.restaurant.id, "q": "rai"})
+        self._assert_no_full_scan("get", reverse("restaurant_menu_json", args=[self.restaurant.id]))
+        self._assert_no_full_scan("post", reverse("add_to_cart_json", args=[self.dish.id]))
+        self._assert_no_full_scan("get", reverse("cart"))
+        self._assert_no_full_scan("post", reverse("login"), {"username": "asha@example.com", "password": "pass12345"})
+
+    def test_customer_views(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse("add_to_cart_json", args=[self.dish.id]))
+        self._assert_no_full_scan("get", reverse("checkout"))
+        self._assert_no_full_scan("get", reverse("invoice", args=[self.order.id]))
+        self._assert_no_full_scan("get", reverse("order_history"))
+        self._assert_no_full_scan("get", reverse("help_center"))
+
+    def test_restaurant_dashboard(self):
+        self.client.force_login(User.objects.get(username="owner"))
+        self._assert_no_full_scan("get", reverse("restaurant_dashboard"))
+
+
+class EtaServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(
+            name="Koramangala Kitchen", latitude=Decimal("12.935200"), longitude=Decimal("77.624500")
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_results_are_cached_per_geohash_cell(self):
+        provider = eta.FakeProvider(seconds=900)
+        service = eta.EtaService(provider)
+        first = service.estimate(12.9716, 77.5946, self.restaurant)
+        second = service.estimate(12.97161, 77.59461, self.restaurant)
+        self.assertEqual(first, second)
+        self.assertEqual(first["source"], "fake")
+        self.assertEqual(len(provider.calls), 1)
+
+    def test_provider_failure_falls_back_to_local_estimate(self):
+        provider = eta.FakeProvider(error=eta.ProviderError("timeout"))
+        service = eta.EtaService(provider)
+        result = service.estimate(12.9716, 77.5946, self.restaurant)
+        self.assertEqual(result["source"], "haversine")
+        self.assertGreater(result["duration_seconds"], 0)
+        cache.clear()
+        service.estimate(12.9716, 77.5946, self.restaurant)
+        self.assertEqual(len(provider.calls), 1)
+
+    def test_malformed_google_response_is_a_provider_error(self):
+        provider = eta.GoogleDistanceMatrixProvider(api_key="test-key")
+        element = {"status": "OK", "duration": {"value": 600, "text": "10 mins"}}
+        for data in (
+            [],
+            {"status": "OK", "rows": []},
+            {"status": "OK", "rows": [{"elements": []}]},
+            {"status": "OK", "rows": [{"elements": [element]}]},
+            {"status": "OK", "rows": [{"elements": [element, "x"]}]},
+            {"status": "OK", "rows": [{"elements": [element, {"status": "OK", "duration": 5}]}]},
+        ):
+            with self.subTest(data=data), mock.patch.object(provider, "_get", return_value=data):
+                with self.assertRaises(eta.ProviderError):
+                    provider.estimate_many((12.9, 77.5), [(12.91, 77.51), (12.92, 77.52)])
+        with mock.patch.object(provider, "_get", return_value={"status": "OK", "rows": [{"elements": [element]}]}):
+            result = eta.EtaService(provider).estimate(12.9716, 77.5946, self.restaurant)
+        self.assertEqual(result["source"], "google")
+        cache.clear()
+        with mock.patch.object(provider, "_get", return_value={"status": "OK", "rows": []}):
+            result = eta.EtaService(provider).estimate(12.9716, 77.5946, self.restaurant)
+        self.assertEqual(result["source"], "haversine")
+
+    def test_eta_view_uses_service(self):
+        eta.set_service(eta.EtaService(eta.FakeProvider(seconds=1500)))
+        self.addCleanup(eta.set_service, None)
+        response = self.client.get(
+            reverse("eta"), {"restaurant": self.restaurant.id, "lat": "12.97", "lng": "77.59"}
+        )
+        self.assertEqual(response.json()["duration_text"], "25 mins")
+
+    def test_batch_endpoint_makes_one_provider_call_and_shares_cache(self):
+        other = Restaurant.objects.create(
+            name="Indiranagar Grill", latitude=Decimal("12.978400"), longitude=Decimal("77.640800")
+        )
+        Restaurant.objects.create(name="No Location")
+        provider = eta.FakeProvider(seconds=1200)
+        eta.set_service(eta.EtaService(provider))
+        self.addCleanup(eta.set_service, None)
+        data = self.client.get(reverse("eta_batch"), {"lat": "12.97", "lng": "77.59"}).json()
+        self.assertEqual(set(data["etas"]), {str(self.restaurant.id), str(other.id)})
+        self.assertEqual(len(provider.calls), 1)
+        self.assertEqual(len(provider.calls[0][1]), 2)
+        self.client.get(reverse("eta"), {"restaurant": other.id, "lat": "12.97", "lng": "77.59"})
+        self.assertEqual(len(provider.calls), 1)
+
+
+class NearbyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.near = Restaurant.objects.create(
+            name="Near", latitude=Decimal("12.971600"), longitude=Decimal("77.594600")
+        )
+        cls.mid = Restaurant.objects.create(
+            name="Mid", latitude=Decimal("12.990000"), longitude=Decimal("77.600000")
+        )
+        cls.far = Restaurant.objects.create(
+            name="Far", latitude=Decimal("13.400000"), longitude=Decimal("77.900000")
+        )
+        for restaurant in (cls.far, cls.mid, cls.near):
+            Dish.objects.create(restaurant=restaurant, name=f"{restaurant.name} Thali", price=Decimal("150.00"))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_grid_index_matches_brute_force(self):
+        points = [(i, 12.0 + (i * 37 % 100) / 50, 77.0 + (i * 53 % 100) / 50) for i in range(200)]
+        index = geo.GridIndex(points)
+        origin = (12.9, 77.7)
+        brute = sorted((geo.haversine_m(*origin, lat, lng), key) for key, lat, lng in points)
+        self.assertEqual([key for _, key in index.nearest(*origin, 7)], [key for _, key in brute[:7]])
+        self.assertEqual(
+            [key for _, key in index.within(*origin, 20000)],
+            [key for distance, key in brute if distance <= 20000],
+        )
+
+    def test_nearby_endpoint_uses_radius_and_k(self):
+        url = reverse("nearby_restaurants")
+        data = self.client.get(url, {"lat": "12.9716", "lng": "77.5946", "radius_km": "5"}).json()
+        self.assertEqual([r["name"] for r in data["restaurants"]], ["Near", "Mid"])
+        data = self.client.get(url, {"lat": "12.9716", "lng": "77.5946", "k": "1"}).json()
+        self.assertEqual([r["name"] for r in data["restaurants"]], ["Near"])
+
+    def test_index_rebuilds_after_restaurant_save(self):
+        geo.restaurant_index()
+        self.far.latitude = Decimal("12.972000")
+        self.far.longitude = Decimal("77.595000")
+        self.far.save()
+        found = geo.restaurant_index().within(12.9716, 77.5946, 5000)
+        self.assertIn(self.far.id, [rid for _, rid in found])
+
+    def test_app_home_sorts_by_distance(self):
+        response = self.client.get(
+            reverse("app_home"), {"sort": "distance", "lat": "12.9716", "lng": "77.5946"}
+        )
+        self.assertEqual([d.name for d in response.context["dishes"]], ["Near Thali", "Mid Thali"])
+
+    def test_distance_sort_radius_matches_the_nearby_endpoint(self):
+        origin = (12.9716, 77.5946)
+        stalls = []
+        for i in range(40):
+            # Just inside and outside 10 km on every bearing, where a flat-earth
+            # approximation would disagree with haversine.
+            bearing = math.radians(i * 9)
+            distance = 9990 + (i % 5) * 5
+            d_lat = math.degrees(distance / geo.EARTH_RADIUS_M) * math.cos(bearing)
+            d_lng = math.degrees(distance / geo.EARTH_RADIUS_M) * math.sin(bearing) / math.cos(math.radians(origin[0]))
+            stalls.append(
+                Restaurant(
+                    name=f"Ring {i}",
+                    latitude=Decimal(f"{origin[0] + d_lat:.6f}"),
+                    longitude=Decimal(f"{origin[1] + d_lng:.6f}"),
+                )
+            )
+        Restaurant.objects.bulk_create(stalls)
+        Dish.objects.bulk_create(
+            Dish(restaurant=restaurant, name=f"{restaurant.name} Thali", price=Decimal("100.00"))
+            for restaurant in Restaurant.objects.filter(name__startswith="Ring ")
+        )
+        with self.settings(NEARBY_RADIUS_KM=10, APP_HOME_PAGE_SIZE=100):
+            dishes = self.client.get(
+                reverse("app_dishes_json"), {"sort": "distance", "lat": origin[0], "lng": origin[1]}
+            ).json()["dishes"]
+            expected = [rid for _, rid in geo.restaurant_index().within(*origin, 10000)]
+        self.assertEqual([dish["restaurant"]["id"] for dish in dishes], expected)
+        self.assertGreater(len(expected), 3)
+        self.assertLess(len(expected), 40)
+
+    def test_distance_sort_pages_without_a_parameter_per_restaurant(self):
+        Restaurant.objects.bulk_create(
+            Restaurant(name=f"Stall {i}", latitude=Decimal("12.95"), longitude=Decimal("77.58")) for i in range(300)
+        )
+        params = {"sort": "distance", "lat": "12.9716", "lng": "77.5946"}
+        sizes = []
+
+        def capture(execute, sql, query_params, many, context):
+            sizes.append(len(query_params or ()))
+            return execute(sql, query_params, many, context)
+
+        with self.settings(APP_HOME_PAGE_SIZE=1), connection.execute_wrapper(capture):
+            first = self.client.get(reverse("app_dishes_json"), params).json()
+            second = self.client.get(reverse("app_dishes_json"), {**params, "cursor": first["next_cursor"]}).json()
+        self.assertLess(max(sizes), 100)
+        self.assertEqual([d["name"] for d in first["dishes"] + second["dishes"]], ["Near Thali", "Mid Thali"])
+        self.assertIsNone(second["next_cursor"])
+
+
+@override_settings(TASKS={"MODE": "worker", "BACKOFF_SECONDS": 30}, EMAIL_HOST_USER="orders@example.com")
+class TaskQueueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("ravi", email="ravi@example.com", password="pass12345")
+        restaurant = Restaurant.objects.create(name="Chaat Corner")
+        cls.dish = Dish.objects.create(restaurant=restaurant, name="Pani Puri", price=Decimal("60.00"))
+
+    def test_checkout_queues_invoice_email_instead_of_sending(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.client.force_login(self.user)
+        self.client.post(reverse("add_to_cart_json", args=[self.dish.id]))
+        response = self.client.post(reverse("checkout"), {"name": "Ravi", "payment": "COD"})
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse("invoice", args=[order.id]))
+        self.assertEqual(len(mail.outbox), 0)
+        status = self.client.get(reverse("invoice_status", args=[order.id])).json()
+        self.assertEqual(status["tasks"][0]["status"], "pending")
+
+        with self.settings(INVOICE_CACHE_ROOT=root):
+            call_command("run_tasks", "--once", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].attachments[0][0], f"invoice-{order.id}.pdf")
+        status = self.client.get(reverse("invoice_status", args=[order.id])).json()
+        self.assertEqual(status["tasks"][0]["status"], "succeeded")
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        calls = []
+
+        @tasks.task("flaky")
+        def flaky():
+            calls.append(1)
+            raise RuntimeError("smtp down")
+
+        self.addCleanup(tasks.registry.pop, "flaky")
+        job = tasks.enqueue("flaky", max_attempts=2)
+        tasks.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=25))
+        self.assertEqual(tasks.run_pending(), [])
+
+        Task.objects.filter(id=job.id).update(run_after=timezone.now())
+        tasks.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertIn("smtp down", job.last_error)
+        self.assertEqual(len(calls), 2)
+
+    def test_expired_lease_is_reclaimed(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        order = Order.objects.create(user=self.user, customer_name="Ravi")
+        job = tasks.enqueue("send_invoice_email", order_id=order.id, email="x@example.com", max_attempts=1)
+        Task.objects.filter(id=job.id).update(
+            status="running", locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        with self.settings(INVOICE_CACHE_ROOT=root):
+            self.assertEqual([j.id for j in tasks.run_pending()], [job.id])
+        job.refresh_from_db()
+        self.assertEqual(job.status, "succeeded")
+
+    def test_thread_mode_enqueue_resubmits_stranded_jobs(self):
+        order = Order.objects.create(user=self.user, customer_name="Ravi")
+        now = timezone.now()
+        due = tasks.enqueue("send_invoice_email", order_id=order.id, email="x@example.com")
+        leased = tasks.enqueue("send_invoice_email", order_id=order.id, email="x@example.com")
+        later = tasks.enqueue("send_invoice_email", order_id=order.id, email="x@example.com")
+        Task.objects.filter(id=leased.id).update(status="running", locked_until=now - timedelta(seconds=1))
+        Task.objects.filter(id=later.id).update(run_after=now + timedelta(hours=1))
+        self.addCleanup(setattr, tasks, "_last_sweep", None)
+        tasks._last_sweep = None
+        with self.settings(TASKS={"MODE": "thread"}), mock.patch.object(tasks, "_submit") as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                job = tasks.enqueue("send_invoice_email", order_id=order.id, email="x@example.com")
+            submitted = [call.args[0] for call in submit.call_args_list]
+            self.assertEqual(submitted[0], job.id)
+            self.assertEqual(sorted(set(submitted[1:])), sorted([due.id, leased.id, job.id]))
+            submit.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                second = tasks.enqueue("send_invoice_email", order_id=order.id, email="x@example.com")
+            self.assertEqual([call.args[0] for call in submit.call_args_list], [second.id])
+
+
+class InvoiceCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("meera", password="pass12345")
+        dish = Dish.objects.create(
+            restaurant=Restaurant.objects.create(name="Pongal Place"), name="Ven Pongal", price=Decimal("90.00")
+        )
+        cls.order = Order.objects.create(
+            user=cls.user, customer_name="Meera", customer_phone="2", address="Lane", total_amount=90
+        )
+        OrderItem.objects.create(order=cls.order, dish=dish, quantity=1, price=dish.price)
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        overrides = self.settings(INVOICE_CACHE_ROOT=root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client.force_login(self.user)
+        self.url = reverse("invoice_pdf", args=[self.order.id])
+
+    def test_pdf_is_rendered_once_and_revalidated_with_etag(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        body = b"".join(first.streaming_content)
+        self.assertTrue(body.startswith(b"%PDF"))
+        with self.assertNumQueries(4):
+            # session, user, order, and the items for the input digest
+            second = self.client.get(self.url)
+        self.assertEqual(b"".join(second.streaming_content), body)
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_changed_inputs_replace_the_cached_artifact(self):
+        first = self.client.get(self.url)
+        Dish.objects.update(name="Ghee Pongal")
+        second = self.client.get(self.url)
+        self.assertNotEqual(first["ETag"], second["ETag"])
+        self.assertEqual(self.client.get(self.url)["ETag"], second["ETag"])
+        folder = os.path.join(settings.INVOICE_CACHE_ROOT, invoices.LAYOUT_VERSION, str(self.order.id))
+        self.assertEqual(os.listdir(folder), [second["ETag"].strip('"') + ".pdf"])
+
+    def test_if_modified_since_alone_revalidates(self):
+        first = self.client.get(self.url)
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_missing_reportlab_redirects_to_the_invoice_page(self):
+        with mock.patch("core.invoices.build_invoice_pdf", return_value=None):
+            response = self.client.get(self.url)
+        self.assertRedirects(response, reverse("invoice", args=[self.order.id]), fetch_redirect_response=False)
+
+    def test_x_accel_redirect_hands_off_to_web_server(self):
+        with self.settings(INVOICE_SENDFILE="x-accel-redirect"):
+            response = self.client.get(self.url)
+        self.assertEqual(response.content, b"")
+        self.assertTrue(response["X-Accel-Redirect"].startswith(f"/protected-invoices/v1/{self.order.id}/"))
+
+
+@override_settings(TASKS={"MODE": "worker"})
+class CheckoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("anil", email="anil@example.com", password="pass12345")
+        restaurant = Restaurant.objects.create(name="Dosa Hut")
+        cls.dishes = [
+            Dish.objects.create(restaurant=restaurant, name=f"Dosa {i}", price=Decimal("50.00") + i)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        cart = Cart(session)
+        for dish in self.dishes:
+            cart.add(dish.id, 2)
+        cart.save()
+        session.save()
+
+    def test_items_are_bulk_inserted_and_total_computed_in_sql(self):
+        with self.assertNumQueries(18):
+            # session/user, idempotency lookup, savepoint, locked dish read,
+            # order insert, one bulk item insert, sales rollups (4), total
+            # update + reload, release, invoice task insert, session save (3).
+            response = self.client.post(
+                reverse("checkout"), {"name": "Anil", "payment": "COD", "idempotency_key": "k1"}
+            )
+        order = Order.objects.get()
+        self.assertRedirects(response, reverse("invoice", args=[order.id]), fetch_redirect_response=False)
+        self.assertEqual(order.items.count(), 5)
+        self.assertEqual(order.total_amount, Decimal("520.00"))
+
+    def test_retried_post_returns_the_existing_order(self):
+        first = self.client.post(reverse("checkout"), {"name": "Anil", "idempotency_key": "retry-1"})
+        second = self.client.post(reverse("checkout"), {"name": "Anil", "idempotency_key": "retry-1"})
+        order = Order.objects.get()
+        self.assertEqual(first["Location"], second["Location"])
+        self.assertEqual(second["Location"], reverse("invoice", args=[order.id]))
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_losing_a_concurrent_checkout_race_is_a_duplicate(self):
+        winner = Order.objects.create(user=self.user, customer_name="Anil", idempotency_key="race-1")
+        metrics.reset()
+        # The pre-check misses the order, as it would before the winner commits.
+        with mock.patch("core.orders.existing_order", side_effect=[None, winner]):
+            response = self.client.post(reverse("checkout"), {"name": "Anil", "idempotency_key": "race-1"})
+        self.assertRedirects(response, reverse("invoice", args=[winner.id]), fetch_redirect_response=False)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertFalse(Task.objects.exists())
+        totals = metrics.collect()
+        self.assertEqual(totals[("foodbooking_checkouts_total", ("duplicate",))], 1)
+        self.assertNotIn(("foodbooking_checkouts_total", ("success",)), totals)
+
+    def test_unavailable_dish_aborts_the_whole_order(self):
+        Dish.objects.filter(id=self.dishes[0].id).update(is_available=False)
+        response = self.client.post(reverse("checkout"), {"name": "Anil", "idempotency_key": "k2"})
+        self.assertRedirects(response, reverse("cart"), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(len(Cart(self.client.session)), 5)
+
+
+class CartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = Restaurant.objects.create(name="Idli House")
+        cls.second = Restaurant.objects.create(name="Biryani Point")
+        cls.idli = Dish.objects.create(restaurant=cls.first, name="Idli", price=Decimal("40.00"))
+        cls.vada = Dish.objects.create(restaurant=cls.first, name="Vada", price=Decimal("30.00"))
+        cls.biryani = Dish.objects.create(restaurant=cls.second, name="Biryani", price=Decimal("220.00"))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_adds_are_served_from_the_snapshot_without_queries(self):
+        self.client.post(reverse("add_to_cart_json", args=[self.idli.id]))
+        with self.assertNumQueries(4):
+            # session read and the session write (savepoint, update, release)
+            response = self.client.post(reverse("add_to_cart_json", args=[self.idli.id]))
+        self.assertEqual(response.json(), {"dish_id": self.idli.id, "qty": 2, "cart_count": 2, "removed": []})
+        catalog.get_dishes([self.biryani.id])
+        with self.assertNumQueries(1):
+            # the restaurant check compares against the snapshot, not a dish query
+            response = self.client.post(reverse("add_to_cart_json", args=[self.biryani.id]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_prices_are_refreshed_when_the_menu_changes(self):
+        self.client.post(reverse("add_to_cart_json", args=[self.idli.id]))
+        self.client.post(reverse("add_to_cart_json", args=[self.vada.id]))
+        self.vada.is_available = False
+        self.vada.save()
+        self.idli.price = Decimal("45.00")
+        self.idli.save()
+        response = self.client.get(reverse("cart"))
+        self.assertEqual(response.context["total"], Decimal("45.00"))
+        self.assertEqual([line["dish"]["name"] for line in response.context["items"]], ["Idli"])
+        self.assertContains(response, "Vada is no longer available")
+
+    def test_setting_a_quantity_reports_dishes_it_dropped(self):
+        self.client.post(reverse("add_to_cart_json", args=[self.idli.id]))
+        self.client.post(reverse("add_to_cart_json", args=[self.vada.id]))
+        self.vada.is_available = False
+        self.vada.save()
+        response = self.client.post(reverse("update_cart_json", args=[self.idli.id]), {"qty": 3})
+        self.assertEqual(response.json()["removed"], ["Vada"])
+        self.assertEqual(response.json()["cart_count"], 3)
+
+        self.vada.is_available = True
+        self.vada.save()
+        self.client.post(reverse("add_to_cart_json", args=[self.vada.id]))
+        self.vada.is_available = False
+        self.vada.save()
+        response = self.client.post(reverse("update_cart", args=[self.idli.id]), {"qty": 2}, follow=True)
+        self.assertContains(response, "Vada is no longer available")
+
+    def test_batch_total_matches_its_lines(self):
+        self.client.post(reverse("add_to_cart_json", args=[self.idli.id]))
+        self.client.post(reverse("add_to_cart_json", args=[self.vada.id]))
+        self.vada.is_available = False
+        self.vada.save()
+        ops = [{"op": "set", "dish": self.idli.id, "qty": 2}]
+        cart = self.client.post(reverse("cart_batch"), {"ops": ops}, content_type="application/json").json()["cart"]
+        self.assertEqual(cart["removed"], ["Vada"])
+        self.assertEqual(cart["total"], "80.00")
+        self.assertEqual([line["line_total"] for line in cart["lines"]], ["80.00"])
+
+    def test_legacy_session_cart_is_upgraded(self):
+        session = self.client.session
+        session["cart"] = {str(self.idli.id): 3}
+        session.save()
+        response = self.client.get(reverse("cart"))
+        self.assertEqual(response.context["total"], Decimal("120.00"))
+        self.assertEqual(self.client.session["cart"]["r"], self.first.id)
+
+    def test_batch_applies_all_operations_with_one_session_write(self):
+        self.client.post(reverse("add_to_cart_json", args=[self.vada.id]))
+        ops = [
+            {"op": "add", "dish": self.idli.id, "qty": 2},
+            {"op": "add", "dish": self.idli.id},
+            {"op": "set", "dish": self.vada.id, "qty": 4},
+        ]
+        with self.assertNumQueries(5):
+            # session read, restaurant lookup for the new dish, and the session
+            # write (savepoint, update, release)
+            response = self.client.post(
+                reverse("cart_batch"), {"ops": ops}, content_type="application/json"
+            )
+        cart = response.json()["cart"]
+        self.assertEqual(cart["count"], 7)
+        self.assertEqual(cart["total"], "240.00")
+        self.assertEqual(
+            {line["name"]: (line["qty"], line["line_total"]) for line in cart["lines"]},
+            {"Idli": (3, "120.00"), "Vada": (4, "120.00")},
+        )
+
+    def test_failed_batch_leaves_the_cart_untouched(self):
+        self.client.post(reverse("add_to_cart_json", args=[self.idli.id]))
+        self.client.post(reverse("add_to_cart_json", args=[self.vada.id]))
+        ops = [
+            {"op": "set", "dish": self.idli.id, "qty": 5},
+            {"op": "add", "dish": self.biryani.id},
+        ]
+        response = self.client.post(reverse("cart_batch"), {"ops": ops}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["op"], 1)
+        self.assertEqual(response.json()["cart"]["count"], 2)
+        self.assertEqual(Cart(self.client.session).quantities(), {self.idli.id: 1, self.vada.id: 1})
+
+
+@override_settings(TASKS={"MODE": "worker"})
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name="Thali Express")
+        cls.owner = User.objects.create_user("owner", password="pass12345")
+        RestaurantProfile.objects.create(user=cls.owner, restaurant=cls.restaurant)
+        cls.customer = User.objects.create_user("guest", password="pass12345")
+        cls.thali = Dish.objects.create(restaurant=cls.restaurant, name="Thali", price=Decimal("150.00"))
+        cls.lassi = Dish.objects.create(restaurant=cls.restaurant, name="Lassi", price=Decimal("60.00"))
+
+    def _checkout(self, **quantities):
+        self.client.force_login(self.customer)
+        session = self.client.session
+        cart = Cart(session)
+        for name, qty in quantities.items():
+            cart.add(getattr(self, name).id, qty)
+        cart.save()
+        session.save()
+        self.client.post(reverse("checkout"), {"name": "Guest"})
+
+    def test_checkout_updates_rollups_and_dashboard_reads_them(self):
+        self._checkout(thali=2, lassi=1)
+        self._checkout(lassi=3)
+        day = DailySales.objects.get()
+        self.assertEqual((day.orders, day.items, day.revenue), (2, 6, Decimal("540.00")))
+        self.assertEqual(
+            dict(DailyDishSales.objects.values_list("dish__name", "quantity")), {"Thali": 2, "Lassi": 4}
+        )
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse("restaurant_dashboard"))
+        self.assertEqual(response.context["today_orders"], 2)
+        self.assertEqual(response.context["revenue"], Decimal("540.00"))
+        self.assertEqual(response.context["popular_items"][0], {"dish__name": "Lassi", "qty": 4})
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self._checkout(thali=1, lassi=2)
+        self._checkout(thali=4)
+        Order.objects.filter(id=Order.objects.first().id).update(
+            created_at=timezone.now() - timedelta(days=3)
+        )
+        DailySales.objects.update(orders=0, revenue=0)
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        rows = DailySales.objects.order_by("date").values_list("orders", "items", "revenue")
+        self.assertEqual(list(rows), [(1, 3, Decimal("270.00")), (1, 4, Decimal("600.00"))])
+        self.assertEqual(DailyDishSales.objects.count(), 3)
+
+    def test_analytics_series_by_day_week_and_hour(self):
+        self._checkout(thali=2, lassi=1)
+        self._checkout(lassi=3)
+        old = Order.objects.order_by("id").first()
+        Order.objects.filter(id=old.id).update(created_at=old.created_at - timedelta(days=2))
+        call_command("rebuild_sales_rollups", stdout=StringIO())
+        self.client.force_login(self.owner)
+        url = reverse("restaurant_analytics")
+        today = timezone.localdate()
+
+        daily = self.client.get(url, {"start": today - timedelta(days=3), "end": today}).json()
+        self.assertEqual(len(daily["labels"]), 4)
+        self.assertEqual(daily["orders"], [0, 1, 0, 1])
+        self.assertEqual(daily["revenue"], [0, 360.0, 0, 180.0])
+        self.assertEqual(daily["avg_basket"][1], 360.0)
+        self.assertEqual(daily["totals"], {"orders": 2, "items": 6, "revenue": 540.0, "avg_basket": 270.0})
+        self.assertEqual(
+            [(d["name"], d["quantity"], d["series"]) for d in daily["dishes"]],
+            [("Lassi", 4, [0, 1, 0, 3]), ("Thali", 2, [0, 2, 0, 0])],
+        )
+
+        weekly = self.client.get(url, {"start": today - timedelta(days=13), "end": today, "bucket": "week"}).json()
+        self.assertEqual(sum(weekly["orders"]), 2)
+        self.assertEqual(date.fromisoformat(weekly["labels"][0]).weekday(), 0)
+
+        hourly = self.client.get(url, {"start": today, "end": today, "bucket": "hour"}).json()
+        self.assertEqual(len(hourly["labels"]), 24)
+        self.assertEqual(hourly["totals"]["orders"], 1)
+        self.assertEqual(hourly["dishes"][0]["series"][timezone.localtime().hour], 3)
+
+        too_long = self.client.get(url, {"start": today - timedelta(days=60), "end": today, "bucket": "hour"})
+        self.assertEqual(too_long.status_code, 400)
+
+        negative = self.client.get(url, {"dishes": -1})
+        self.assertEqual(negative.status_code, 400)
+
+
+@override_settings(ORDER_HISTORY_PAGE_SIZE=2, TASKS={"MODE": "worker"})
+class OrderHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("kavya", password="pass12345")
+        restaurant = Restaurant.objects.create(name="Meals Ready")
+        cls.dishes = [
+            Dish.objects.create(restaurant=restaurant, name=name, price=Decimal("80.00"))
+            for name in ("Rajma Rice", "Chole", "Paratha")
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _checkout(self, quantities):
+        session = self.client.session
+        cart = Cart(session)
+        for dish, qty in zip(self.dishes, quantities):
+            if qty:
+                cart.add(dish.id, qty)
+        cart.save()
+        session.save()
+        self.client.post(reverse("checkout"), {"name": "Kavya"})
+
+    def test_checkout_stores_item_summary(self):
+        self._checkout([2, 0, 1])
+        order = Order.objects.get()
+        self.assertEqual(order.item_count, 3)
+        self.assertEqual(order.item_summary, "Rajma Rice × 2, Paratha × 1")
+
+    def test_summary_is_truncated_with_a_remainder(self):
+        summary = summarize([(f"Dish number {i:03d} with a long name", 1) for i in range(20)])
+        self.assertLessEqual(len(summary), 255)
+        self.assertTrue(summary.endswith("more"))
+
+    def test_history_pages_by_keyset_without_touching_items(self):
+        for quantities in ([1, 0, 0], [0, 1, 0], [0, 0, 1]):
+            self._checkout(quantities)
+        with self.assertNumQueries(3):
+            # session, user, one narrow order query
+            response = self.client.get(reverse("order_history"))
+        self.assertEqual([o.item_summary for o in response.context["orders"]], ["Paratha × 1", "Chole × 1"])
+        page = self.client.get(
+            reverse("order_history_json"), {"cursor": response.context["next_cursor"]}
+        ).json()
+        self.assertEqual([o["item_summary"] for o in page["orders"]], ["Rajma Rice × 1"])
+        self.assertIsNone(page["next_cursor"])
+
+    def test_tampered_history_cursor_is_rejected(self):
+        self._checkout([1, 0, 0])
+        for values in (["x"], [None], [10**30]):
+            with self.subTest(values=values):
+                cursor = encode_cursor(("-id",), values)
+                response = self.client.get(reverse("order_history_json"), {"cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+                response = self.client.get(reverse("order_history"), {"cursor": cursor})
+                self.assertEqual(response.status_code, 200)
+
+
+def _png(width=1200, height=800, mode="RGBA"):
+    buffer = BytesIO()
+    Image.new(mode, (width, height), (200, 80, 20, 255) if mode == "RGBA" else (200, 80, 20)).save(buffer, "PNG")
+    return SimpleUploadedFile("photo.png", buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(TASKS={"MODE": "worker"})
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        overrides = self.settings(MEDIA_ROOT=root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.root = root
+        self.restaurant = Restaurant.objects.create(name="Snap Cafe")
+
+    def test_upload_queues_variants_and_worker_builds_them(self):
+        dish = Dish.objects.create(restaurant=self.restaurant, name="Masala Dosa", price=90, image=_png())
+        job = Task.objects.get(name="generate_image_variants")
+        self.assertEqual(job.payload, {"path": dish.image.name})
+        tasks.run_pending()
+        for width in (160, 320, 640):
+            for fmt, ext in (("WEBP", "webp"), ("JPEG", "jpg")):
+                with Image.open(f"{self.root}/{images.variant_name(dish.image.name, width, fmt.lower())}") as im:
+                    self.assertEqual((im.format, im.width), (fmt, width))
+        sets = images.srcsets(dish.image_url)
+        self.assertIn(".320w.webp 320w", sets["webp"])
+        html = Template("{% load image_extras %}{% responsive_image url 'Dosa' '320px' 'dish-image' %}").render(
+            Context({"url": dish.image_url})
+        )
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('.640w.jpg 640w"', html)
+
+    def test_backfill_command_skips_built_images(self):
+        Dish.objects.create(restaurant=self.restaurant, name="Uttapam", price=80, image=_png(300, 200, "RGB"))
+        out = StringIO()
+        call_command("build_image_variants", stdout=out)
+        self.assertIn("Built variants for 1 images (0 up to date", out.getvalue())
+        out = StringIO()
+        call_command("build_image_variants", stdout=out)
+        self.assertIn("Built variants for 0 images (1 up to date", out.getvalue())
+
+
+class ResizeEndpointTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        cache_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.addCleanup(shutil.rmtree, cache_root)
+        overrides = self.settings(
+            MEDIA_ROOT=media,
+            IMAGE_RESIZE={"SIZES": ("160x160", "320x0"), "CACHE_ROOT": cache_root, "MAX_CACHE_BYTES": 10**9, "MAX_AGE": 600},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.cache_root = cache_root
+        Image.new("RGB", (1000, 500), (10, 120, 40)).save(f"{media}/dish.jpg", "JPEG")
+
+    def _cached(self):
+        return [path for _, _, path in images._cached_files(self.cache_root)]
+
+    def test_resizes_once_and_revalidates(self):
+        url = reverse("resized_image", args=[160, 160, "dish.jpg"])
+        first = self.client.get(url, HTTP_ACCEPT="image/webp,*/*")
+        self.assertEqual(first["Content-Type"], "image/webp")
+        self.assertEqual(first["Cache-Control"], "public, max-age=600")
+        with Image.open(BytesIO(b"".join(first.streaming_content))) as im:
+            self.assertEqual(im.size, (160, 160))
+        self.assertEqual(len(self._cached()), 1)
+        again = self.client.get(url, HTTP_ACCEPT="image/webp", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        jpeg = self.client.get(reverse("resized_image", args=[320, 0, "dish.jpg"]))
+        with Image.open(BytesIO(b"".join(jpeg.streaming_content))) as im:
+            self.assertEqual((im.format, im.size), ("JPEG", (320, 160)))
+
+    def test_if_modified_since_alone_revalidates(self):
+        url = reverse("resized_image", args=[160, 160, "dish.jpg"])
+        first = self.client.get(url)
+        again = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_variant_evicted_before_it_is_opened_is_rebuilt(self):
+        original = images.resized
+        calls = []
+
+        def evicted_once(*args):
+            artifact = original(*args)
+            if not calls:
+                os.remove(artifact["path"])
+            calls.append(args)
+            return artifact
+
+        with mock.patch.object(images, "resized", evicted_once):
+            response = self.client.get(reverse("resized_image", args=[160, 160, "dish.jpg"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        with Image.open(BytesIO(b"".join(response.streaming_content))) as im:
+            self.assertEqual(im.size, (160, 160))
+
+    def test_rejects_unlisted_sizes_and_paths_outside_media(self):
+        self.assertEqual(self.client.get(reverse("resized_image", args=[161, 160, "dish.jpg"])).status_code, 404)
+        self.assertEqual(self.client.get("/img/160x160/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get(reverse("resized_image", args=[160, 160, "missing.jpg"])).status_code, 404)
+
+    def test_concurrent_misses_resize_once(self):
+        calls = []
+        original = images.encode
+
+        def slow_encode(*args, **kwargs):
+            calls.append(1)
+            threading.Event().wait(0.05)
+            return original(*args, **kwargs)
+
+        with mock.patch.object(images, "encode", slow_encode):
+            workers = [
+                threading.Thread(target=images.resized, args=("dish.jpg", 160, 160, "jpeg")) for _ in range(6)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_eviction_drops_least_recently_used(self):
+        old = images.resized("dish.jpg", 160, 160, "jpeg")["path"]
+        new = images.resized("dish.jpg", 320, 0, "jpeg")["path"]
+        os.utime(old, (1, 1))
+        removed = images.evict(self.cache_root, limit=int(os.path.getsize(new) * 1.2))
+        self.assertEqual(removed, 1)
+        self.assertEqual(self._cached(), [new])
+
+
+class MenuApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name="Api Bhavan", latitude=12.97, longitude=77.59)
+        category = Category.objects.create(name="Tiffin")
+        cls.dishes = [
+            Dish.objects.create(
+                restaurant=cls.restaurant, category=category, name=f"Item {i}", price=Decimal("30.00") + i,
+                description="Soft, fluffy and served with chutney " * 3,
+            )
+            for i in range(10)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("api_restaurant_menu", args=[self.restaurant.id])
+
+    def test_menu_is_gzipped_and_fields_are_selectable(self):
+        response = self.client.get(self.url, {"fields": "id,price"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(data["dishes"][0], {"id": self.dishes[0].id, "price": "30.00"})
+        self.assertEqual(data["categories"][0]["name"], "Tiffin")
+        bad = self.client.get(self.url, {"fields": "id,secret"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_if_none_match_is_answered_without_queries(self):
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        self.dishes[0].price = Decimal("99.00")
+        self.dishes[0].save()
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+        self.assertEqual(changed.json()["dishes"][0]["price"], "99.00")
+
+    def test_restaurant_and_category_lists(self):
+        restaurants = self.client.get(reverse("api_restaurants"), {"fields": "id,name,latitude"}).json()
+        self.assertEqual(restaurants["restaurants"], [{"id": self.restaurant.id, "name": "Api Bhavan", "latitude": 12.97}])
+        etag = self.client.get(reverse("api_categories"))["ETag"]
+        Category.objects.create(name="Drinks")
+        response = self.client.get(reverse("api_categories"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual([c["name"] for c in response.json()["categories"]], ["Drinks", "Tiffin"])
+
+
+class MenuChangesTests(TestCase):
+    def setUp(self):
+        self.url = reverse("api_menu_changes")
+        self.restaurant = Restaurant.objects.create(name="Sync Cafe")
+        self.category = Category.objects.create(name="Snacks")
+        self.dish = Dish.objects.create(
+            restaurant=self.restaurant, category=self.category, name="Samosa", price=Decimal("15.00")
+        )
+
+    def test_full_sync_then_delta(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual([row["name"] for row in data["restaurants"]], ["Sync Cafe"])
+        self.assertEqual(data["dishes"][0]["price"], "15.00")
+        self.assertFalse(data["more"])
+        seq = data["seq"]
+
+        self.assertEqual(self.client.get(self.url, {"since": seq}).json()["seq"], seq)
+
+        self.dish.price = Decimal("18.00")
+        self.dish.save()
+        delta = self.client.get(self.url, {"since": seq}).json()
+        self.assertEqual(delta["restaurants"], [])
+        self.assertEqual([(row["id"], row["price"]) for row in delta["dishes"]], [(self.dish.id, "18.00")])
+        self.assertGreater(delta["seq"], seq)
+        self.assertEqual(MenuChange.objects.filter(kind="dish", object_id=self.dish.id).count(), 1)
+
+    def test_deletions_are_tombstoned(self):
+        seq = self.client.get(self.url).json()["seq"]
+        dish_id, category_id, restaurant_id = self.dish.id, self.category.id, self.restaurant.id
+        self.category.delete()
+        delta = self.client.get(self.url, {"since": seq}).json()
+        self.assertEqual(delta["deleted"]["categories"], [category_id])
+        self.assertIsNone(delta["dishes"][0]["category_id"])
+
+        seq = delta["seq"]
+        self.restaurant.delete()
+        delta = self.client.get(self.url, {"since": seq}).json()
+        self.assertEqual(delta["deleted"]["dishes"], [dish_id])
+        self.assertEqual(delta["deleted"]["restaurants"], [restaurant_id])
+
+    def test_paging_and_validation(self):
+        first = self.client.get(self.url, {"limit": 2}).json()
+        self.assertTrue(first["more"])
+        rest = self.client.get(self.url, {"since": first["seq"], "limit": 2}).json()
+        self.assertFalse(rest["more"])
+        self.assertEqual(len(first["restaurants"] + first["categories"] + rest["dishes"]), 3)
+        self.assertEqual(self.client.get(self.url, {"since": "x"}).status_code, 400)
+
+    def test_commit_lag_holds_back_recent_changes(self):
+        MenuChange.objects.filter(kind="dish").update(changed_at=timezone.now() - timedelta(minutes=1))
+        with self.settings(MENU_CHANGES_COMMIT_LAG=5):
+            data = self.client.get(self.url).json()
+            self.assertEqual([row["name"] for row in data["dishes"]], [])
+            self.assertEqual(data["restaurants"], [])
+            MenuChange.objects.update(changed_at=timezone.now() - timedelta(minutes=1))
+            data = self.client.get(self.url).json()
+        self.assertEqual([row["name"] for row in data["dishes"]], ["Samosa"])
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = seed.load(**seed.PRESETS["tiny"], seed=7)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_load_is_reproducible(self):
+        self.assertEqual(self.counts["dishes"], 32)
+        self.assertEqual(OrderItem.objects.count(), self.counts["order_items"])
+        self.assertTrue(DailySales.objects.exists())
+        first = list(Dish.objects.order_by("id").values_list("name", "price")[:8])
+        seed.load(**seed.PRESETS["tiny"], seed=7, prefix="again")
+        again = list(Dish.objects.order_by("-id").values_list("name", "price")[:32])[::-1][:8]
+        self.assertEqual(first, again)
+        with self.assertRaises(seed.SeedError):
+            seed.load(**seed.PRESETS["tiny"], seed=7, prefix="again")
+
+    def test_seeded_orders_span_the_history_without_patching_the_model(self):
+        self.assertTrue(Order._meta.get_field("created_at").auto_now_add)
+        days = Order.objects.dates("created_at", "day")
+        self.assertGreater(days.count(), 1)
+        order = Order.objects.create(customer_name="Fresh", customer_phone="9000000000", address="1 Park Street")
+        self.assertGreater(order.created_at, timezone.now() - timedelta(minutes=1))
+
+    def test_views_stay_within_query_budgets(self):
+        ctx = benchmarks.context()
+        for name, scenario in benchmarks.SCENARIOS.items():
+            with self.subTest(name):
+                client = benchmarks.client_for(scenario, ctx)
+                url = scenario["url"](ctx)
+                client.get(url)
+                with self.assertNumQueries(scenario["budget"]):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_runner_reports_latency_and_memory(self):
+        result = benchmarks.run(["cart_view"], iterations=3, warmup=1)[0]
+        self.assertEqual(result["status"], 200)
+        self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+        self.assertLessEqual(result["queries"], result["budget"])
+        self.assertGreater(result["peak_kib"], 0)
+
+
+@override_settings(REQUEST_TIMING={"ENABLED": True, "SLOW_REQUEST_MS": 0, "TOP_SQL": 2})
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(
+            name="Timed Tiffins", latitude=Decimal("12.935200"), longitude=Decimal("77.624500")
+        )
+        Dish.objects.create(restaurant=cls.restaurant, name="Upma", price=Decimal("35.00"))
+
+    def test_header_breaks_down_sql_template_and_eta_time(self):
+        with self.assertLogs("core.timing", "WARNING") as logs:
+            response = self.client.get(reverse("app_home"))
+        header = response["Server-Timing"]
+        self.assertRegex(header, r'^db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("tpl;dur=", header)
+        self.assertIn("total;dur=", header)
+        record = logs.records[0].request_timing
+        self.assertEqual(record["view"], "app_home")
+        self.assertEqual(len(record["top_sql"]), 2)
+        self.assertGreaterEqual(record["top_sql"][0]["ms"], record["top_sql"][1]["ms"])
+
+        eta.set_service(eta.EtaService(eta.FakeProvider(seconds=600)))
+        self.addCleanup(eta.set_service, None)
+        with self.assertLogs("core.timing", "WARNING"):
+            response = self.client.get(
+                reverse("eta"), {"restaurant": self.restaurant.id, "lat": "12.97", "lng": "77.59"}
+            )
+        self.assertIn("eta;dur=", response["Server-Timing"])
+
+    @override_settings(REQUEST_TIMING={"ENABLED": False})
+    def test_disabled_middleware_is_not_installed(self):
+        response = self.client.get(reverse("app_home"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+@override_settings(NPLUSONE={"ENABLED": True, "ACTION": "raise", "THRESHOLD": 3}, TASKS={"MODE": "worker"})
+class NPlusOneTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("nina", password="pass12345", is_staff=True, is_superuser=True)
+        category = Category.objects.create(name="Mains")
+        cls.dishes = []
+        for i in range(4):
+            restaurant = Restaurant.objects.create(name=f"Place {i}")
+            dish = Dish.objects.create(restaurant=restaurant, category=category, name=f"Dish {i}", price=10 + i)
+            DishImage.objects.create(dish=dish, image=f"dishes/extra/{i}.jpg")
+            cls.dishes.append(dish)
+        RestaurantProfile.objects.create(user=cls.user, restaurant=cls.dishes[0].restaurant)
+        for i in range(4):
+            order = Order.objects.create(user=cls.user, customer_name="Nina", customer_phone="1", address="x")
+            OrderItem.objects.create(order=order, dish=cls.dishes[i], quantity=1, price=cls.dishes[i].price)
+        cls.order = order
+
+    def test_lazy_foreign_key_loop_is_reported_with_call_site(self):
+        with self.assertRaises(nplusone.NPlusOneError) as raised, nplusone.detect(action="raise"):
+            [dish.restaurant.name for dish in Dish.objects.all()]
+        message = str(raised.exception)
+        self.assertIn("core/tests.py", message)
+        self.assertIn("Dish.restaurant", message)
+
+    def test_template_loop_is_reported_with_template_line(self):
+        template = Template("{% for dish in dishes %}\n{{ dish.images.all|length }}{% endfor %}")
+        with self.assertWarns(nplusone.NPlusOneWarning) as warned, nplusone.detect(action="warn"):
+            template.render(Context({"dishes": Dish.objects.all()}))
+        self.assertIn(":2", str(warned.warning))
+        self.assertIn("prefetch_related('images')", str(warned.warning))
+
+    def test_main_pages_do_not_trigger_the_detector(self):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session["cart"] = {str(self.dishes[0].id): 1}
+        session.save()
+        urls = [
+            reverse("app_home"),
+            reverse("app_home") + f"?restaurant={self.dishes[0].restaurant_id}",
+            reverse("app_dishes_json"),
+            reverse("cart"),
+            reverse("order_history"),
+            reverse("order_history_json"),
+            reverse("invoice", args=[self.order.id]),
+            reverse("restaurant_dashboard"),
+            reverse("api_restaurants"),
+            reverse("api_menu_changes"),
+        ]
+        for model in ("dish", "dishimage", "restaurantprofile", "order", "supportticket"):
+            urls.append(reverse(f"admin:core_{model}_changelist"))
+        for url in urls:
+            with self.subTest(url):
+                self.assertLess(self.client.get(url).status_code, 400)
+
+
+@override_settings(TASKS={"MODE": "worker"})
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("mo", password="pass12345")
+        cls.admin = User.objects.create_superuser("ops", password="pass12345")
+        restaurant = Restaurant.objects.create(name="Metric Meals")
+        cls.owner = User.objects.create_user("owner", password="pass12345", is_staff=True)
+        RestaurantProfile.objects.create(user=cls.owner, restaurant=restaurant)
+        cls.dish = Dish.objects.create(restaurant=restaurant, name="Pulao", price=Decimal("250.00"))
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_ordering_funnel_is_exported(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse("add_to_cart_json", args=[self.dish.id]))
+        self.client.post(reverse("add_to_cart_json", args=[999999]))
+        self.client.post(reverse("checkout"), {"name": "Mo", "phone": "1", "address": "x", "idempotency_key": "k1"})
+        self.client.post(reverse("checkout"), {"idempotency_key": "k1"})
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("metrics"))
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('foodbooking_cart_operations_total{op="add",result="ok"} 1', body)
+        self.assertIn('foodbooking_cart_operations_total{op="add",result="error"} 1', body)
+        self.assertIn('foodbooking_checkouts_total{result="success"} 1', body)
+        self.assertIn('foodbooking_checkouts_total{result="duplicate"} 1', body)
+        self.assertIn('foodbooking_order_value_rupees_bucket{le="300.0"} 1', body)
+        self.assertIn('foodbooking_order_value_rupees_sum 250.0', body)
+        self.assertIn(
+            'foodbooking_http_request_duration_seconds_count{view="checkout",method="POST",status="3xx"} 2', body
+        )
+        self.assertIn("# TYPE foodbooking_catalog_cache_requests_total counter", body)
+
+    def test_scrape_requires_superuser_or_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.client.logout()
+        with override_settings(METRICS={"TOKEN": "s3cret"}):
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer nope")
+            self.assertEqual(response.status_code, 403)
+
+    def test_importing_without_settings_exits_cleanly(self):
+        env = {key: value for key, value in os.environ.items() if key != "DJANGO_SETTINGS_MODULE"}
+        result = subprocess.run(
+            [sys.executable, "-c", "import core.metrics"],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stderr, "")
+
+    def test_workers_are_summed_through_the_shared_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS={"DIR": directory, "FLUSH_INTERVAL": 60}):
+            metrics.CHECKOUTS.inc("success")
+            metrics.INVOICE_PDF_BUILD.observe(0.2)
+            metrics.flush()
+            self.assertEqual(len(os.listdir(directory)), 1)
+            # Another worker's published totals.
+            with open(os.path.join(directory, "1-1.json"), "w") as handle:
+                json.dump(
+                    [
+                        ["foodbooking_checkouts_total", ["success"], 2],
+                        ["foodbooking_invoice_pdf_build_seconds", [], [0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0.9]],
+                    ],
+                    handle,
+                )
+            metrics.CHECKOUTS.inc("success")
+            body = metrics.render()
+        self.assertIn('foodbooking_checkouts_total{result="success"} 4', body)
+        self.assertIn('foodbooking_invoice_pdf_build_seconds_bucket{le="0.25"} 1', body)
+        self.assertIn('foodbooking_invoice_pdf_build_seconds_bucket{le="1.0"} 2', body)
+        self.assertIn("foodbooking_invoice_pdf_build_seconds_count 2", body)
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("pat", password="pass12345")
+        cls.customer = User.objects.create_user("cal", password="pass12345")
+        restaurant = Restaurant.objects.create(name="Profiled")
+        Dish.objects.create(restaurant=restaurant, name="Poha", price=20)
+        cls.owner = User.objects.create_user("oli", password="pass12345", is_staff=True)
+        RestaurantProfile.objects.create(user=cls.owner, restaurant=restaurant)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(
+            PROFILING={"ENABLED": True, "DIR": self.directory, "MAX_PROFILES": 2, "SAMPLE_INTERVAL": 0.001}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_superuser_requests_are_profiled_and_rotated(self):
+        self.client.force_login(self.admin)
+        names = [
+            self.client.get(reverse("app_home"), {"_profile": "1"})["X-Profile-Id"],
+            self.client.get(reverse("cart"), HTTP_X_PROFILE="1")["X-Profile-Id"],
+            self.client.get(reverse("app_home"), {"_profile": "1"})["X-Profile-Id"],
+        ]
+        self.assertFalse(self.client.get(reverse("app_home")).has_header("X-Profile-Id"))
+        kept = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        self.assertEqual(len(kept), 2)
+        self.assertIn(f"{names[-1]}.json", kept)
+
+        page = self.client.get(reverse("admin_profiles"))
+        self.assertContains(page, names[-1])
+        download = self.client.get(reverse("admin_profile_download", args=[f"{names[-1]}.pstats"]))
+        self.assertEqual(download.status_code, 200)
+        path = os.path.join(self.directory, f"{names[-1]}.pstats")
+        self.assertIn("app_home", "".join(func[2] for func in pstats.Stats(path).stats))
+        with open(os.path.join(self.directory, f"{names[-1]}.collapsed")) as handle:
+            line = handle.readline()
+        self.assertRegex(line, r"^\S.*;.* \d+\n$")
+        missing = self.client.get(reverse("admin_profile_download", args=["settings.py"]))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_non_staff_cannot_profile_or_browse(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse("app_home"), {"_profile": "1"})
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(self.client.get(reverse("admin_profiles")).status_code, 302)
+
+    def test_request_is_served_unprofiled_when_the_profiler_cannot_start(self):
+        self.client.force_login(self.admin)
+        with mock.patch("cProfile.Profile.enable", side_effect=ValueError("another profiler is active")):
+            with self.assertLogs("core.profiling", "WARNING"):
+                response = self.client.get(reverse("app_home"), {"_profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertFalse(any(thread.name == "profile-sampler" for thread in threading.enumerate()))
+
+    def test_restaurant_owners_cannot_profile_or_browse(self):
+        self.client.force_login(self.admin)
+        name = self.client.get(reverse("cart"), {"_profile": "1"})["X-Profile-Id"]
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse("app_home"), {"_profile": "1"})
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(self.client.get(reverse("admin_profiles")).status_code, 403)
+        download = self.client.get(reverse("admin_profile_download", args=[f"{name}.pstats"]))
+        self.assertEqual(download.status_code, 403)
@@ -0,0 +1,90 @@
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+DEFAULTS = {
+    "ENABLED": False,
+    "SLOW_REQUEST_MS": 500,
+    "TOP_SQL": 5,
+}
+
+_current = ContextVar("request_timing", default=None)
+
+
+def _config(name):
+    return getattr(settings, "REQUEST_TIMING", {}).get(name, DEFAULTS[name])
+
+
+def enabled():
+    return _config("ENABLED")
+
+
+def slow_request_seconds():
+    return _config("SLOW_REQUEST_MS") / 1000
+
+
+class RequestTiming:
+    def __init__(self, top_sql=None):
+        self.queries = 0
+        self.db = 0.0
+        self.spans = {}
+        self.top_sql = _config("TOP_SQL") if top_sql is None else top_sql
+        self._slowest = []
+        self._order = itertools.count()
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db += elapsed
+            if self.top_sql:
+                # Parameters are left out so slow-request logs never carry user data.
+                entry = (elapsed, next(self._order), sql)
+                if len(self._slowest) < self.top_sql:
+                    heapq.heappush(self._slowest, entry)
+                else:
+                    heapq.heappushpop(self._slowest, entry)
+
+    def slowest(self):
+        return [
+            {"ms": round(elapsed * 1000, 2), "sql": sql}
+            for elapsed, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    def header(self, total):
+        parts = [f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"']
+        parts.extend(f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(self.spans.items()))
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def start(timing):
+    return _current.set(timing)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    # Adds the block's duration to the current request, if one is being timed.
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - began)
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 
 urlpatterns = [
@@ -9,20 +9,34 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('register/', views.register_view, name='register'),
     path('app/', views.app_home, name='app_home'),
+    path('app/dishes.json', views.app_dishes_json, name='app_dishes_json'),
+    path('app/restaurants/<int:restaurant_id>/menu.json', views.restaurant_menu_json, name='restaurant_menu_json'),
+    path('api/restaurants', api.restaurants, name='api_restaurants'),
+    path('api/categories', api.categories, name='api_categories'),
+    path('api/restaurants/<int:restaurant_id>/menu', api.restaurant_menu, name='api_restaurant_menu'),
+    path('api/menu/changes', api.menu_changes, name='api_menu_changes'),
     path('cart/', views.cart_view, name='cart'),
     path('cart/add/<int:dish_id>/', views.add_to_cart, name='add_to_cart'),
     path('cart/add/<int:dish_id>/json/', views.add_to_cart_json, name='add_to_cart_json'),
     path('cart/remove/<int:dish_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('cart/update/<int:dish_id>/', views.update_cart, name='update_cart'),
     path('cart/update/<int:dish_id>/json/', views.update_cart_json, name='update_cart_json'),
+    path('cart/batch/', views.cart_batch, name='cart_batch'),
     path('eta/', views.eta_view, name='eta'),
+    path('eta/batch/', views.eta_batch_view, name='eta_batch'),
+    path('restaurants/nearby/', views.nearby_restaurants, name='nearby_restaurants'),
     path('cart/clear/', views.clear_cart, name='clear_cart'),
     path('checkout/', views.checkout, name='checkout'),
     path('invoice/<int:order_id>/', views.invoice, name='invoice'),
     path('invoice/<int:order_id>/pdf/', views.invoice_pdf, name='invoice_pdf'),
+    path('invoice/<int:order_id>/status/', views.invoice_status, name='invoice_status'),
+    path('img/<int:width>x<int:height>/<path:path>', views.resized_image, name='resized_image'),
     path('orders/', views.order_history, name='order_history'),
+    path('orders/page.json', views.order_history_json, name='order_history_json'),
     path('help/', views.help_center, name='help_center'),
     path('restaurant/login/', views.restaurant_login, name='restaurant_login'),
     path('restaurant/', views.restaurant_dashboard, name='restaurant_dashboard'),
+    path('restaurant/analytics.json', views.restaurant_analytics, name='restaurant_analytics'),
     path('restaurant/dishes/add/', views.restaurant_add_dish, name='restaurant_add_dish'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
@@ -1,24 +1,33 @@
+import json
+import uuid
+from datetime import date, timedelta
 from decimal import Decimal
 
-from io import BytesIO
-
-from django.contrib import messages
+from django.contrib import admin, messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.db.models import Avg, F, Q, Sum
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.db.models.functions import Lower
 from django.conf import settings
-from django.core.mail import EmailMessage
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.formats import date_format
+from django.utils.http import http_date
 
 from django.forms import formset_factory
 
+from . import catalog, eta, geo, images, invoices, metrics, orders, profiling, sales, tasks
+from .cart import Cart, CartError, DishUnavailable
 from .forms import DishForm
-from .models import Dish, Order, OrderItem, RestaurantProfile, Restaurant
-from .models import SupportTicket
+from .models import Dish, Order, RestaurantProfile, Restaurant
+from .models import SupportTicket, Task
+from .pagination import ORDER_HISTORY_ORDERING, InvalidCursor, ordering_for, paginate
+from .search import search_dishes
 
 
 def home(request):
@@ -33,7 +42,12 @@ def login_view(request):
         password = request.POST.get("password", "").strip()
         auth_username = username
         if "@" in username:
-            found_user = User.objects.filter(email__iexact=username).order_by("id").first()
+            found_user = (
+                User.objects.alias(email_lower=Lower("email"))
+                .filter(email_lower=username.lower())
+                .order_by("id")
+                .first()
+            )
             if found_user:
                 auth_username = found_user.username
         user = authenticate(request, username=auth_username, password=password)
@@ -79,23 +93,31 @@ def register_view(request):
     return render(request, "register.html")
 
 
-def app_home(request):
+def _request_location(request):
+    try:
+        return float(request.GET["lat"]), float(request.GET["lng"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _listing_ordering(request):
+    sort = request.GET.get("sort", "")
+    if sort == "distance" and _request_location(request) is None:
+        sort = ""
+    return ordering_for(sort, searching=bool(request.GET.get("q", "").strip()))
+
+
+def _filtered_dishes(request):
     query = request.GET.get("q", "").strip()
     veg = request.GET.get("veg")
-    sort = request.GET.get("sort", "")
     min_rating = request.GET.get("min_rating", "")
     price_band = request.GET.get("price", "")
     restaurant_id = request.GET.get("restaurant", "")
-    restaurants = Restaurant.objects.filter(is_active=True).order_by("name")
     dishes = Dish.objects.filter(is_available=True)
     if restaurant_id:
         dishes = dishes.filter(restaurant_id=restaurant_id)
     if query:
-        dishes = dishes.filter(
-            Q(name__icontains=query)
-            | Q(description__icontains=query)
-            | Q(restaurant__name__icontains=query)
-        )
+        dishes = search_dishes(dishes, query)
     if veg in {"veg", "nonveg"}:
         dishes = dishes.filter(is_veg=(veg == "veg"))
     if min_rating:
@@ -109,29 +131,60 @@ def app_home(request):
         dishes = dishes.filter(price__gt=200, price__lte=400)
     elif price_band == "high":
         dishes = dishes.filter(price__gt=400)
-    if sort == "price_asc":
-        dishes = dishes.order_by("price")
-    elif sort == "price_desc":
-        dishes = dishes.order_by("-price")
-    elif sort == "rating":
-        dishes = dishes.order_by("-rating")
-    dishes = dishes.select_related("restaurant", "category").prefetch_related("images")
+    location = _request_location(request)
+    if request.GET.get("sort") == "distance" and location:
+        dishes = geo.annotate_distance(dishes, *location, "distance_rank")
+    return dishes.select_related("restaurant", "category").prefetch_related("images")
+
+
+def _menu_dishes(request, menu):
+    query = request.GET.get("q", "").strip()
+    rows = menu["dishes"]
+    if query:
+        matches = list(
+            search_dishes(
+                Dish.objects.filter(restaurant_id=menu["restaurant"]["id"], is_available=True),
+                query,
+            ).values_list("id", flat=True)
+        )
+        position = {dish_id: index for index, dish_id in enumerate(matches)}
+        rows = sorted(
+            (row for row in rows if row["id"] in position),
+            key=lambda row: position[row["id"]],
+        )
+    return catalog.filter_dishes(
+        rows,
+        request.GET.get("veg"),
+        request.GET.get("min_rating", ""),
+        request.GET.get("price", ""),
+        request.GET.get("sort", ""),
+    )
+
+
+def app_home(request):
+    query = request.GET.get("q", "").strip()
+    veg = request.GET.get("veg")
+    sort = request.GET.get("sort", "")
+    min_rating = request.GET.get("min_rating", "")
+    price_band = request.GET.get("price", "")
+    restaurant_id = request.GET.get("restaurant", "")
+    restaurants = catalog.get_restaurants()
+    cart = Cart(request.session)
+    ordering = _listing_ordering(request)
     grouped = []
-    if restaurant_id:
-        from .models import Category
-        category_ids = dishes.values_list("category_id", flat=True).distinct()
-        categories = Category.objects.filter(id__in=category_ids).order_by("name")
-        for category in categories:
-            grouped.append(
-                {
-                    "category": category,
-                    "dishes": [d for d in dishes if d.category_id == category.id],
-                }
+    next_cursor = None
+    menu = catalog.get_menu(restaurant_id) if restaurant_id else None
+    if menu:
+        dishes = _menu_dishes(request, menu)
+        grouped = catalog.build_menu_sections(menu, dishes)
+    else:
+        dishes = _filtered_dishes(request)
+        try:
+            dishes, next_cursor = paginate(
+                dishes, ordering, request.GET.get("cursor"), settings.APP_HOME_PAGE_SIZE
             )
-        # Uncategorized
-        uncategorized = [d for d in dishes if d.category_id is None]
-        if uncategorized:
-            grouped.append({"category": None, "dishes": uncategorized})
+        except InvalidCursor:
+            dishes, next_cursor = paginate(dishes, ordering, None, settings.APP_HOME_PAGE_SIZE)
 
     return render(
         request,
@@ -139,120 +192,243 @@ def app_home(request):
         {
             "dishes": dishes,
             "grouped": grouped,
+            "next_cursor": next_cursor,
             "query": query,
             "filters": {
                 "veg": veg or "",
                 "sort": sort,
                 "min_rating": min_rating,
                 "price": price_band,
+                "lat": request.GET.get("lat", ""),
+                "lng": request.GET.get("lng", ""),
             },
-            "cart_count": _cart_count(_get_cart(request.session)),
-            "cart": _get_cart(request.session),
+            "cart_count": cart.count,
+            "cart": cart,
             "restaurants": restaurants,
             "selected_restaurant": restaurant_id,
         },
     )
 
 
-def _get_cart(session):
-    return session.get("cart", {})
-
-
-def _set_cart(session, cart):
-    session["cart"] = cart
-    session.modified = True
+def _dish_payload(dish, cart):
+    return {
+        "id": dish.id,
+        "name": dish.name,
+        "description": dish.description,
+        "price": str(dish.price),
+        "rating": str(dish.rating),
+        "is_veg": dish.is_veg,
+        "restaurant": {"id": dish.restaurant_id, "name": dish.restaurant.name},
+        "category": dish.category.name if dish.category_id else None,
+        "image": dish.image_url or dish.restaurant.image_url or None,
+        "image_srcset": images.srcsets(dish.image_url or dish.restaurant.image_url),
+        "images": dish.image_urls,
+        "cart_qty": cart.quantity(dish.id),
+    }
+
+
+def _menu_dish_payload(row, cart):
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "description": row["description"],
+        "price": str(row["price"]),
+        "rating": str(row["rating"]),
+        "is_veg": row["is_veg"],
+        "image": row["image_url"] or row["restaurant"]["image_url"] or None,
+        "image_srcset": images.srcsets(row["image_url"] or row["restaurant"]["image_url"]),
+        "images": row["image_urls"],
+        "cart_qty": cart.quantity(row["id"]),
+    }
+
+
+def restaurant_menu_json(request, restaurant_id):
+    menu = catalog.get_menu(restaurant_id)
+    if not menu:
+        return JsonResponse({"error": "Restaurant not found"}, status=404)
+    cart = Cart(request.session)
+    sections = catalog.build_menu_sections(menu, _menu_dishes(request, menu))
+    return JsonResponse(
+        {
+            "restaurant": {"id": menu["restaurant"]["id"], "name": menu["restaurant"]["name"]},
+            "sections": [
+                {
+                    "category": section["category"],
+                    "dishes": [_menu_dish_payload(row, cart) for row in section["dishes"]],
+                }
+                for section in sections
+            ],
+        }
+    )
 
 
-def _cart_count(cart):
-    return sum(cart.values()) if cart else 0
+def app_dishes_json(request):
+    ordering = _listing_ordering(request)
+    try:
+        dishes, next_cursor = paginate(
+            _filtered_dishes(request),
+            ordering,
+            request.GET.get("cursor"),
+            settings.APP_HOME_PAGE_SIZE,
+        )
+    except InvalidCursor as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    cart = Cart(request.session)
+    return JsonResponse(
+        {
+            "dishes": [_dish_payload(dish, cart) for dish in dishes],
+            "next_cursor": next_cursor,
+        }
+    )
 
 
 def add_to_cart(request, dish_id):
     if request.method != "POST":
         return redirect("app_home")
-    dish = get_object_or_404(Dish, id=dish_id, is_available=True)
-    cart = _get_cart(request.session)
-    if cart:
-        first_id = int(next(iter(cart.keys())))
-        first_dish = Dish.objects.filter(id=first_id).select_related("restaurant").first()
-        if first_dish and first_dish.restaurant_id != dish.restaurant_id:
-            messages.error(
-                request,
-                "You can only order from one restaurant at a time. Clear the cart to switch.",
-            )
-            return redirect("cart")
-    key = str(dish_id)
-    cart[key] = cart.get(key, 0) + 1
-    _set_cart(request.session, cart)
+    cart = Cart(request.session)
+    try:
+        cart.add(dish_id)
+    except DishUnavailable:
+        metrics.CART_OPERATIONS.inc("add", "error")
+        raise Http404("Dish not available")
+    except CartError as exc:
+        metrics.CART_OPERATIONS.inc("add", "error")
+        messages.error(request, str(exc))
+        return redirect("cart")
+    metrics.CART_OPERATIONS.inc("add", "ok")
+    _warn_dropped(request, cart.dropped)
+    cart.save()
     return redirect(request.META.get("HTTP_REFERER", "app_home"))
 
 
 def add_to_cart_json(request, dish_id):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
-    dish = get_object_or_404(Dish, id=dish_id, is_available=True)
-    cart = _get_cart(request.session)
-    if cart:
-        first_id = int(next(iter(cart.keys())))
-        first_dish = Dish.objects.filter(id=first_id).select_related("restaurant").first()
-        if first_dish and first_dish.restaurant_id != dish.restaurant_id:
-            return JsonResponse(
-                {
-                    "error": "You can only order from one restaurant at a time. Clear the cart to switch.",
-                },
-                status=400,
-            )
-    key = str(dish_id)
-    cart[key] = cart.get(key, 0) + 1
-    _set_cart(request.session, cart)
-    return JsonResponse(
-        {"dish_id": dish_id, "qty": cart[key], "cart_count": _cart_count(cart)}
-    )
+    cart = Cart(request.session)
+    try:
+        qty = cart.add(dish_id)
+    except DishUnavailable:
+        metrics.CART_OPERATIONS.inc("add", "error")
+        raise Http404("Dish not available")
+    except CartError as exc:
+        metrics.CART_OPERATIONS.inc("add", "error")
+        return JsonResponse({"error": str(exc)}, status=400)
+    metrics.CART_OPERATIONS.inc("add", "ok")
+    cart.save()
+    return JsonResponse({"dish_id": dish_id, "qty": qty, "cart_count": cart.count, "removed": cart.dropped})
 
 
 def remove_from_cart(request, dish_id):
-    cart = _get_cart(request.session)
-    key = str(dish_id)
-    if key in cart:
-        del cart[key]
-        _set_cart(request.session, cart)
+    cart = Cart(request.session)
+    cart.remove(dish_id)
+    metrics.CART_OPERATIONS.inc("remove", "ok")
+    cart.save()
     return redirect("cart")
 
 
 def clear_cart(request):
-    _set_cart(request.session, {})
+    cart = Cart(request.session)
+    cart.clear()
+    metrics.CART_OPERATIONS.inc("clear", "ok")
+    cart.save()
     return redirect("app_home")
 
 
 def update_cart(request, dish_id):
     if request.method != "POST":
         return redirect("cart")
-    qty = int(request.POST.get("qty", 1))
-    cart = _get_cart(request.session)
-    key = str(dish_id)
-    if qty <= 0:
-        cart.pop(key, None)
+    cart = Cart(request.session)
+    try:
+        cart.set(dish_id, int(request.POST.get("qty", 1)))
+    except CartError as exc:
+        metrics.CART_OPERATIONS.inc("set", "error")
+        messages.error(request, str(exc))
     else:
-        cart[key] = qty
-    _set_cart(request.session, cart)
+        metrics.CART_OPERATIONS.inc("set", "ok")
+    _warn_dropped(request, cart.dropped)
+    cart.save()
     return redirect("cart")
 
 
 def update_cart_json(request, dish_id):
     if request.method != "POST":
         return JsonResponse({"error": "Invalid method"}, status=405)
-    cart = _get_cart(request.session)
-    key = str(dish_id)
-    qty = int(request.POST.get("qty", 1))
-    if qty <= 0:
-        cart.pop(key, None)
-        qty = 0
+    cart = Cart(request.session)
+    try:
+        qty = cart.set(dish_id, int(request.POST.get("qty", 1)))
+    except CartError as exc:
+        metrics.CART_OPERATIONS.inc("set", "error")
+        return JsonResponse({"error": str(exc)}, status=400)
+    metrics.CART_OPERATIONS.inc("set", "ok")
+    cart.save()
+    return JsonResponse({"dish_id": dish_id, "qty": qty, "cart_count": cart.count, "removed": cart.dropped})
+
+
+def _cart_payload(cart):
+    lines = cart.lines()
+    return {
+        "restaurant_id": cart.restaurant_id,
+        "count": cart.count,
+        # Summed from the same lines so the two can never disagree.
+        "total": str(sum((line["line_total"] for line in lines), Decimal("0.00"))),
+        "lines": [
+            {
+                "dish_id": line["dish"]["id"],
+                "name": line["dish"]["name"],
+                "qty": line["qty"],
+                "price": str(line["price"]),
+                "line_total": str(line["line_total"]),
+            }
+            for line in lines
+        ],
+        "removed": cart.dropped,
+    }
+
+
+def _apply_cart_op(cart, op):
+    action = op.get("op")
+    dish_id = op.get("dish")
+    if action == "add":
+        cart.add(dish_id, int(op.get("qty", 1)))
+    elif action == "set":
+        cart.set(dish_id, int(op["qty"]))
+    elif action == "remove":
+        cart.remove(dish_id)
+    elif action == "clear":
+        cart.clear()
     else:
-        cart[key] = qty
-    _set_cart(request.session, cart)
-    return JsonResponse(
-        {"dish_id": dish_id, "qty": qty, "cart_count": _cart_count(cart)}
-    )
+        raise CartError(f"Unknown operation: {action}")
+
+
+def cart_batch(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid method"}, status=405)
+    try:
+        ops = json.loads(request.body or b"{}").get("ops", [])
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    if not isinstance(ops, list) or len(ops) > settings.CART_BATCH_LIMIT:
+        return JsonResponse({"error": "Too many operations"}, status=400)
+    cart = Cart(request.session)
+    for index, op in enumerate(ops):
+        try:
+            _apply_cart_op(cart, op)
+        except (CartError, KeyError, TypeError, ValueError, AttributeError) as exc:
+            metrics.CART_OPERATIONS.inc("batch", "error")
+            # Nothing is saved, so the session still holds the cart as it was
+            # before this batch.
+            return JsonResponse(
+                {
+                    "error": str(exc) if isinstance(exc, CartError) else "Invalid operation",
+                    "op": index,
+                    "cart": _cart_payload(Cart(request.session)),
+                },
+                status=400,
+            )
+    for op in ops:
+        metrics.CART_OPERATIONS.inc(op["op"], "ok")
+    cart.save()
+    return JsonResponse({"cart": _cart_payload(cart)})
 
 
 def eta_view(request):
@@ -261,108 +437,159 @@ def eta_view(request):
     lng = request.GET.get("lng")
     if not restaurant_id or not lat or not lng:
         return JsonResponse({"error": "Missing parameters"}, status=400)
+    try:
+        lat, lng = float(lat), float(lng)
+    except ValueError:
+        return JsonResponse({"error": "Invalid coordinates"}, status=400)
     restaurant = get_object_or_404(Restaurant, id=restaurant_id, is_active=True)
     if restaurant.latitude is None or restaurant.longitude is None:
         return JsonResponse({"error": "Restaurant location not set"}, status=400)
-    if not settings.GOOGLE_MAPS_API_KEY:
-        return JsonResponse({"error": "API key not configured"}, status=400)
+    result = eta.get_service().estimate(lat, lng, restaurant)
+    return JsonResponse(
+        {
+            "duration_text": result["duration_text"],
+            "duration_seconds": result["duration_seconds"],
+            "source": result["source"],
+            "restaurant": restaurant.name,
+        }
+    )
+
 
+def eta_batch_view(request):
+    lat = request.GET.get("lat")
+    lng = request.GET.get("lng")
+    if not lat or not lng:
+        return JsonResponse({"error": "Missing parameters"}, status=400)
     try:
-        import json
-        import urllib.parse
-        import urllib.request
-
-        origins = f"{lat},{lng}"
-        destinations = f"{restaurant.latitude},{restaurant.longitude}"
-        params = {
-            "origins": origins,
-            "destinations": destinations,
-            "key": settings.GOOGLE_MAPS_API_KEY,
+        lat, lng = float(lat), float(lng)
+        requested = {
+            int(rid) for rid in request.GET.get("restaurants", "").split(",") if rid.strip()
         }
-        url = (
-            "https://maps.googleapis.com/maps/api/distancematrix/json?"
-            + urllib.parse.urlencode(params)
-        )
-        with urllib.request.urlopen(url, timeout=5) as response:
-            data = json.loads(response.read().decode("utf-8"))
-        if data.get("status") != "OK":
-            return JsonResponse({"error": "API error"}, status=400)
-        element = data["rows"][0]["elements"][0]
-        if element.get("status") != "OK":
-            return JsonResponse({"error": "No route"}, status=400)
-        duration_text = element["duration"]["text"]
-        duration_value = element["duration"]["value"]
-        return JsonResponse(
-            {
-                "duration_text": duration_text,
-                "duration_seconds": duration_value,
-                "restaurant": restaurant.name,
+    except ValueError:
+        return JsonResponse({"error": "Invalid parameters"}, status=400)
+    if len(requested) > settings.ETA_BATCH_LIMIT:
+        return JsonResponse({"error": "Too many restaurants"}, status=400)
+    restaurants = [
+        r
+        for r in catalog.get_restaurants()
+        if r["latitude"] is not None
+        and r["longitude"] is not None
+        and (not requested or r["id"] in requested)
+    ][: settings.ETA_BATCH_LIMIT]
+    results = eta.get_service().estimate_many(
+        lat, lng, [(r["id"], r["latitude"], r["longitude"]) for r in restaurants]
+    )
+    return JsonResponse(
+        {
+            "etas": {
+                str(rid): {
+                    "duration_text": result["duration_text"],
+                    "duration_seconds": result["duration_seconds"],
+                    "source": result["source"],
+                }
+                for rid, result in results.items()
             }
-        )
-    except Exception:
-        return JsonResponse({"error": "ETA unavailable"}, status=500)
+        }
+    )
+
+
+def nearby_restaurants(request):
+    location = _request_location(request)
+    if location is None:
+        return JsonResponse({"error": "Missing parameters"}, status=400)
+    try:
+        radius_m = float(request.GET.get("radius_km", settings.NEARBY_RADIUS_KM)) * 1000
+        k = int(request.GET.get("k", 0))
+    except ValueError:
+        return JsonResponse({"error": "Invalid parameters"}, status=400)
+    index = geo.restaurant_index()
+    if k > 0:
+        found = index.nearest(*location, min(k, settings.ETA_BATCH_LIMIT), max_radius_m=radius_m)
+    else:
+        found = index.within(*location, radius_m)[: settings.ETA_BATCH_LIMIT]
+    names = {r["id"]: r["name"] for r in catalog.get_restaurants()}
+    return JsonResponse(
+        {
+            "restaurants": [
+                {"id": rid, "name": names.get(rid, ""), "distance_meters": int(distance)}
+                for distance, rid in found
+            ]
+        }
+    )
+
+
+def _warn_dropped(request, names):
+    for name in names:
+        messages.warning(request, f"{name} is no longer available and was removed from your cart.")
 
 
 def cart_view(request):
-    cart = _get_cart(request.session)
-    dish_ids = [int(d) for d in cart.keys()] if cart else []
-    dishes = Dish.objects.filter(id__in=dish_ids).select_related("restaurant")
-    items = []
-    total = Decimal("0.00")
-    for dish in dishes:
-        qty = cart.get(str(dish.id), 0)
-        line_total = dish.price * qty
-        total += line_total
-        items.append({"dish": dish, "qty": qty, "line_total": line_total})
-    return render(request, "cart.html", {"items": items, "total": total})
+    cart = Cart(request.session)
+    _warn_dropped(request, cart.revalidate())
+    cart.save()
+    return render(request, "cart.html", {"items": cart.lines(), "total": cart.total})
 
 
 @login_required
 def checkout(request):
-    cart = _get_cart(request.session)
+    if request.method == "POST":
+        idempotency_key = (
+            request.POST.get("idempotency_key") or request.headers.get("Idempotency-Key", "")
+        ).strip()[:64]
+        order = orders.existing_order(request.user, idempotency_key)
+        if order:
+            metrics.CHECKOUTS.inc("duplicate")
+            return redirect("invoice", order_id=order.id)
+
+    cart = Cart(request.session)
     if not cart:
         return redirect("app_home")
 
-    dish_ids = [int(d) for d in cart.keys()]
-    dishes = Dish.objects.filter(id__in=dish_ids)
-    total = sum(d.price * cart.get(str(d.id), 0) for d in dishes)
-
     if request.method == "POST":
-        order = Order.objects.create(
-            user=request.user,
-            customer_name=request.POST.get("name", "Guest"),
-            customer_phone=request.POST.get("phone", ""),
-            address=request.POST.get("address", ""),
-            delivery_latitude=request.POST.get("delivery_latitude") or None,
-            delivery_longitude=request.POST.get("delivery_longitude") or None,
-            payment_method=request.POST.get("payment", "COD"),
-            total_amount=total,
-            is_paid=request.POST.get("payment") == "ONLINE",
-        )
-        for dish in dishes:
-            qty = cart.get(str(dish.id), 0)
-            if qty:
-                OrderItem.objects.create(
-                    order=order,
-                    dish=dish,
-                    quantity=qty,
-                    price=dish.price,
-                )
-        _set_cart(request.session, {})
+        try:
+            order, created = orders.place_order(
+                request.user,
+                cart.quantities(),
+                {
+                    "customer_name": request.POST.get("name", "Guest"),
+                    "customer_phone": request.POST.get("phone", ""),
+                    "address": request.POST.get("address", ""),
+                    "delivery_latitude": request.POST.get("delivery_latitude") or None,
+                    "delivery_longitude": request.POST.get("delivery_longitude") or None,
+                    "payment_method": request.POST.get("payment", "COD"),
+                    "is_paid": request.POST.get("payment") == "ONLINE",
+                },
+                idempotency_key=idempotency_key,
+            )
+        except orders.CheckoutError as exc:
+            metrics.CHECKOUTS.inc("failed")
+            messages.error(request, str(exc))
+            return redirect("cart")
+        if not created:
+            metrics.CHECKOUTS.inc("duplicate")
+            return redirect("invoice", order_id=order.id)
+        metrics.CHECKOUTS.inc("success")
+        metrics.ORDER_VALUE.observe(float(order.total_amount))
+        cart.clear()
+        cart.save()
         if request.user.email:
-            pdf_bytes = _build_invoice_pdf(order)
-            if pdf_bytes and settings.EMAIL_HOST_USER:
-                email = EmailMessage(
-                    subject=f"Your FoodBooking Invoice #{order.id}",
-                    body="Thanks for your order! Your invoice is attached.",
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[request.user.email],
-                )
-                email.attach(f"invoice-{order.id}.pdf", pdf_bytes, "application/pdf")
-                email.send(fail_silently=True)
+            tasks.enqueue(
+                "send_invoice_email",
+                ref=f"order:{order.id}",
+                order_id=order.id,
+                email=request.user.email,
+            )
         return redirect("invoice", order_id=order.id)
 
-    return render(request, "checkout.html", {"total": total})
+    if cart.revalidate():
+        cart.save()
+        messages.warning(request, "Some dishes in your cart changed. Please review your cart.")
+        return redirect("cart")
+    return render(
+        request,
+        "checkout.html",
+        {"total": cart.total, "idempotency_key": uuid.uuid4().hex},
+    )
 
 
 @login_required
@@ -381,127 +608,138 @@ def invoice(request, order_id):
     return render(request, "invoice.html", {"order": order, "items": items})
 
 
+@login_required
+def invoice_status(request, order_id):
+    order = get_object_or_404(Order, id=order_id, user=request.user)
+    jobs = Task.objects.filter(ref=f"order:{order.id}").order_by("id")
+    return JsonResponse(
+        {
+            "order": order.id,
+            "tasks": [
+                {
+                    "name": job.name,
+                    "status": job.status,
+                    "attempts": job.attempts,
+                    "next_attempt_at": job.run_after.isoformat() if job.status == "pending" else None,
+                }
+                for job in jobs
+            ],
+        }
+    )
+
+
 @login_required
 def invoice_pdf(request, order_id):
-    try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.units import cm
-        from reportlab.pdfgen import canvas
-    except ImportError:
+    order = get_object_or_404(Order, id=order_id, user=request.user)
+    artifact = invoices.cached_invoice(order)
+    if artifact is None:
         messages.error(request, "PDF generation requires ReportLab. Install it and retry.")
         return redirect("invoice", order_id=order_id)
-
-    order = get_object_or_404(Order, id=order_id, user=request.user)
-    pdf_bytes = _build_invoice_pdf(order)
-    response = HttpResponse(pdf_bytes, content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="invoice-{order.id}.pdf"'
+    etag = f'"{artifact["etag"]}"'
+    # HTTP dates have whole-second precision; a fractional value would never
+    # equal the If-Modified-Since a client echoes back.
+    last_modified = int(artifact["last_modified"].timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        sendfile = settings.INVOICE_SENDFILE
+        if sendfile == "x-accel-redirect":
+            response = HttpResponse(content_type="application/pdf")
+            response["X-Accel-Redirect"] = settings.INVOICE_ACCEL_PREFIX + artifact["name"]
+        elif sendfile == "x-sendfile":
+            response = HttpResponse(content_type="application/pdf")
+            response["X-Sendfile"] = invoices.storage().path(artifact["name"])
+        else:
+            response = FileResponse(
+                invoices.storage().open(artifact["name"], "rb"), content_type="application/pdf"
+            )
+        response["Content-Disposition"] = f'attachment; filename="invoice-{order.id}.pdf"'
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "private, max-age=86400"
     return response
 
 
-def _build_invoice_pdf(order):
+def resized_image(request, width, height, path):
+    if not images.allowed_size(width, height):
+        raise Http404("Size not allowed")
+    fmt = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpeg"
     try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.units import cm
-        from reportlab.pdfgen import canvas
-    except ImportError:
-        return None
+        artifact = images.resized(path, width, height, fmt)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("Image not found")
+    etag = f'"{artifact["etag"]}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=artifact["last_modified"]
+    )
+    if response is None:
+        try:
+            handle = open(artifact["path"], "rb")
+        except FileNotFoundError:
+            # Evicted since images.resized() found it; build it again.
+            try:
+                artifact = images.resized(path, width, height, fmt)
+                handle = open(artifact["path"], "rb")
+            except (SuspiciousFileOperation, OSError):
+                raise Http404("Image not found")
+        response = FileResponse(handle, content_type=artifact["content_type"])
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(artifact["last_modified"])
+    response["Cache-Control"] = f"public, max-age={images.cache_max_age()}"
+    patch_vary_headers(response, ["Accept"])
+    return response
 
-    items = order.items.select_related("dish", "dish__restaurant")
-    items_list = list(items)
-    restaurant = items_list[0].dish.restaurant if items_list else None
-    subtotal = sum(item.price * item.quantity for item in items_list)
-    cgst_rate = Decimal("0.025")
-    sgst_rate = Decimal("0.025")
-    cgst = subtotal * cgst_rate
-    sgst = subtotal * sgst_rate
-    grand_total = subtotal + cgst + sgst
-
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    pdf.setTitle(f"Invoice-{order.id}")
-    pdf.setFillColorRGB(0.97, 0.45, 0.09)
-    pdf.rect(0, height - 3 * cm, width, 3 * cm, stroke=0, fill=1)
-    pdf.setFillColorRGB(1, 1, 1)
-    pdf.setFont("Helvetica-Bold", 18)
-    pdf.drawString(2 * cm, height - 2.0 * cm, "FoodBooking Invoice")
-
-    pdf.setFillColorRGB(0, 0, 0)
-    pdf.setFont("Helvetica", 11)
-    pdf.drawString(2 * cm, height - 3.6 * cm, f"Order ID: {order.id}")
-    pdf.drawString(2 * cm, height - 4.3 * cm, f"Date: {order.created_at:%b %d, %Y %H:%M}")
-    pdf.drawString(2 * cm, height - 5.0 * cm, f"Customer: {order.customer_name}")
-    pdf.drawString(2 * cm, height - 5.7 * cm, f"Phone: {order.customer_phone}")
-    pdf.drawString(2 * cm, height - 6.4 * cm, f"Delivery Address: {order.address}")
-    pdf.drawString(2 * cm, height - 7.1 * cm, f"Payment: {order.payment_method}")
-
-    if restaurant:
-        pdf.setFont("Helvetica-Bold", 11)
-        pdf.drawString(12 * cm, height - 3.6 * cm, "Restaurant")
-        pdf.setFont("Helvetica", 10)
-        pdf.drawString(12 * cm, height - 4.2 * cm, restaurant.name)
-        pdf.drawString(12 * cm, height - 4.8 * cm, (restaurant.address or "-")[:38])
-
-    y = height - 8.5 * cm
-    pdf.setStrokeColor(colors.lightgrey)
-    pdf.line(2 * cm, y, width - 2 * cm, y)
-    y -= 0.6 * cm
-
-    pdf.setFont("Helvetica-Bold", 11)
-    pdf.drawString(2 * cm, y, "Item")
-    pdf.drawString(10 * cm, y, "Qty")
-    pdf.drawString(12 * cm, y, "Price")
-    pdf.drawString(15 * cm, y, "Total")
-    y -= 0.4 * cm
-    pdf.line(2 * cm, y, width - 2 * cm, y)
-    y -= 0.6 * cm
-
-    pdf.setFont("Helvetica", 10)
-    for item in items_list:
-        if y < 3 * cm:
-            pdf.showPage()
-            y = height - 2 * cm
-        line_total = item.price * item.quantity
-        pdf.drawString(2 * cm, y, item.dish.name)
-        pdf.drawRightString(11 * cm, y, str(item.quantity))
-        pdf.drawRightString(14 * cm, y, f"{item.price}")
-        pdf.drawRightString(18 * cm, y, f"{line_total}")
-        y -= 0.6 * cm
-
-    y -= 0.4 * cm
-    pdf.setFont("Helvetica", 10)
-    pdf.drawRightString(18 * cm, y, f"Subtotal: {subtotal:.2f}")
-    y -= 0.5 * cm
-    pdf.drawRightString(18 * cm, y, f"CGST (2.5%): {cgst:.2f}")
-    y -= 0.5 * cm
-    pdf.drawRightString(18 * cm, y, f"SGST (2.5%): {sgst:.2f}")
-    y -= 0.6 * cm
-    pdf.setFont("Helvetica-Bold", 12)
-    pdf.drawRightString(18 * cm, y, f"Grand Total: {grand_total:.2f}")
-
-    y -= 1.2 * cm
-    pdf.setFont("Helvetica-Oblique", 10)
-    pdf.drawString(2 * cm, y, "“Good food is the foundation of genuine happiness.”")
-    y -= 0.5 * cm
-    pdf.drawString(2 * cm, y, "Thank you for ordering with FoodBooking!")
-
-    pdf.showPage()
-    pdf.save()
-    buffer.seek(0)
-    return buffer.read()
+
+def _order_history_page(request, cursor):
+    orders = Order.objects.filter(user=request.user).only(
+        "id",
+        "created_at",
+        "total_amount",
+        "payment_method",
+        "is_paid",
+        "item_count",
+        "item_summary",
+    )
+    return paginate(orders, ORDER_HISTORY_ORDERING, cursor, settings.ORDER_HISTORY_PAGE_SIZE)
 
 
 @login_required
 def order_history(request):
-    orders = (
-        Order.objects.filter(user=request.user)
-        .order_by("-created_at")
-        .prefetch_related("items", "items__dish")
+    try:
+        orders, next_cursor = _order_history_page(request, request.GET.get("cursor"))
+    except InvalidCursor:
+        orders, next_cursor = _order_history_page(request, None)
+    return render(
+        request, "order_history.html", {"orders": orders, "next_cursor": next_cursor}
+    )
+
+
+@login_required
+def order_history_json(request):
+    try:
+        orders, next_cursor = _order_history_page(request, request.GET.get("cursor"))
+    except InvalidCursor as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse(
+        {
+            "orders": [
+                {
+                    "id": order.id,
+                    "created_at": order.created_at.isoformat(),
+                    "created_display": date_format(
+                        timezone.localtime(order.created_at), "M d, Y H:i"
+                    ),
+                    "total_amount": str(order.total_amount),
+                    "payment_method": order.payment_method,
+                    "is_paid": order.is_paid,
+                    "item_count": order.item_count,
+                    "item_summary": order.item_summary,
+                    "invoice_url": reverse("invoice", args=[order.id]),
+                }
+                for order in orders
+            ],
+            "next_cursor": next_cursor,
+        }
     )
-    return render(request, "order_history.html", {"orders": orders})
 
 
 @login_required
@@ -546,35 +784,53 @@ def restaurant_dashboard(request):
     if not _require_restaurant_user(request.user):
         return redirect("restaurant_login")
     profile = request.user.restaurantprofile
-    dishes = Dish.objects.filter(restaurant=profile.restaurant).order_by("name")
-    today = timezone.localdate()
-    today_items = OrderItem.objects.filter(
-        dish__restaurant=profile.restaurant,
-        order__created_at__date=today,
-    )
-    today_orders = today_items.values("order_id").distinct().count()
-    revenue = today_items.aggregate(total=Sum(F("price") * F("quantity")))["total"] or Decimal("0.00")
-    avg_rating = dishes.aggregate(avg=Avg("rating"))["avg"] or 0
-    popular_items = (
-        OrderItem.objects.filter(dish__restaurant=profile.restaurant)
-        .values("dish__name")
-        .annotate(qty=Sum("quantity"))
-        .order_by("-qty")[:5]
-    )
+    menu = catalog.get_menu(profile.restaurant_id)
+    dishes = menu["dishes"] if menu else []
+    today = sales.today(profile.restaurant_id)
+    avg_rating = sum(d["rating"] for d in dishes) / len(dishes) if dishes else 0
     return render(
         request,
         "restaurant_dashboard.html",
         {
             "profile": profile,
             "dishes": dishes,
-            "today_orders": today_orders,
-            "revenue": revenue,
+            "today_orders": today.orders if today else 0,
+            "revenue": today.revenue if today else Decimal("0.00"),
             "avg_rating": round(avg_rating, 1) if avg_rating else 0,
-            "popular_items": popular_items,
+            "popular_items": sales.popular_dishes(profile.restaurant_id),
         },
     )
 
 
+@login_required
+def restaurant_analytics(request):
+    if not _require_restaurant_user(request.user):
+        return JsonResponse({"error": "Restaurant account required"}, status=403)
+    bucket = request.GET.get("bucket", "day")
+    if bucket not in sales.BUCKETS:
+        return JsonResponse({"error": "bucket must be hour, day or week"}, status=400)
+    try:
+        end = date.fromisoformat(request.GET["end"]) if request.GET.get("end") else timezone.localdate()
+        start = (
+            date.fromisoformat(request.GET["start"])
+            if request.GET.get("start")
+            else end - timedelta(days=6)
+        )
+        top = min(int(request.GET.get("dishes", 10)), 50)
+    except ValueError:
+        return JsonResponse({"error": "Invalid parameters"}, status=400)
+    if top < 0:
+        return JsonResponse({"error": "dishes must not be negative"}, status=400)
+    if start > end:
+        return JsonResponse({"error": "start must not be after end"}, status=400)
+    span = (end - start + timedelta(days=1)) / sales.BUCKETS[bucket]
+    if span > settings.ANALYTICS_MAX_BUCKETS:
+        return JsonResponse({"error": "Date range too large for this bucket"}, status=400)
+    return JsonResponse(
+        sales.series(request.user.restaurantprofile.restaurant_id, start, end, bucket, top)
+    )
+
+
 @login_required
 def restaurant_add_dish(request):
     if not _require_restaurant_user(request.user):
@@ -609,3 +865,38 @@ def restaurant_add_dish(request):
         "restaurant_add_dish.html",
         {"profile": profile, "formset": formset},
     )
+
+
+def metrics_view(request):
+    # Prometheus scrape endpoint: superuser sessions, or METRICS["TOKEN"] as
+    # a bearer token for the scraper. Restaurant owners are staff too and must
+    # not see platform-wide figures.
+    token = metrics.token()
+    authorization = request.headers.get("Authorization", "")
+    allowed = request.user.is_superuser or (
+        token and constant_time_compare(authorization, f"Bearer {token}")
+    )
+    if not allowed:
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def profile_list(request):
+    if not profiling.allowed(request.user):
+        raise PermissionDenied
+    context = {
+        **admin.site.each_context(request),
+        "title": "Request profiles",
+        "profiles": profiling.profiles(),
+        "param": profiling.param(),
+    }
+    return render(request, "admin/profiles.html", context)
+
+
+def profile_download(request, filename):
+    if not profiling.allowed(request.user):
+        raise PermissionDenied
+    path = profiling.file_path(filename)
+    if path is None:
+        raise Http404("Profile not found")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=filename)
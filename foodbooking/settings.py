@@ -53,12 +53,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.NPlusOneMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -67,7 +71,7 @@ ROOT_URLCONF = 'foodbooking.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -192,3 +196,136 @@ EMAIL_HOST_PASSWORD = os.environ.get('SMTP_PASS', '')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY', '')
+
+# Dishes per page on the user app listing and its JSON feed
+APP_HOME_PAGE_SIZE = int(os.environ.get('APP_HOME_PAGE_SIZE', '24'))
+
+# Orders per page on order history and its JSON feed
+ORDER_HISTORY_PAGE_SIZE = int(os.environ.get('ORDER_HISTORY_PAGE_SIZE', '20'))
+
+# Caches - per-process memory by default; point CACHE_BACKEND/CACHE_LOCATION at
+# a shared backend (memcached, redis, file) when running several workers so
+# menu invalidations reach every process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'foodbooking'),
+    }
+}
+
+# Menu/restaurant catalog cache (core.catalog), TTLs in seconds
+CATALOG_CACHE = {
+    'ALIAS': 'default',
+    'RESTAURANTS_TTL': int(os.environ.get('CATALOG_RESTAURANTS_TTL', '300')),
+    'MENU_TTL': int(os.environ.get('CATALOG_MENU_TTL', '3600')),
+}
+
+# Delivery ETA service (core.eta). PROVIDER is "auto" (Google when an API key is
+# set, otherwise the offline haversine estimator), a short name or a dotted path.
+ETA = {
+    'PROVIDER': os.environ.get('ETA_PROVIDER', 'auto'),
+    'CACHE_TTL': int(os.environ.get('ETA_CACHE_TTL', '600')),
+    'FALLBACK_CACHE_TTL': 60,
+    'GEOHASH_PRECISION': 6,
+    'TIMEOUT': float(os.environ.get('ETA_TIMEOUT', '2.0')),
+    'COOLDOWN': 30,
+    'AVERAGE_SPEED_KMH': 20.0,
+}
+
+# Maximum restaurants per /eta/batch/ request
+ETA_BATCH_LIMIT = 100
+
+# Maximum operations per /cart/batch/ request
+CART_BATCH_LIMIT = 50
+
+# Maximum changes per /api/menu/changes page
+MENU_CHANGES_PAGE_SIZE = 500
+
+# Seconds a menu change must age before /api/menu/changes returns it. The
+# sequence is the autoincrement id, which is only gap-free at read time on
+# SQLite; set a few seconds on Postgres so slow commits are not skipped.
+MENU_CHANGES_COMMIT_LAG = float(os.environ.get('MENU_CHANGES_COMMIT_LAG', '0'))
+
+# Largest series /restaurant/analytics.json will return (31 days hourly)
+ANALYTICS_MAX_BUCKETS = 744
+
+# Per-request instrumentation (core.middleware.ServerTimingMiddleware): adds a
+# Server-Timing header and logs requests slower than SLOW_REQUEST_MS, with
+# their TOP_SQL slowest statements, to the "core.timing" logger.
+REQUEST_TIMING = {
+    'ENABLED': os.environ.get('REQUEST_TIMING', '0') == '1',
+    'SLOW_REQUEST_MS': int(os.environ.get('SLOW_REQUEST_MS', '500')),
+    'TOP_SQL': 5,
+}
+
+# Development N+1 detector (core.nplusone): THRESHOLD identical queries from one
+# template line or code location within a request either warn or raise.
+NPLUSONE = {
+    'ENABLED': os.environ.get('NPLUSONE', '0') == '1',
+    'ACTION': os.environ.get('NPLUSONE_ACTION', 'warn'),
+    'THRESHOLD': 3,
+}
+
+# Prometheus metrics (core.metrics) served at /metrics to superusers or to requests
+# bearing TOKEN. With several worker processes point DIR (or
+# PROMETHEUS_MULTIPROC_DIR) at a directory shared by all of them and empty it
+# on deploy; each worker publishes its totals there every FLUSH_INTERVAL seconds.
+METRICS = {
+    'DIR': os.environ.get('METRICS_DIR') or None,
+    'FLUSH_INTERVAL': float(os.environ.get('METRICS_FLUSH_INTERVAL', '1.0')),
+    'TOKEN': os.environ.get('METRICS_TOKEN', ''),
+}
+
+# Superuser-only request profiling (core.profiling): add ?_profile=1 or an
+# "X-Profile: 1" header. Each capture saves cProfile stats and sampled collapsed
+# stacks under DIR (default var/profiles), keeping the newest MAX_PROFILES;
+# browse them at /admin/profiles/.
+PROFILING = {
+    'ENABLED': os.environ.get('PROFILING', '1') == '1',
+    'DIR': os.environ.get('PROFILING_DIR') or None,
+    'MAX_PROFILES': int(os.environ.get('PROFILING_MAX_PROFILES', '50')),
+    'SAMPLE_INTERVAL': 0.005,
+}
+
+# Radius for sort=distance and /restaurants/nearby/
+NEARBY_RADIUS_KM = float(os.environ.get('NEARBY_RADIUS_KM', '10'))
+
+# Background jobs (core.tasks). MODE "thread" runs jobs in an in-process pool
+# after commit (single-box deployments); "worker" leaves them to
+# `manage.py run_tasks`; "immediate" runs them inline after commit. In thread
+# mode an enqueue also resubmits due or lease-expired jobs left behind by a
+# restart, at most every SWEEP_SECONDS.
+TASKS = {
+    'MODE': os.environ.get('TASKS_MODE', 'thread'),
+    'THREADS': int(os.environ.get('TASKS_THREADS', '2')),
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 30,
+    'LEASE_SECONDS': 300,
+    'SWEEP_SECONDS': 60,
+}
+
+# Resized copies of uploaded images (core.images), written under
+# MEDIA_ROOT/<PREFIX>/ and referenced from srcset attributes.
+IMAGE_VARIANTS = {
+    'WIDTHS': (160, 320, 640),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+}
+
+# On-demand /img/<w>x<h>/<path> renditions. Only SIZES are served ("320x0"
+# keeps the aspect ratio); the disk cache is trimmed least-recently-used
+# first once it grows past MAX_CACHE_BYTES.
+IMAGE_RESIZE = {
+    'SIZES': ('80x80', '160x160', '320x0', '320x200', '480x0', '640x0', '640x400', '960x0'),
+    'CACHE_ROOT': Path(os.environ.get('IMAGE_CACHE_ROOT', BASE_DIR / 'var' / 'img-cache')),
+    'MAX_CACHE_BYTES': int(os.environ.get('IMAGE_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+    'MAX_AGE': 30 * 24 * 3600,
+}
+
+# Rendered invoice PDFs (core.invoices). INVOICE_SENDFILE hands the download to
+# the web server: None, "x-sendfile" (Apache/lighttpd) or "x-accel-redirect"
+# (nginx, with an internal location mapping INVOICE_ACCEL_PREFIX to
+# INVOICE_CACHE_ROOT).
+INVOICE_CACHE_ROOT = Path(os.environ.get('INVOICE_CACHE_ROOT', BASE_DIR / 'var' / 'invoices'))
+INVOICE_SENDFILE = os.environ.get('INVOICE_SENDFILE') or None
+INVOICE_ACCEL_PREFIX = '/protected-invoices/'
@@ -22,6 +22,12 @@ from core import views as core_views
 
 urlpatterns = [
     path('admin/logout/', core_views.admin_logout, name='admin_logout'),
+    path('admin/profiles/', admin.site.admin_view(core_views.profile_list), name='admin_profiles'),
+    path(
+        'admin/profiles/<str:filename>',
+        admin.site.admin_view(core_views.profile_download),
+        name='admin_profile_download',
+    ),
     path('accounts/', include('allauth.urls')),
     path('', include('core.urls')),
     path('admin/', admin.site.urls),